@@ -0,0 +1,349 @@
+import idatool.callgraph
+import idatool.degrees
+import idatool.filters
+import idatool.hashing
+import idatool.immediates
+import idatool.ngrams
+import idatool.operandtypes
+import idatool.table
+
+class Analysis:
+    Debug = 0
+    Cache = None
+    FunctionHashSets = None
+    ImmediateIndex = None
+    MnemonicIndex = None
+    CallGraph = None
+    DegreeTable = None
+    ImageBase = 0
+
+    def get_operand_string(self, operand):
+        operand_str = ''
+        if operand['Type'] == "Void":
+            pass
+        elif operand['Type'] == "Far" or \
+             operand['Type'] == "Near":
+            operand_str = operand['Value']
+
+        elif operand['Type'] == "Register":
+            operand_str = operand['Value']
+
+        elif operand['Type'] == "Immediate" or \
+             operand['Type'] == "Memory":
+            if 'Value' in operand:
+                operand_str = operand['Value']
+
+        elif operand['Type'] == "Displacement":
+            index_str = ''
+            if operand['Index']:
+                index_str = '+%s' % operand['Index']
+
+            if operand['Scale'] == 1:
+                operand_str = '%s%s+%d' % (operand['Base'], index_str, operand['Offset'])
+            else:
+                operand_str = '%s*%s%s+%d' % (operand['Base'], operand['Scale'], index_str, operand['Index'])
+
+        elif operand['Type'] == "Phrase":
+            operand_str = ''
+            
+        return operand_str
+
+    def get_filter(self, type):
+        if type == "CallToSection":
+            filter = {'Op': ['call'], 'Target': 'Section'}
+        elif type == "IndirectCall":
+            filter = {'Op': ['call', 'jmp'], 'Target': 'Indirect'}
+        elif type == 'Pointer':
+            filter = {'Op': ['mov'], 'Target': 'Pointer'}
+        elif type == 'DisplacementCall':
+            filter = {'Op': ['call'], 'Target': 'Displacement'}
+        else:
+            filter = {}
+        return filter
+
+    def match_instruction_filter(self, filter, instruction):
+        filter = idatool.filters.compile_filter(filter)
+        if filter == None:
+            return True
+        return filter.match(instruction)
+
+    def get_instructionText(self, instruction, include_bytes = False, bytes_width = 10):
+        if instruction['Comment']:
+            cmt = instruction['Comment']
+        else:
+            cmt = ''
+
+        cmt += instruction['Repeatable Comment']
+        
+        if cmt:
+            cmt = '; '+cmt
+
+        bytes_str = ''
+        if include_bytes:
+            for byte in bytearray(self.get_instruction_bytes(instruction['Address'])):
+                bytes_str += '%.2x ' % byte
+
+        if len(bytes_str) < 3*bytes_width:
+            bytes_str += ' ' * (3*bytes_width-len(bytes_str))
+
+        line = '%.8x (+%.8x) %s\t%s%s' % (
+                        instruction['Address'], 
+                        instruction['RVA'], 
+                        bytes_str, 
+                        instruction['Disasm'], 
+                        cmt
+                    )
+
+        return line
+
+    def __get_filter_function(self, filter):
+        return idatool.filters.compile_filter(filter)
+
+    def get_jump_address(self, instruction):
+        if not 'CREFFrom' in instruction:
+            return 0
+
+        for (cref_type, cref) in instruction['CREFFrom']:
+            if cref_type == 'Jmp':
+                return cref
+        return 0
+
+    def __copy_instructions(self, instructions):
+        return [dict(instruction) for instruction in instructions]
+
+    def get_lazy_instruction(self, instruction, fields = None):
+        values = {'Type': instruction['Type'], 'RVA': instruction['RVA'], 'Address': instruction['Address']}
+        return idatool.table.LazyInstruction(self.load_instruction_field, values, fields)
+
+    def load_instruction_field(self, instruction, key):
+        for (field, value) in self.get_instruction(instruction['Address']).items():
+            if not instruction.is_loaded(field):
+                instruction[field] = value
+
+    def get_function_instructions(self, ea = None, filter = None, fields = None, lazy = False):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+
+        instructions = graph.get_instructions(self.__get_filter_function(filter))
+        fields = idatool.table.get_instruction_fields(fields)
+        if lazy:
+            return [self.get_lazy_instruction(instruction, fields) for instruction in instructions]
+        if fields == None:
+            return self.__copy_instructions(instructions)
+        return [idatool.table.project_instruction(instruction, fields) for instruction in instructions]
+
+    def get_function_blocks(self, ea = None, filter = None):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+        return [(block_start, block_end, self.__copy_instructions(instructions)) for (block_start, block_end, instructions) in graph.get_blocks(self.__get_filter_function(filter))]
+
+    def get_function_map(self, ea = None):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return ({}, {})
+        return graph.get_map()
+
+    def get_block_instructions(self, ea = None, filter = None):
+        if ea == None:
+            ea = self.get_current_address()
+
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+
+        block = graph.get_block(ea)
+        if block == None:
+            return []
+
+        (block_start, block_end, instructions) = block
+        filter = self.__get_filter_function(filter)
+        if filter != None:
+            instructions = [instruction for instruction in instructions if filter.match(instruction)]
+        return self.__copy_instructions(instructions)
+
+    def get_function_call_references(self, ea = None, filter = None):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return ([], [], [])
+
+        (call_refs, indirect_reg_call_refs) = graph.get_call_references()
+        instructions = self.__copy_instructions(graph.get_instructions(self.__get_filter_function(filter)))
+        return (call_refs, indirect_reg_call_refs, instructions)
+
+    def get_function_references(self, ea = None):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+        return graph.get_references()
+
+    def get_instructions_hashes(self, instructions, hash_types_list = idatool.hashing.HashTypesList):
+        hasher = idatool.hashing.InstructionHasher(hash_types_list)
+        hasher.update_all(instructions)
+        return hasher.hexdigests()
+
+    def get_instructions_hash(self, instructions, hash_types = idatool.hashing.DefaultHashTypes):
+        return self.get_instructions_hashes(instructions, [hash_types])[idatool.hashing.get_hash_key(hash_types)]
+
+    def get_function_hash_set(self, ea, hash_types_list = idatool.hashing.HashTypesList):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return None
+
+        if self.FunctionHashSets == None:
+            self.FunctionHashSets = {}
+
+        hash_set = self.FunctionHashSets.setdefault(graph.Start, {})
+        keys = [idatool.hashing.get_hash_key(hash_types) for hash_types in hash_types_list]
+
+        if self.Cache != None:
+            for key in keys:
+                if not key in hash_set:
+                    function_hash = self.Cache.get('WalkFunctionHash', graph.Start, key)
+                    if function_hash != None:
+                        hash_set[key] = function_hash
+
+        missing_hash_types_list = [hash_types for (key, hash_types) in zip(keys, hash_types_list) if not key in hash_set]
+        if len(missing_hash_types_list)>0:
+            for (key, function_hash) in self.get_instructions_hashes(graph.get_walk_instructions(), idatool.hashing.HashTypesList + missing_hash_types_list).items():
+                if key in hash_set:
+                    continue
+
+                hash_set[key] = function_hash
+                if self.Cache != None:
+                    self.Cache.put('WalkFunctionHash', graph.Start, function_hash, key)
+
+        return dict((key, hash_set[key]) for key in keys)
+
+    def get_function_hash(self, ea, hash_types = idatool.hashing.DefaultHashTypes):
+        hash_set = self.get_function_hash_set(ea, [hash_types])
+        if hash_set == None:
+            return None
+        return hash_set[idatool.hashing.get_hash_key(hash_types)]
+
+    def get_function_hashes(self, hash_types = idatool.hashing.DefaultHashTypes):
+        function_hashes = []
+        for function_start in self.get_function_starts():
+            function_hashes.append({
+                'Address': function_start, 
+                'Name': self.get_function_name(function_start), 
+                'Hash': {'Type': hash_types, 'Value': self.get_function_hash(function_start, hash_types)}
+            })
+        return function_hashes
+
+    def get_all_instructions(self, filter = None, fields = None, lazy = False):
+        filter = idatool.filters.compile_filter(filter)
+        fields = idatool.table.get_instruction_fields(fields)
+        instructions = idatool.table.create_instruction_list(self.ImageBase, fields, lazy)
+        for function_start in self.get_function_starts():
+            for instruction in self.get_function_instructions(function_start, filter = filter, fields = fields, lazy = lazy):
+                instructions.append(instruction)
+        return instructions
+
+    def get_immediate_index(self):
+        if self.ImmediateIndex == None:
+            self.ImmediateIndex = idatool.immediates.ImmediateIndex(self)
+        return self.ImmediateIndex
+
+    def get_call_graph(self):
+        if self.CallGraph == None:
+            self.CallGraph = idatool.callgraph.CallGraph(self)
+        return self.CallGraph
+
+    def get_code_reference_count(self, ea):
+        return self.get_call_graph().get_in_degree(ea)
+
+    def iterate_call_references(self):
+        for function_start in self.get_function_starts():
+            graph = self.get_function_graph(function_start)
+            if graph == None:
+                continue
+
+            (call_refs, indirect_reg_call_refs) = graph.get_call_references()
+            for (call_address, call_ref) in call_refs:
+                yield (function_start, call_ref)
+
+    def get_degree_table(self):
+        if self.DegreeTable == None:
+            self.DegreeTable = idatool.degrees.DegreeTable(self)
+        return self.DegreeTable
+
+    def find_utility_functions(self, threshold = 10, percentile = None):
+        return self.get_degree_table().get_utility_functions(threshold, percentile)
+
+    def get_mnemonic_index(self):
+        if self.MnemonicIndex == None:
+            self.MnemonicIndex = idatool.ngrams.MnemonicIndex(self)
+        return self.MnemonicIndex
+
+    def find_instruction_sequence(self, sequence):
+        matches = []
+        for match in self.get_mnemonic_index().find_sequence(sequence):
+            graph = self.get_function_graph(match['Function'])
+            if graph == None:
+                continue
+
+            block = graph.get_block(match['Block'])
+            if block == None:
+                continue
+
+            match['Addresses'] = [instruction['Address'] for instruction in block[2][match['Offset']:match['Offset']+match['Length']]]
+            matches.append(match)
+        return matches
+
+    def find_similar_functions(self, ea = None, count = 10):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+        return self.get_mnemonic_index().rank_similar_functions(graph.Start, count = count)
+
+    def find_immediate_segments_references(self):
+        imm_operands_map = {}
+        for entry in self.get_immediate_index().find_range(0, idatool.immediates.ValueMask):
+            if self.is_in_segment(entry['Value']):
+                imm_operands_map.setdefault(entry['Address'], []).append((entry['Position'], entry['Value']))
+
+        instructions = []
+        for address in sorted(imm_operands_map.keys()):
+            instruction = self.get_instruction(address)
+            if instruction == None:
+                continue
+            instructions.append((instruction, [value for (position, value) in sorted(imm_operands_map[address])]))
+
+        return instructions
+
+    def dump_paths(self, paths):
+        path_str = ''
+        for path in paths:
+            path_str += '%.8x ' % path
+
+        return path_str
+
+    def find_function_loops(self, ea = None, irreducible = False):
+        graph = self.get_function_graph(ea)
+        if graph == None:
+            return []
+
+        loops = graph.find_loops(irreducible = irreducible)
+
+        if self.Debug>0:
+            for loop in loops:
+                print('Loop: %.8x (depth: %d) %s' % (loop['Header'], loop['Depth'], self.dump_paths(loop['Blocks'])))
+
+        return loops
+
+    def find_loops(self, irreducible = False):
+        loops_list = []
+        for function in self.get_functions():
+            loops = self.find_function_loops(function['Address'], irreducible = irreducible)
+            
+            if len(loops)>0:
+                loops_list.append(
+                    {
+                        'Function': function, 
+                        'Loops': loops
+                    }
+                )
+
+        return loops_list
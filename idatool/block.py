@@ -3,7 +3,6 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 from collections import *
-import copy
 import logging
 
 from idaapi import *
@@ -49,7 +48,8 @@ class Block:
         while 1:
             ea_size = get_item_size(ea)
             instructions.append((ea, GetManyBytes(ea, ea_size)))
-            if idatool.util.Refs.get_jump_cref_to(ea) != 1:
+            prev_list = idatool.util.Refs.get_jump_cref_to(ea)
+            if len(prev_list) != 1:
                 break
 
             if len(idatool.util.Refs.get_jump_cref_from(prev_list[0])) != 1:
@@ -100,28 +100,80 @@ class Block:
                 self.logger.debug('\t%x', bb)
             self.logger.debug('')
 
-    def __traverse_block(self, block, map, blocks, level = 0):
-        prefix = '\t'*level
-        
-        self.logger.debug(prefix+'%x', block)
-        paths = []
-        blocks.append(block)
-        if block in map:
-            for prev_block in map[block]:
-                if prev_block in blocks:
+    def get_block_paths(self, max_paths = 1000, max_depth = 64):
+        path_count = 0
+        expanded_states = {}
+        found_paths = {}
+        stack = [[self.CurrentBlock]]
+        while len(stack)>0:
+            blocks = stack.pop()
+            block = blocks[-1]
+            self.logger.debug('\t'*(len(blocks)-1)+'%x', block)
+
+            prev_blocks = []
+            if len(blocks) < max_depth:
+                for prev_block in self.RevMap.get(block, []):
+                    if not prev_block in blocks:
+                        prev_blocks.append(prev_block)
+
+            if len(prev_blocks) == 0:
+                path_key = tuple(blocks)
+                if path_key in found_paths:
+                    continue
+
+                found_paths[path_key] = 1
+                yield blocks
+
+                path_count += 1
+                if max_paths > 0 and path_count >= max_paths:
+                    return
+                continue
+
+            state = (block, frozenset(blocks))
+            if state in expanded_states:
+                continue
+            expanded_states[state] = 1
+
+            for prev_block in reversed(prev_blocks):
+                stack.append(blocks + [prev_block])
+
+    def count_block_paths(self, max_count = 0):
+        counts = {}
+        on_stack = {self.CurrentBlock: 1}
+        stack = [(self.CurrentBlock, iter(self.RevMap.get(self.CurrentBlock, [])), [])]
+        while len(stack)>0:
+            (block, prev_blocks, counted_prev_blocks) = stack[-1]
+            advanced = False
+            for prev_block in prev_blocks:
+                if prev_block in on_stack:
                     continue
-                paths += self.__traverse_block(prev_block, map, copy.deepcopy(blocks), level+1)
 
-        if len(paths) == 0:
-            paths.append(blocks)
+                counted_prev_blocks.append(prev_block)
+                if not prev_block in counts:
+                    on_stack[prev_block] = 1
+                    stack.append((prev_block, iter(self.RevMap.get(prev_block, [])), []))
+                    advanced = True
+                    break
 
-        return paths
+            if advanced:
+                continue
+
+            stack.pop()
+            del on_stack[block]
+
+            if len(counted_prev_blocks) == 0:
+                count = 1
+            else:
+                count = 0
+                for prev_block in counted_prev_blocks:
+                    count += counts[prev_block]
+
+            if max_count > 0 and count > max_count:
+                count = max_count
+            counts[block] = count
+
+        return counts[self.CurrentBlock]
 
-    def get_block_paths(self):
-        blocks = []
-        paths = self.__traverse_block(self.CurrentBlock, self.RevMap, blocks)
-        return paths
-        
     def get_bytes(self, blocks):
         bytes_list = []
         for block in blocks:
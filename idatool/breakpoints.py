@@ -6,29 +6,43 @@ import pprint
 
 import windbgtool.command
 import windbgtool.breakpoints_storage
+import idatool.disassembly
+import idatool.filters
 import idatool.ui
 
 class Util:
     def __init__(self):
-        self.Disasm = idatool.disassembly()
+        self.Disasm = idatool.disassembly.Disasm()
         self.Lines = []
         self.Breakpoints = []
 
     def add(self, range_str = '', type = ""):
-        filter = self.Disasm.get_filter(type)
+        if isinstance(type, (list, tuple)):
+            types = type
+        else:
+            types = [type]
 
         command_generator = windbgtool.command.Generator(
                                                 self.Disasm.ImageBase, 
                                                 self.Disasm.ImageBase
                                             )
 
+        filters = {}
+        for type in types:
+            filters[type] = idatool.filters.compile_filter(self.Disasm.get_filter(type))
+
         if range_str == 'FunctionTree':
-            for (func_name, instructions) in self.Disasm.get_function_tree_instructions(filter = filter).items():
-                for line in command_generator.generate_commands_for_instructions(instructions, func_name = func_name):
-                    print(line)
+            filter_set = idatool.filters.InstructionFilterSet([filters[type] for type in types])
+            function_instructions = self.Disasm.get_function_tree_instructions(filter = filter_set)
+            for type in types:
+                for (func_name, instructions) in function_instructions.items():
+                    instructions = [instruction for instruction in instructions if filters[type].match(instruction)]
+                    for line in command_generator.generate_commands_for_instructions(instructions, func_name = func_name):
+                        print(line)
         else:
-            instructions = self.Disasm.get_instructions(filter = filter)
-            self.Breakpoints += instructions
+            results = self.Disasm.scan_instructions(filters, fields = ('Type', 'Address', 'RVA'))
+            for type in types:
+                self.Breakpoints += results[type]
 
     def add_functions(self):
         patterns = ['LocalAlloc', 'OutputDebugString', 'FreeStructure', 
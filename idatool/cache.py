@@ -0,0 +1,145 @@
+import atexit
+import json
+import logging
+import sqlite3
+import time
+
+class AnalysisCache:
+    FlushCount = 100
+    FlushInterval = 1.0
+    Timeout = 30.0
+
+    def __init__(self, filename, file_hash, idb_counter, counter_callback = None):
+        self.logger = logging.getLogger(__name__)
+        self.Filename = filename
+        self.FileHash = file_hash
+        self.IDBCounter = str(idb_counter)
+        self.CounterCallback = counter_callback
+        self.Statistics = {}
+        self.PendingEntries = {}
+        self.PendingInvalidations = set()
+        self.LastFlush = time.time()
+
+        self.Conn = sqlite3.connect(filename, timeout = self.Timeout)
+        try:
+            self.Conn.execute('PRAGMA journal_mode=WAL')
+            self.Conn.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.DatabaseError:
+            pass
+
+        c = self.Conn.cursor()
+        c.execute("""CREATE TABLE
+                    IF NOT EXISTS CacheInformation (
+                        FileHash text PRIMARY KEY,
+                        IDBCounter text
+                    );""")
+
+        c.execute("""CREATE TABLE
+                    IF NOT EXISTS CacheEntries (
+                        FileHash text,
+                        Kind text,
+                        Key integer,
+                        Param text,
+                        Value text,
+                        PRIMARY KEY (FileHash, Kind, Key, Param)
+                    );""")
+
+        c.execute('SELECT IDBCounter FROM CacheInformation WHERE FileHash = ?', (self.FileHash, ))
+        row = c.fetchone()
+        if row == None or row[0] != self.IDBCounter:
+            if row != None:
+                self.logger.debug('IDB changed (%s -> %s), dropping cached entries', row[0], self.IDBCounter)
+            c.execute('DELETE FROM CacheEntries WHERE FileHash = ?', (self.FileHash, ))
+            c.execute('INSERT OR REPLACE INTO CacheInformation (FileHash, IDBCounter) VALUES (?, ?)', (self.FileHash, self.IDBCounter))
+        self.Conn.commit()
+
+        atexit.register(self.close)
+
+    def get_idb_counter(self):
+        if self.CounterCallback == None:
+            return self.IDBCounter
+
+        try:
+            return str(self.CounterCallback())
+        except:
+            return self.IDBCounter
+
+    def is_invalidated(self, kind, key):
+        for invalidation in ((kind, key), (None, key), (kind, None), (None, None)):
+            if invalidation in self.PendingInvalidations:
+                return True
+        return False
+
+    def __count(self, kind, name):
+        if not kind in self.Statistics:
+            self.Statistics[kind] = {'Hits': 0, 'Misses': 0}
+        self.Statistics[kind][name] += 1
+
+    def get(self, kind, key, param = ''):
+        value = self.PendingEntries.get((kind, key, param))
+        if value == None and not self.is_invalidated(kind, key):
+            c = self.Conn.cursor()
+            c.execute('SELECT Value FROM CacheEntries WHERE FileHash = ? AND Kind = ? AND Key = ? AND Param = ?', (self.FileHash, kind, key, param))
+            row = c.fetchone()
+            if row != None:
+                value = row[0]
+
+        if value == None:
+            self.__count(kind, 'Misses')
+            return None
+
+        self.__count(kind, 'Hits')
+        return json.loads(value)
+
+    def put(self, kind, key, value, param = ''):
+        self.PendingEntries[(kind, key, param)] = json.dumps(value)
+        if len(self.PendingEntries) >= self.FlushCount or time.time()-self.LastFlush >= self.FlushInterval:
+            self.flush()
+
+    def invalidate(self, key = None, kind = None):
+        for pending_key in list(self.PendingEntries.keys()):
+            if (kind == None or pending_key[0] == kind) and (key == None or pending_key[1] == key):
+                del self.PendingEntries[pending_key]
+
+        if kind == None and key == None:
+            self.PendingInvalidations = set()
+        self.PendingInvalidations.add((kind, key))
+
+    def get_statistics(self):
+        statistics = {'Hits': 0, 'Misses': 0, 'Kinds': self.Statistics}
+        for counts in self.Statistics.values():
+            statistics['Hits'] += counts['Hits']
+            statistics['Misses'] += counts['Misses']
+        return statistics
+
+    def flush(self):
+        idb_counter = self.get_idb_counter()
+        if len(self.PendingEntries)>0 or len(self.PendingInvalidations)>0 or idb_counter != self.IDBCounter:
+            for (kind, key) in self.PendingInvalidations:
+                sql = 'DELETE FROM CacheEntries WHERE FileHash = ?'
+                params = [self.FileHash]
+                if kind != None:
+                    sql += ' AND Kind = ?'
+                    params.append(kind)
+                if key != None:
+                    sql += ' AND Key = ?'
+                    params.append(key)
+                self.Conn.execute(sql, params)
+
+            rows = [(self.FileHash, kind, key, param, value) for ((kind, key, param), value) in self.PendingEntries.items()]
+            self.Conn.executemany('INSERT OR REPLACE INTO CacheEntries (FileHash, Kind, Key, Param, Value) VALUES (?, ?, ?, ?, ?)', rows)
+
+            if idb_counter != self.IDBCounter:
+                self.IDBCounter = idb_counter
+                self.Conn.execute('UPDATE CacheInformation SET IDBCounter = ? WHERE FileHash = ?', (self.IDBCounter, self.FileHash))
+
+            self.Conn.commit()
+            self.PendingEntries = {}
+            self.PendingInvalidations = set()
+        self.LastFlush = time.time()
+
+    def close(self):
+        if self.Conn != None:
+            self.flush()
+            self.Conn.close()
+            self.Conn = None
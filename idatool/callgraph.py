@@ -0,0 +1,255 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import array
+import gzip
+import json
+
+import idatool.table
+
+Version = 1
+
+Direct = 0
+Indirect = 1
+
+class CallGraph:
+    OverlayLimit = 256
+
+    def __init__(self, analysis = None):
+        self.Analysis = analysis
+        self.FunctionEdges = {}
+        self.PendingFunctions = set()
+        self.Built = False
+        self.Dirty = True
+
+        self.Nodes = idatool.table.create_address_array()
+        self.OutStarts = array.array('l', [0])
+        self.OutTargets = array.array('l')
+        self.OutTargetAddresses = idatool.table.create_address_array()
+        self.OutSites = idatool.table.create_address_array()
+        self.OutFlags = array.array('B')
+        self.InStarts = array.array('l', [0])
+        self.InSources = array.array('l')
+        self.InSites = idatool.table.create_address_array()
+        self.UnresolvedCallers = {}
+        self.Operands = {}
+        self.NodeIndex = {}
+
+        self.Overlay = {}
+        self.OverlayCallers = {}
+
+    def get_function_edges(self, function_start):
+        graph = self.Analysis.get_function_graph(function_start)
+        if graph == None:
+            return None
+
+        edges = []
+        (call_refs, indirect_reg_call_refs) = graph.get_call_references()
+        for (call_address, call_ref) in call_refs:
+            edges.append((call_address, call_ref, Direct, ''))
+
+        for (call_address, operands) in indirect_reg_call_refs:
+            if len(operands)>0:
+                operand_str = str(self.Analysis.get_operand_string(operands[0]))
+            else:
+                operand_str = ''
+            edges.append((call_address, 0, Indirect, operand_str))
+
+        edges.sort()
+        return edges
+
+    def build(self):
+        self.FunctionEdges = {}
+        self.PendingFunctions = set()
+        for function_start in self.Analysis.get_function_starts():
+            edges = self.get_function_edges(function_start)
+            if edges != None:
+                self.FunctionEdges[function_start] = edges
+        self.Built = True
+        self.Dirty = True
+
+    def invalidate(self, function_start = None):
+        if function_start == None:
+            self.FunctionEdges = {}
+            self.PendingFunctions = set()
+            self.Built = False
+            self.Dirty = True
+        else:
+            self.PendingFunctions.add(function_start)
+
+    def __update_overlay(self):
+        for function_start in self.PendingFunctions:
+            for (site, target_address, flags, operand_str) in self.FunctionEdges.pop(function_start, []):
+                self.Operands.pop(site, None)
+
+            edges = self.get_function_edges(function_start)
+            if edges != None:
+                self.FunctionEdges[function_start] = edges
+                for (site, target_address, flags, operand_str) in edges:
+                    if flags == Indirect:
+                        self.Operands[site] = operand_str
+            self.Overlay[function_start] = edges
+        self.PendingFunctions = set()
+
+        if len(self.Overlay) > self.OverlayLimit:
+            self.Dirty = True
+            return
+
+        overlay_callers = {}
+        for (function_start, edges) in self.Overlay.items():
+            for (site, target_address, flags, operand_str) in edges or []:
+                if flags == Direct:
+                    overlay_callers.setdefault(target_address, []).append((site, function_start))
+        self.OverlayCallers = overlay_callers
+
+    def __refresh(self, merge = False):
+        if not self.Built and self.Analysis != None:
+            self.build()
+
+        if self.PendingFunctions and self.Analysis != None:
+            self.__update_overlay()
+        self.PendingFunctions = set()
+
+        if merge and self.Overlay:
+            self.Dirty = True
+
+        if not self.Dirty:
+            return
+
+        nodes = sorted(self.FunctionEdges.keys())
+        node_index = dict((node, i) for (i, node) in enumerate(nodes))
+
+        out_starts = [0]
+        out_targets = []
+        out_target_addresses = []
+        out_sites = []
+        out_flags = []
+        unresolved_callers = {}
+        operands = {}
+        in_edges = [[] for node in nodes]
+        for (i, node) in enumerate(nodes):
+            for (site, target_address, flags, operand_str) in self.FunctionEdges[node]:
+                target = node_index.get(target_address, -1)
+                out_targets.append(target)
+                out_target_addresses.append(target_address)
+                out_sites.append(site)
+                out_flags.append(flags)
+                if flags == Indirect:
+                    operands[site] = operand_str
+
+                if target >= 0:
+                    in_edges[target].append((i, site))
+                elif flags == Direct:
+                    unresolved_callers.setdefault(target_address, []).append((site, node))
+            out_starts.append(len(out_targets))
+
+        in_starts = [0]
+        in_sources = []
+        in_sites = []
+        for edges in in_edges:
+            for (source, site) in sorted(edges):
+                in_sources.append(source)
+                in_sites.append(site)
+            in_starts.append(len(in_sources))
+
+        self.Nodes = idatool.table.create_address_array(nodes)
+        self.NodeIndex = node_index
+        self.OutStarts = array.array('l', out_starts)
+        self.OutTargets = array.array('l', out_targets)
+        self.OutTargetAddresses = idatool.table.create_address_array(out_target_addresses)
+        self.OutSites = idatool.table.create_address_array(out_sites)
+        self.OutFlags = array.array('B', out_flags)
+        self.InStarts = array.array('l', in_starts)
+        self.InSources = array.array('l', in_sources)
+        self.InSites = idatool.table.create_address_array(in_sites)
+        self.UnresolvedCallers = unresolved_callers
+        self.Operands = operands
+        self.Overlay = {}
+        self.OverlayCallers = {}
+        self.Dirty = False
+
+    def get_node(self, function_start):
+        self.__refresh(merge = True)
+        return self.NodeIndex.get(function_start, -1)
+
+    def get_node_address(self, node):
+        return self.Nodes[node]
+
+    def __len__(self):
+        self.__refresh()
+        return len(self.FunctionEdges)
+
+    def get_out_degree(self, function_start):
+        return len(list(self.get_callees(function_start)))
+
+    def get_in_degree(self, function_start):
+        self.__refresh()
+        if not self.Overlay:
+            node = self.NodeIndex.get(function_start, -1)
+            if node < 0:
+                return 0
+            return self.InStarts[node+1]-self.InStarts[node]
+        return len(self.get_callers(function_start))
+
+    def get_callees(self, function_start):
+        self.__refresh()
+        if function_start in self.Overlay:
+            return [(site, target_address, flags) for (site, target_address, flags, operand_str) in self.Overlay[function_start] or []]
+
+        node = self.NodeIndex.get(function_start, -1)
+        if node < 0:
+            return []
+
+        return [(self.OutSites[i], self.OutTargetAddresses[i], self.OutFlags[i]) for i in range(self.OutStarts[node], self.OutStarts[node+1], 1)]
+
+    def get_callers(self, function_start):
+        self.__refresh()
+        if not function_start in self.FunctionEdges:
+            return []
+
+        node = self.NodeIndex.get(function_start, -1)
+        if node < 0:
+            callers = [(site, source) for (site, source) in self.UnresolvedCallers.get(function_start, [])]
+        else:
+            callers = [(self.InSites[i], self.Nodes[self.InSources[i]]) for i in range(self.InStarts[node], self.InStarts[node+1], 1)]
+
+        if self.Overlay:
+            callers = [(site, source) for (site, source) in callers if not source in self.Overlay]
+            callers += self.OverlayCallers.get(function_start, [])
+            callers.sort(key = lambda caller: (caller[1], caller[0]))
+        return callers
+
+    def get_operand_string(self, site):
+        return self.Operands.get(site, '')
+
+    def save(self, filename, header = {}):
+        self.__refresh()
+
+        header = dict(header)
+        header['Version'] = Version
+
+        fd = gzip.open(filename, 'wb')
+        fd.write((json.dumps(header)+'\n').encode('utf-8'))
+        for function_start in sorted(self.FunctionEdges.keys()):
+            record = {'Function': function_start, 'Edges': self.FunctionEdges[function_start]}
+            fd.write((json.dumps(record, separators = (',', ':'))+'\n').encode('utf-8'))
+        fd.close()
+
+    def load(self, filename):
+        fd = gzip.open(filename, 'rb')
+        header = json.loads(fd.readline().decode('utf-8'))
+        if header.get('Version') != Version:
+            fd.close()
+            return None
+
+        self.FunctionEdges = {}
+        self.PendingFunctions = set()
+        for line in fd:
+            record = json.loads(line.decode('utf-8'))
+            self.FunctionEdges[record['Function']] = [tuple(edge) for edge in record['Edges']]
+        fd.close()
+
+        self.Built = True
+        self.Dirty = True
+        return header
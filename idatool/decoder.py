@@ -0,0 +1,115 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from idaapi import *
+
+import idatool.operandtypes
+import idatool.util
+
+DataTypeSizes = {
+    dt_byte: 1,
+    dt_word: 2,
+    dt_dword: 4,
+    dt_float: 4,
+    dt_double: 8,
+    dt_qword: 8,
+    dt_byte16: 16,
+    dt_byte32: 32,
+    dt_byte64: 64
+}
+
+Scales = (1, 2, 4, 8)
+
+def get_native_size():
+    try:
+        inf = get_inf_structure()
+        if inf.is_32bit():
+            return 32
+        elif inf.is_64bit():
+            return 64
+        else:
+            return 16
+    except Exception as ex:
+        raise RuntimeError("Can't determine native OS size: %s" % ex)
+
+class DecoderContext:
+    Memoize = True
+
+    def __init__(self):
+        self.NativeSize = get_native_size()
+        self.NativeWidth = self.NativeSize//8
+        self.RegisterNames = {}
+
+        self.TypeNames = dict(idatool.operandtypes.Values)
+        self.DataTypeNames = dict(enumerate(idatool.operandtypes.DTypeStr))
+
+    def get_register_name(self, reg, dtyp = None):
+        if not self.Memoize:
+            if dtyp == None:
+                return get_reg_name(reg, get_native_size()//8)
+            return get_reg_name(reg, DataTypeSizes.get(dtyp))
+
+        if dtyp == None:
+            width = self.NativeWidth
+        else:
+            width = DataTypeSizes.get(dtyp)
+
+        key = (reg, width)
+        name = self.RegisterNames.get(key)
+        if name == None:
+            name = get_reg_name(reg, width)
+            self.RegisterNames[key] = name
+        return name
+
+    def decode_operand(self, operand):
+        if operand.type == o_void:
+            return None
+
+        operand_repr = {}
+        operand_repr['DataType'] = self.DataTypeNames.get(operand.dtyp)
+        operand_repr['Type'] = self.TypeNames.get(operand.type)
+        if operand_repr['Type'] == None:
+            operand_repr['Type'] = '%x' % operand.type
+
+        operand_repr['TypeValue'] = operand.type
+
+        if operand.type == o_far or operand.type == o_near:
+            operand_repr['Value'] = operand.addr
+
+        elif operand.type == o_reg:
+            operand_repr['Value'] = self.get_register_name(operand.reg, operand.dtyp)
+
+        elif operand.type == o_imm:
+            operand_repr['Value'] = operand.value
+
+        else:
+            base_reg = ''
+            index_reg = ''
+            scale = 0
+            if operand.specflag1:
+                base  = operand.specflag2 & 0x7
+                index = (operand.specflag2 & 0x38) >> 3
+                scale = (operand.specflag2 & 0xc0) >> 6
+
+                if base != 5 or operand.type != o_mem:
+                    base_reg = self.get_register_name(base)
+
+                if index != 4:
+                    index_reg = self.get_register_name(index)
+            else:
+                if operand.phrase != 5 or operand.type != o_mem:
+                    base_reg = self.get_register_name(operand.phrase)
+
+            operand_repr['Base'] = base_reg
+            operand_repr['Scale'] = Scales[scale]
+            operand_repr['Index'] = index_reg
+
+            if operand.type == o_mem:
+                operand_repr['Address'] = operand.addr
+                operand_repr['Segment'] = idatool.util.Seg.get_name(operand.addr)
+
+            elif operand.type == o_displ:
+                operand_repr['Offset'] = operand.addr
+
+        return operand_repr
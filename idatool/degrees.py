@@ -0,0 +1,71 @@
+class DegreeTable:
+    def __init__(self, analysis = None):
+        self.Analysis = analysis
+        self.InDegrees = {}
+        self.OutDegrees = {}
+        self.SortedInDegrees = None
+        self.Built = False
+
+    def build(self):
+        self.InDegrees = {}
+        self.OutDegrees = {}
+        for function_start in self.Analysis.get_function_starts():
+            self.InDegrees[function_start] = 0
+            self.OutDegrees[function_start] = 0
+
+        for (caller, to) in self.Analysis.iterate_call_references():
+            if to in self.InDegrees:
+                self.InDegrees[to] += 1
+                self.OutDegrees[caller] = self.OutDegrees.get(caller, 0)+1
+        self.SortedInDegrees = None
+        self.Built = True
+
+    def invalidate(self):
+        self.Built = False
+
+    def __refresh(self):
+        if not self.Built:
+            self.build()
+
+    def update(self, caller, to, delta):
+        if not self.Built or not to in self.InDegrees:
+            return
+
+        self.InDegrees[to] = max(0, self.InDegrees[to]+delta)
+        if caller in self.OutDegrees:
+            self.OutDegrees[caller] = max(0, self.OutDegrees[caller]+delta)
+        self.SortedInDegrees = None
+
+    def get_in_degree(self, function_start):
+        self.__refresh()
+        return self.InDegrees.get(function_start, 0)
+
+    def get_out_degree(self, function_start):
+        self.__refresh()
+        return self.OutDegrees.get(function_start, 0)
+
+    def get_threshold(self, threshold = 10, percentile = None):
+        if percentile == None:
+            return threshold
+
+        self.__refresh()
+        if self.SortedInDegrees == None:
+            self.SortedInDegrees = sorted(self.InDegrees.values())
+
+        if len(self.SortedInDegrees) == 0:
+            return threshold
+
+        index = min(len(self.SortedInDegrees)-1, int(len(self.SortedInDegrees)*percentile/100.0))
+        return max(1, self.SortedInDegrees[index])
+
+    def is_utility(self, function_start, threshold):
+        return self.get_in_degree(function_start) >= threshold
+
+    def get_utility_functions(self, threshold = 10, percentile = None):
+        self.__refresh()
+        threshold = self.get_threshold(threshold, percentile)
+        utility_functions = {}
+        for (function_start, in_degree) in self.InDegrees.items():
+            if in_degree >= threshold:
+                utility_functions[function_start] = True
+        return utility_functions
@@ -3,13 +3,12 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 from collections import *
-import math
-import json
 import hashlib
 import re
-import copy
 import logging
 import sqlite3
+import time
+import zlib
 
 from idaapi import *
 from idautils import *
@@ -18,52 +17,76 @@ import idc
 
 from optparse import OptionParser, Option
 
+import idatool.analysis
 import idatool.operandtypes
 import idatool.block
+import idatool.cache
+import idatool.callgraph
+import idatool.decoder
+import idatool.filters
+import idatool.graph
+import idatool.hashing
+import idatool.hashstore
+import idatool.immediates
+import idatool.snapshot
+import idatool.table
 import idatool.util
 
-class Disasm:
+class Disasm(idatool.analysis.Analysis):
     Debug = 0
+    FilterPushdown = True
     
-    def __init__(self, exit_idc = False):
+    def __init__(self, exit_idc = False, cache_filename = ''):
         self.ExitIDC = exit_idc
         self.logger = logging.getLogger(__name__)
 
         self.ImageName = get_root_filename()
         self.ImageBase = get_imagebase()        
         self.wait_analysis()
+        self.Decoder = idatool.decoder.DecoderContext()
+
+        self.FunctionGraphs = idatool.graph.FunctionGraphCache()
+        self.IDBChanged = False
+        self.PersistedIndexes = False
+        if IDA_SDK_VERSION < 700:
+            self.FunctionHooks = idatool.util.FunctionHooks(self.on_function_changed)
+            self.FunctionListHooks = idatool.util.FunctionListHooks(self.on_function_added, self.on_function_deleted, self.commit_idb_changes)
+            self.FunctionListHooks.hook()
+        else:
+            self.FunctionHooks = idatool.util.FunctionHooks(self.on_function_changed, self.on_function_added, self.on_function_deleted, self.commit_idb_changes)
+            self.FunctionListHooks = None
+        self.FunctionHooks.hook()
+        self.XrefHooks = idatool.util.XrefHooks(self.on_cref_changed)
+        self.XrefHooks.hook()
+
+        self.Cache = None
+        if not cache_filename:
+            cache_filename = os.environ.get('IDATOOL_CACHE', '')
+
+        if cache_filename:
+            self.open_cache(cache_filename)
+
+    def open_cache(self, filename):
+        self.close_cache()
+        self.Cache = idatool.cache.AnalysisCache(filename, self.get_file_hash(), self.get_idb_counter(), self.get_idb_counter)
+
+    def close_cache(self):
+        if self.Cache != None:
+            statistics = self.Cache.get_statistics()
+            self.logger.info('Analysis cache: %d hits, %d misses', statistics['Hits'], statistics['Misses'])
+            self.Cache.close()
+            self.Cache = None
+
+    def get_cache_statistics(self):
+        if self.Cache == None:
+            return {}
+        return self.Cache.get_statistics()
 
     def get_native_size(self):
-        try:
-            inf = get_inf_structure()
-            if inf.is_32bit():
-                return 32
-            elif inf.is_64bit():
-                return 64
-            else:
-                return 16
-        except Exception as ex:
-            raise RuntimeError("Can't determine native OS size: %s" % ex)
+        return idatool.decoder.get_native_size()
 
     def get_data_type_size(self, dtyp):
-        if dtyp == dt_byte:
-            return 1
-        elif dtyp == dt_word:
-            return 2            
-        elif dtyp == dt_dword:
-            return 4
-        elif dtyp == dt_float:
-            return 4
-        elif dtyp == dt_double:
-            return 8
-        elif dtyp == dt_qword:
-            return 8
-        elif dtyp == dt_byte16:
-            return 16            
-        elif dtyp == dt_byte32:
-            return 32
-        elif dtyp == dt_byte64:
-            return 64
+        return idatool.decoder.DataTypeSizes.get(dtyp)
 
     def make_address_info(self, rva, name):
         address_info = {}
@@ -77,12 +100,7 @@ class Disasm:
 
 
     def is_in_segment(self, addr):
-        for i in range(0, get_segm_qty(), 1):
-            seg = getnseg(i)
-            seg_name = get_segm_name(seg)
-            if seg.startEA <= addr and addr <= seg.endEA:
-                return True
-        return False
+        return idatool.util.Seg.is_in_segment(addr)
 
     def get_addresses(self, interval = 4):
         for i in range(0, get_segm_qty(), 1):
@@ -107,6 +125,9 @@ class Disasm:
         return None
 
     """Utility"""
+    def get_current_address(self):
+        return idatool.util.Area.get_selection_start()
+
     def dump_bytes(self, ea, length):
         return GetManyBytes(ea, length)
 
@@ -119,12 +140,40 @@ class Disasm:
     def get_file_hash(self):
         return GetInputFileMD5()
 
+    def get_idb_stamp(self):
+        try:
+            stat = os.stat(idc.GetIdbPath())
+        except (OSError, TypeError):
+            return '0:0'
+        return '%d:%d' % (stat.st_size, int(stat.st_mtime))
+
+    def get_idb_counter(self):
+        if self.IDBChanged:
+            self.IDBChanged = False
+            idatool.util.Generation.bump()
+        return '%s:%d' % (self.get_idb_stamp(), idatool.util.Generation.get())
+
+    def has_persisted_state(self):
+        if self.Cache != None or self.PersistedIndexes:
+            return True
+
+        for kind in ('immediates', 'callgraph'):
+            if os.path.isfile(self.get_index_filename(kind)):
+                return True
+        return False
+
+    def commit_idb_changes(self):
+        if not self.IDBChanged or not self.has_persisted_state():
+            return
+
+        if self.Cache != None:
+            self.Cache.flush()
+        else:
+            self.get_idb_counter()
+
     """ Instruction level function """
     def get_register_name(self, reg, dtyp = None):
-        if dtyp == None:
-            return get_reg_name(reg, self.get_native_size()/8)
-        else:
-            return get_reg_name(reg, self.get_data_type_size(dtyp))
+        return self.Decoder.get_register_name(reg, dtyp)
 
     def get_disassemble_line(self, ea):
         return tag_remove(generate_disasm_line(ea, 0))
@@ -160,169 +209,107 @@ class Disasm:
         print('')
 
     def get_operand(self, operand):
-        operand_repr = None
+        if operand.type != o_void and self.Debug>3 and self.logger.isEnabledFor(logging.DEBUG):
+            self.print_operand_structure(operand)
 
-        if operand.type != o_void:
-            if self.Debug>3 and self.logger.isEnabledFor(logging.DEBUG):
-                self.print_operand_structure(op)
+        return self.Decoder.decode_operand(operand)
         
-            operand_repr = {}
-            operand_repr['DataType'] = idatool.operandtypes.DTypeStr[operand.dtyp]
-            if operand.type in idatool.operandtypes.Values:
-                operand_repr['Type'] = idatool.operandtypes.Values[operand.type]
-            else:
-                operand_repr['Type'] = '%x' % operand.type
+    def get_operand_types(self, ea):
+        operand_types = []
+        if decode_insn(ea) == 0:
+            return operand_types
 
-            operand_repr['TypeValue'] = operand.type
+        for operand in cmd.Operands:
+            if not operand or operand.type == o_void:
+                break
+            operand_types.append(operand.type)
+        return operand_types
 
-            if operand.type == o_far:
-                operand_repr['Value'] = operand.addr
+    def precheck_instruction_filter(self, filter, ea):
+        filter = idatool.filters.compile_filter(filter)
+        if filter == None:
+            return True
 
-            elif operand.type == o_near:
-                operand_repr['Value'] = operand.addr
+        if not filter.match_op(GetMnem(ea)):
+            return False
 
-            elif operand.type == o_reg:
-                operand_repr['Value'] = self.get_register_name(operand.reg, operand.dtyp)
+        if filter.needs_operand_types() and not filter.match_operand_types(self.get_operand_types(ea)):
+            return False
 
-            elif operand.type == o_imm:
-                operand_repr['Value'] = operand.value
+        return True
 
-            else:
-                base_reg = ''
-                index_reg = ''
-                scale = 0
-                if operand.specflag1:
-                    base  = operand.specflag2 & 0x7
-                    index = (operand.specflag2 & 0x38) >> 3
-                    scale = (operand.specflag2 & 0xc0) >> 6
-
-                    if base != 5 or operand.type != o_mem:
-                        base_reg = self.get_register_name(base)
-                        
-                    if index != 4:
-                        index_reg = self.get_register_name(index)
-                else:
-                    if operand.phrase != 5 or operand.type != o_mem:
-                        base_reg = self.get_register_name(operand.phrase)
+    def get_instruction_bytes(self, ea):
+        return GetManyBytes(ea, ItemSize(ea))        
+
+    def get_instruction(self, current, filter = None, fields = None, lazy = False):
+        if not isCode(GetFlags(current)):
+            return None
 
-                operand_repr['Base'] = base_reg
-                operand_repr['Scale'] = int(math.pow(2, scale))
-                operand_repr['Index'] = index_reg
+        filter = idatool.filters.compile_filter(filter)
+        if self.FilterPushdown and not self.precheck_instruction_filter(filter, current):
+            return None
 
-                if operand.type == o_mem:
-                    operand_repr['Address'] = operand.addr
-                    operand_repr['Segment'] = idatool.util.Seg.get_name(operand.addr)
+        values = {}
+        values['Type'] = "Instruction"
+        values['RVA'] = current-self.ImageBase
+        values['Address'] = current
+        instruction = idatool.table.LazyInstruction(self.load_instruction_field, values, idatool.table.get_instruction_fields(fields))
 
-                elif operand.type == o_displ:            
-                    operand_repr['Offset'] = operand.addr
+        if not self.match_instruction_filter(filter, instruction):
+            return None
 
-        return operand_repr
-        
-    def get_operand_string(self, operand):
-        operand_str = ''
-        if operand['Type'] == "Void":
-            pass
-        elif operand['Type'] == "Far" or \
-             operand['Type'] == "Near":
-            operand_str = operand['Value']
-
-        elif operand['Type'] == "Register":
-            operand_str = operand['Value']
-
-        elif operand['Type'] == "Immediate" or \
-             operand['Type'] == "Memory":
-            if 'Value' in operand:
-                operand_str = operand['Value']
-
-        elif operand['Type'] == "Displacement":
-            index_str = ''
-            if operand['Index']:
-                index_str = '+%s' % operand['Index']
-
-            if operand['Scale'] == 1:
-                operand_str = '%s%s+%d' % (operand['Base'], index_str, operand['Offset'])
+        if lazy:
+            return instruction
+        return instruction.to_dict()
+
+    def load_instruction_field(self, instruction, key):
+        current = instruction['Address']
+        if key == 'Size':
+            instruction['Size'] = get_item_size(current)
+
+        elif key == 'Disasm':
+            instruction['Disasm'] = self.get_disassemble_line(current)
+
+        elif key == 'Op':
+            instruction['Op'] = GetMnem(current)
+
+        elif key in ('DREFFrom', 'CREFFrom'):
+            (crefs, drefs) = idatool.util.Refs.get_xrefs_from(current)
+            instruction['DREFFrom'] = drefs
+            instruction['CREFFrom'] = crefs
+
+        elif key in ('IsCall', 'IsIndirectRegCall', 'Operands'):
+            self.__decode_instruction(instruction)
+
+        elif key == 'Name':
+            name = get_true_name(current)
+            if name != None and name and not idatool.util.Name.is_reserved(name):
+                instruction['Name'] = name
             else:
-                operand_str = '%s*%s%s+%d' % (operand['Base'], operand['Scale'], index_str, operand['Index'])
+                instruction['Name'] = ''
 
-        elif operand['Type'] == "Phrase":
-            operand_str = ''
-            
-        return operand_str
-
-    def get_filter(self, type):
-        if type == "CallToSection":
-            filter = {'Op': ['call'], 'Target': 'Section'}
-        elif type == "IndirectCall":
-            filter = {'Op': ['call', 'jmp'], 'Target': 'Indirect'}
-        elif type == 'Pointer':
-            filter = {'Op': ['mov'], 'Target': 'Pointer'}
-        elif type == 'DisplacementCall':
-            filter = {'Op': ['call'], 'Target': 'Displacement'}
-        else:
-            filter = {}
-        return filter
-
-    def match_instruction_filter(self, filter, instruction):
-        if filter != None:
-            if 'Op' in filter:
-                if not instruction['Op'] in filter['Op']:
-                    return False
-
-            if 'Target' in filter:
-                matched = False
-                if filter['Target'] == 'Displacement':
-                    for operand in instruction['Operands']:
-                        if operand['Type'] == 'Displacement':
-                            matched = True
-
-                elif filter['Target'] == 'Immediate':
-                    for operand in instruction['Operands']:
-                        if operand['Type'] == 'Immediate':
-                            matched = True                            
-
-                elif filter['Target'] == 'Pointer':
-                    for operand in instruction['Operands']:
-                        if operand['Type'] == 'Displacement':
-                            if operand['Base'] != 'esp' and operand['Base'] != 'ebp':
-                                matched = True
-
-                elif filter['Target'] == 'Indirect':
-                    operand_type = instruction['Operands'][0]['Type']
-                    if operand_type == 'Register':
-                        matched = True
-                    elif operand_type == 'Memory':
-                        if instruction['Operands'][0]['Segment'] != '_idata':
-                            matched = True
-                    elif operand_type == 'Displacement':
-                        matched = True
-
-                elif filter['Target'] == 'Section':
-                    operand_type = instruction['Operands'][0]['Type']
-                    if operand_type == 'Memory':
-                        matched = True
-
-                if not matched:
-                    return False
-        return True
+        elif key == 'Comment':
+            cmt = get_cmt(current, 0)
+            if cmt != None and cmt:
+                instruction['Comment'] = cmt
+            else:
+                instruction['Comment'] = ''
 
-    def get_instruction_bytes(self, ea):
-        return GetManyBytes(ea, ItemSize(ea))        
+        elif key == 'Repeatable Comment':
+            repeatable_cmt = get_cmt(current, 1)
+            if repeatable_cmt != None and repeatable_cmt:
+                instruction['Repeatable Comment'] = repeatable_cmt
+            else:
+                instruction['Repeatable Comment'] = ''
 
-    def get_instruction(self, current, filter = None):
-        if not isCode(GetFlags(current)):
-            return None
+        else:
+            raise KeyError(key)
 
-        instruction = {}
-        instruction['Type'] = "Instruction"
-        instruction['RVA'] = current-self.ImageBase
-        instruction['Address'] = current
-        instruction['Size'] = get_item_size(current)        
-        instruction['Disasm'] = self.get_disassemble_line(current)
-        op = GetMnem(current)
-        instruction['Op'] = op
-        instruction['DREFFrom'] = idatool.util.Refs.get_dref_from(current)
-        instruction['CREFFrom'] = idatool.util.Refs.get_cref_from(current)
-        
+    def __decode_instruction(self, instruction):
+        current = instruction['Address']
+        op = instruction['Op']
+
+        decode_insn(current)
         feature = cmd.get_canon_feature()
         instruction['IsCall'] = (feature & CF_CALL)
 
@@ -347,7 +334,7 @@ class Disasm:
         use_flags = [CF_USE1, CF_USE2, CF_USE3, CF_USE4, CF_USE5, CF_USE6]
         chg_flags = [CF_CHG1, CF_CHG2, CF_CHG3, CF_CHG4, CF_CHG5, CF_CHG6]
 
-        instruction['Operands'] = []
+        operands = []
         for i in range(0, 6, 1):
             operand = cmd.Operands[i]
             if not operand:
@@ -364,86 +351,82 @@ class Disasm:
                 operand_repr["Chg"] = True
 
             operand_repr['Position'] = i
-            instruction['Operands'].append(operand_repr)
-        
-        name = get_true_name(current)
-        if name != None and name and not idatool.util.Name.is_reserved(name):
-            instruction['Name'] = name
-        else:
-            instruction['Name'] = ''
-
-        cmt = get_cmt(current, 0)
-        if cmt != None and cmt:
-            instruction['Comment'] = cmt
-        else:
-            instruction['Comment'] = ''
-
-        repeatable_cmt = get_cmt(current, 1)
-        if repeatable_cmt != None and repeatable_cmt:
-            instruction['Repeatable Comment'] = repeatable_cmt
-        else:
-            instruction['Repeatable Comment'] = ''
-
-        if self.match_instruction_filter(filter, instruction):
-            return instruction
-
-        return None
-
-    def get_instructionText(self, instruction, include_bytes = False, bytes_width = 10):
-        if instruction['Comment']:
-            cmt = instruction['Comment']
-        else:
-            cmt = ''
-
-        cmt += instruction['Repeatable Comment']
-        
-        if cmt:
-            cmt = '; '+cmt
+            operands.append(operand_repr)
+        instruction['Operands'] = operands
 
-        bytes_str = ''
-        if include_bytes:
-            for byte in self.get_instruction_bytes(instruction['Address']):
-                bytes_str += '%.2x ' % ord(byte)
-
-        if len(bytes_str) < 3*bytes_width:
-            bytes_str += ' ' * (3*bytes_width-len(bytes_str))
-
-        line = '%.8x (+%.8x) %s\t%s%s' % (
-                        instruction['Address'], 
-                        instruction['RVA'], 
-                        bytes_str, 
-                        instruction['Disasm'], 
-                        cmt
-                    )
-
-        return line
-
-    def get_instructionsByRange(self, start = None, end = None, filter = None):
+    def get_instructionsByRange(self, start = None, end = None, filter = None, fields = None, lazy = False):
         if start == None or end == None:
             (start, end) = self.get_selection()
 
-        instructions = []
+        fields = idatool.table.get_instruction_fields(fields)
+        instructions = idatool.table.create_instruction_list(self.ImageBase, fields, lazy)
         current = start
         while current<end:
             if isCode(GetFlags(current)):
-                instruction = self.get_instruction(current, filter = filter)
+                instruction = self.get_instruction(current, filter = filter, fields = fields, lazy = lazy)
                 if instruction != None:
-                    instructions.append()
+                    instructions.append(instruction)
             current += get_item_size(current)
         return instructions
 
-    def get_instructions(self, filter = None):
-        instructions = []
+    def get_instructions(self, filter = None, fields = None, lazy = False):
+        return self.scan_instructions({'': filter}, fields = fields, lazy = lazy)['']
+
+    def scan_instructions(self, filters, fields = None, lazy = False):
+        fields = idatool.table.get_instruction_fields(fields)
+        compiled_filters = []
+        results = {}
+        for (name, filter) in filters.items():
+            compiled_filters.append((name, idatool.filters.compile_filter(filter)))
+            results[name] = idatool.table.create_instruction_list(self.ImageBase, fields, lazy)
+
+        needs_op = False
+        needs_operand_types = False
+        for (name, filter) in compiled_filters:
+            if filter == None or not self.FilterPushdown:
+                continue
+            if filter.Ops != None:
+                needs_op = True
+            if filter.needs_operand_types():
+                needs_operand_types = True
+
         for i in range(0, get_segm_qty(), 1):
             seg = getnseg(i)
             current = seg.startEA
             while current<seg.endEA:        
                 if isCode(GetFlags(current)):
-                    instruction = self.get_instruction(current, filter = filter)
-                    if instruction != None:
-                        instructions.append(instruction)
+                    op = None
+                    if needs_op:
+                        op = GetMnem(current)
+
+                    operand_types = None
+                    if needs_operand_types:
+                        operand_types = self.get_operand_types(current)
+
+                    candidates = []
+                    for (name, filter) in compiled_filters:
+                        if filter != None and self.FilterPushdown:
+                            if filter.Ops != None and not filter.match_op(op):
+                                continue
+                            if filter.needs_operand_types() and not filter.match_operand_types(operand_types):
+                                continue
+                        candidates.append((name, filter))
+
+                    if len(candidates)>0:
+                        instruction = self.get_instruction(current, fields = fields, lazy = True)
+                        if instruction != None:
+                            matched_names = []
+                            for (name, filter) in candidates:
+                                if filter == None or filter.match(instruction):
+                                    matched_names.append(name)
+
+                            if len(matched_names)>0 and not lazy:
+                                instruction = instruction.to_dict()
+
+                            for name in matched_names:
+                                results[name].append(instruction)
                 current += get_item_size(current)
-        return instructions
+        return results
 
     def get_instructionsByType(self, range_str = '', type = ""):
         for instruction in self.get_instructions(filter = self.get_filter(type)):
@@ -566,363 +549,243 @@ class Disasm:
 
         return args
 
-    def __get_function_instructions(self, ea = None, filter = None, type = 'Instruction'):
-        if ea == None:
-            ea = idatool.util.Area.get_selection_start()
+    def __decode_function(self, start):
+        (instructions, block_starts, block_ends) = self.__decode_function_instructions(start)
+        instructions = [instruction.to_dict() for instruction in instructions]
+        return idatool.graph.FunctionGraph(start, instructions, block_starts.keys(), block_ends.keys())
 
-        func = get_func(ea)
-        if func:
-            ea = func.startEA
-            
+    def __decode_function_instructions(self, start, fields = None):
         instructions = []
-        block_starts = {}
+        decoded = {}
+        block_starts = {start:1}
         block_ends = {}
 
-        block_start_map = {func.startEA:1}
-        block_start_list = [func.startEA]
-        crefs_map = {}
+        block_start_list = [start]
         for block_start in block_start_list:
             current = block_start
+            last_address = None
             while 1:
-                instruction = self.get_instruction(current)
+                if current in decoded:
+                    block_starts[current] = 1
+                    break
+
+                instruction = self.get_instruction(current, fields = fields, lazy = True)
                 if instruction == None:
                     break
 
-                if self.match_instruction_filter(filter, instruction):                        
-                    if type == 'Instruction':
-                        yield instruction
-                    instructions.append(instruction)
+                decoded[current] = 1
+                instructions.append(instruction)
+                last_address = current
 
                 if instruction['Op'].startswith('ret'):
                     break
 
                 found_jmp = False
-                crefs_map[current] = []
                 for (cref_type, cref) in instruction['CREFFrom']:
                     if cref_type == 'Jmp':
                         found_jmp = True
 
-                    if type == 'Map' and cref_type != 'Call':
-                        crefs_map[current].append(cref)
-
                 if found_jmp:
                     for (cref_type, cref) in instruction['CREFFrom']:
                         if cref_type != 'Call':
                             if not cref in block_starts:
                                 if self.Debug>1:
                                     self.logger.debug("Found basic block: %.8x" % cref)
-
-                                block_starts[cref] = 1
                                 block_start_list.append(cref)
-
-                            if cref_type == 'Jmp':
-                                block_starts[cref] = 1
+                            block_starts[cref] = 1
                     break
 
                 current += get_item_size(current)
 
-            if type == 'Block':
-                block_starts[block_start] = 1
-                block_ends[current] = 1
-
-        if type == 'Block' or type == 'Map':
-            current_block_instructions = []
-            last_block_start = 0
-            for instruction in instructions:               
-                if instruction['Address'] in block_starts and len(current_block_instructions)>0:
-                    block_start = current_block_instructions[0]['Address']
-                    block_end = current_block_instructions[-1]['Address']
-                    
-                    if type == 'Map':
-                        if block_end in crefs_map:
-                            for dst in crefs_map[block_end]:
-                                yield (block_start, block_end, dst)
-
-                    elif type == 'Block':
-                        yield (
-                                block_start, 
-                                block_end, 
-                                current_block_instructions
-                              )
-                    current_block_instructions = []
-                    
-                    last_block_start = block_start
-
-                current_block_instructions.append(instruction)
-                if instruction['Address'] in block_ends:
-                    block_start = current_block_instructions[0]['Address']
-                    block_end = current_block_instructions[-1]['Address']
-
-                    if type == 'Map':
-                        if block_end in crefs_map:
-                            for dst in crefs_map[block_end]:
-                                yield (block_start, block_end, dst)
-
-                    elif type == 'Block':
-                        yield (
-                                block_start, 
-                                block_end, 
-                                current_block_instructions
-                              )
-                    current_block_instructions = []
-                    last_block_start = block_start
-
-            if len(current_block_instructions)>0:
-                block_start = current_block_instructions[0]['Address']
-                block_end = current_block_instructions[-1]['Address']
-                if type == 'Map':
-                    if block_end in crefs_map:
-                        for dst in crefs_map[block_end]:
-                            yield (block_start, block_end, dst)
-
-                elif type == 'Block':
-                    yield (
-                            block_start, 
-                            block_end, 
-                            current_block_instructions
-                          )
-
-    def get_jump_address(self, instruction):
-        if not 'CREFFrom' in instruction:
-            return 0
-
-        for (cref_type, cref) in instruction['CREFFrom']:
-            if cref_type == 'Jmp':
-                return cref
-        return 0
-        
-    def get_function_instructions(self, ea = None, filter = None):
-        instructions = []
-        for instruction in self.__get_function_instructions(ea, filter = filter):
-            instructions.append(instruction)
-        return instructions
-        
-    def get_function_blocks(self, ea = None, filter = None):
-        blocks = []
-        for (block_start, block_end, instructions) in self.__get_function_instructions(ea, filter = filter, type = 'Block'):
-            blocks.append((block_start, block_end, instructions))
-        return blocks
+            if last_address != None:
+                block_ends[last_address] = 1
 
-    def get_function_map(self, ea = None):
-        instructions = []
-        src_map = {}
-        dst_map = {}
-        for (src, src_end, dst) in self.__get_function_instructions(ea, type = 'Map'):
-            if not src in src_map:
-                src_map[src] = []
+        return (instructions, block_starts, block_ends)
 
-            src_map[src].append(dst)
+    def get_function_instructions(self, ea = None, filter = None, fields = None, lazy = False):
+        fields = idatool.table.get_instruction_fields(fields)
+        if fields == None and not lazy:
+            return idatool.analysis.Analysis.get_function_instructions(self, ea, filter)
 
-            if not dst in dst_map:
-                dst_map[dst] = []
-            dst_map[dst].append(src)
-            
-        return (src_map, dst_map)
+        func = get_func(idatool.util.Function.get_address(ea))
+        if not func:
+            return []
 
-    def get_block_instructions(self, ea = None, filter = None):
-        for (block_start, block_end, instructions) in self.__get_function_instructions(ea, filter = filter, type = 'Block'):
-            if block_start <= ea and ea <= block_end:
-                return instructions
-        return []
+        if not lazy and self.FunctionGraphs.get(func.startEA) != None:
+            return idatool.analysis.Analysis.get_function_instructions(self, func.startEA, filter, fields = fields)
 
-    def get_function_call_references(self, ea = None, filter = None):
-        indirect_reg_call_refs = []
-        call_refs = []
+        filter = idatool.filters.compile_filter(filter)
         instructions = []
+        for instruction in self.__decode_function_instructions(func.startEA, fields)[0]:
+            if not self.match_instruction_filter(filter, instruction):
+                continue
 
-        for instruction in self.__get_function_instructions(ea, filter = filter):
-            if instruction['IsIndirectRegCall']:
-                indirect_reg_call_refs.append((instruction['Address'], instruction['Operands']))
-
-            for (cref_type, cref) in instruction['CREFFrom']:
-                if cref_type == 'Call':
-                    call_refs.append((instruction['Address'], cref))                   
-
-            if self.match_instruction_filter(filter, instruction):
+            if lazy:
                 instructions.append(instruction)
+            else:
+                instructions.append(instruction.to_dict())
+        return instructions
 
-        return (call_refs, indirect_reg_call_refs, instructions)
-
-    def get_function_references(self, ea = None):
+    def get_function_graph(self, ea = None):
         if ea == None:
             ea = idatool.util.Area.get_selection_start()
 
         func = get_func(ea)
-
         if not func:
-            return []
+            return None
 
-        checked_eas = {func.startEA:1}
-        start_ea_list = [[func.startEA, 0], ]
+        start = func.startEA
+        graph = self.FunctionGraphs.get(start)
+        if graph != None:
+            return graph
+
+        signature = None
+        if self.Cache != None:
+            signature = self.get_function_signature(func)
+            data = self.Cache.get('FunctionGraph', start)
+            if data != None:
+                if data.get('Signature') == signature:
+                    graph = idatool.graph.FunctionGraph.from_dict(data['Graph'])
+                else:
+                    self.Cache.invalidate(start)
 
-        crefs_map = defaultdict(list)
-        back_crefs_map = defaultdict(list)
-        i = 0
-        for [current, end] in start_ea_list:
-            if self.Debug>3:
-                self.logger.debug('* Basic Block: %x', current)
+        if graph == None:
+            graph = self.__decode_function(start)
+            if self.Cache != None:
+                self.Cache.put('FunctionGraph', start, {'Signature': signature, 'Graph': graph.to_dict()})
 
-            current_block_start = current
-            while 1:
-                next_addr = current+get_item_size(current)
-                if isCode(GetFlags(current)):
-                    inslen = decode_insn(current)
-                    if inslen == 0:
-                        break
+        self.FunctionGraphs.put(graph)
+        return graph
 
-                    op = GetMnem(current)
-                    
-                    if self.logger.isEnabledFor(logging.DEBUG):
-                        disasm_line = self.get_disassemble_line(current)
-                        self.logger.debug('%x: %s', current, disasm_line)
+    def get_function_signature(self, func):
+        data = GetManyBytes(func.startEA, func.endEA-func.startEA)
+        if data == None:
+            data = b''
+        return [func.endEA, func.flags, func.tailqty, zlib.crc32(data) & 0xffffffff]
 
-                    if op.startswith('ret'):
-                        break
+    def invalidate_function(self, ea = None):
+        self.__invalidate_function(ea)
+        self.IDBChanged = True
 
-                    feature = cmd.get_canon_feature()
-                    
-                    if not (feature & CF_CALL):
-                        found_non_next_addr = False
-                        for (cref_type, cref) in idatool.util.Refs.get_cref_from(current):
-                            if cref_type == 'Next':
-                                continue
+    def __invalidate_function(self, ea):
+        if ea == None:
+            self.FunctionGraphs.invalidate()
+            self.FunctionHashSets = None
+            if self.ImmediateIndex != None:
+                self.ImmediateIndex.invalidate()
+            if self.MnemonicIndex != None:
+                self.MnemonicIndex.invalidate()
+            if self.CallGraph != None:
+                self.CallGraph.invalidate()
+            if self.DegreeTable != None:
+                self.DegreeTable.invalidate()
+            if self.Cache != None:
+                self.Cache.invalidate()
+            return
 
-                            found_non_next_addr = True
-                            crefs_map[current_block_start].append(cref)
-                            back_crefs_map[cref].append(current_block_start)
-                            self.logger.debug('\t%x', cref)
+        func = get_func(ea)
+        if not func:
+            return
 
-                            if not cref in checked_eas:
-                                checked_eas[cref] = 1
-                                start_ea_list.append([cref, 0])
-                                
-                        if found_non_next_addr:
-                            break
+        self.FunctionGraphs.invalidate(func.startEA)
+        if self.FunctionHashSets != None and func.startEA in self.FunctionHashSets:
+            del self.FunctionHashSets[func.startEA]
 
-                else:
-                    break
-                current = next_addr
+        if self.ImmediateIndex != None:
+            self.ImmediateIndex.invalidate(func.startEA)
 
-            if start_ea_list[i][1] == 0:
-                start_ea_list[i][1] = current+get_item_size(current)
-            i += 1
-                
-        return (start_ea_list, crefs_map, back_crefs_map)
+        if self.MnemonicIndex != None:
+            self.MnemonicIndex.invalidate(func.startEA)
 
-    def get_function_name(self, ea):
-        return get_func_name(ea)
+        if self.CallGraph != None:
+            self.CallGraph.invalidate(func.startEA)
 
-    def get_instructions_hash(self, instructions, hash_types = ['Op', 'imm_operand']):
-        op_string = ''
-        for instruction in instructions:
-            if 'Op' in hash_types:
-                op_string += instruction['Op']
+        if self.Cache != None:
+            self.Cache.invalidate(func.startEA)
 
-            if len(instruction['DREFFrom']) == 0:
-                for operand in instruction['Operands']:
-                    if 'imm_operand' in hash_types and operand['TypeValue'] == o_imm:
-                        op_string += ('%x' % operand['Value'])
+    def on_function_changed(self, ea):
+        self.invalidate_function(ea)
+        if self.DegreeTable != None:
+            self.DegreeTable.invalidate()
 
-        m = hashlib.sha1()
-        m.update(op_string)
-        return m.hexdigest()
+    def on_function_added(self, ea):
+        self.on_function_changed(ea)
 
-    def get_all_instructions(self, filter = None):
-        instructions = []
-        for i in range(0, get_func_qty(), 1):
-            func = getn_func(i)
+    def on_function_deleted(self, ea):
+        func = get_func(ea)
+        if func:
+            ea = func.startEA
+        self.on_function_changed(ea)
 
-            for instruction in self.get_function_instructions(func.startEA, filter):
-                instructions.append(instruction)
-        return instructions
+    def on_cref_changed(self, frm, to, delta):
+        self.invalidate_function(frm)
+        if self.DegreeTable != None and delta != 0:
+            func = get_func(frm)
+            if func:
+                self.DegreeTable.update(func.startEA, to, delta)
 
-    def find_immediate_segments_references(self):
-        instructions = []
-        for instruction in self.get_all_instructions(filter = {'Target': 'Immediate'}):
-            imm_operands = []
-            for operand in instruction['Operands']:
-                if operand['Type'] == 'Immediate' and self.is_in_segment(operand['Value']):
-                    imm_operands.append(operand['Value'])
-                    
-            if len(imm_operands)>0:
-                instructions.append((instruction, imm_operands))
+    def get_code_reference_count(self, ea):
+        return len(idatool.util.Refs.get_callers(ea))
 
-        return instructions
-        
-    def dump_paths(self, paths):
-        path_str = ''
-        for path in paths:
-            path_str += '%.8x ' % path
+    def iterate_call_references(self):
+        for function_start in self.get_function_starts():
+            for (frm, caller) in idatool.util.Refs.get_callers(function_start):
+                yield (caller, function_start)
 
-        return path_str
-    
-    def enumerate_paths(self, src_map, src, visited_nodes = {}, paths = [], loops = {}):
-        index = 0
-        for path in paths:
-            if path == src:
-                break
-            index += 1
+    def get_index_filename(self, kind):
+        return os.path.splitext(idc.GetIdbPath())[0]+'.%s.gz' % kind
 
-        if src in visited_nodes:
-            return
+    def __open_index(self, index, filename):
+        header = None
+        if os.path.isfile(filename):
+            header = index.load(filename)
 
-        if index != len(paths):
-            loops[str(paths[index:])] = paths[index:]
-            return
+        if header == None or header.get('FileHash') != self.get_file_hash() or header.get('IDBCounter') != self.get_idb_counter():
+            index.build()
+            try:
+                index.save(filename, {'FileHash': self.get_file_hash(), 'IDBCounter': self.get_idb_counter()})
+            except IOError:
+                self.logger.debug('Cannot save index to %s', filename)
+        self.PersistedIndexes = True
+        return index
+
+    def get_immediate_index(self, filename = ''):
+        if self.ImmediateIndex == None:
+            self.ImmediateIndex = self.__open_index(idatool.immediates.ImmediateIndex(self), filename or self.get_index_filename('immediates'))
+        return self.ImmediateIndex
+
+    def get_call_graph(self, filename = ''):
+        if self.CallGraph == None:
+            self.CallGraph = self.__open_index(idatool.callgraph.CallGraph(self), filename or self.get_index_filename('callgraph'))
+        return self.CallGraph
 
-        if self.Debug>0:
-            print(self.dump_paths(paths + [src]))
-        
-        if src in src_map:
-            visited_nodes = copy.deepcopy(visited_nodes)
-
-            for dst in src_map[src]:
-                self.enumerate_paths(src_map, dst, visited_nodes, paths + [src], loops)
-                visited_nodes[dst] = 1
-        return loops.values()
-
-    def find_function_loops(self, ea = None):
-        (src_map, dst_map) = self.get_function_map(ea)
-
-        roots = []
-        for src in src_map.keys():
-            if not src in dst_map:
-                if self.Debug>0:
-                    print('Root: %.8x' % src)
-                roots.append(src)
-
-        if self.Debug>0:
-            for (src, dst_list) in src_map.items():
-                for dst in dst_list:
-                    print('Dump: %.8x -> %.8x' % (src, dst))
-
-        loops = []
-        for root in roots:
-            loops += self.enumerate_paths(src_map, root, {}, [], {})
-
-        return loops
-
-    def find_loops(self):
-        loops_list = []
-        for function in self.get_functions():
-            loops = self.find_function_loops(function['Address'])
-            
-            if len(loops)>0:
-                loops_list.append(
-                    {
-                        'Function': function, 
-                        'Loops': loops
-                    }
-                )
+    def get_function_name(self, ea):
+        return get_func_name(ea)
 
-        return loops_list
+    def get_function_starts(self):
+        for i in range(0, get_func_qty(), 1):
+            yield getn_func(i).startEA
+
+    def get_all_instructions(self, filter = None, fields = None, lazy = False):
+        if filter == None or not self.FilterPushdown:
+            return idatool.analysis.Analysis.get_all_instructions(self, filter, fields = fields, lazy = lazy)
+
+        filter = idatool.filters.compile_filter(filter)
+        fields = idatool.table.get_instruction_fields(fields)
+        instructions = idatool.table.create_instruction_list(self.ImageBase, fields, lazy)
+        for function_start in self.get_function_starts():
+            for current in FuncItems(function_start):
+                instruction = self.get_instruction(current, filter = filter, fields = fields, lazy = lazy)
+                if instruction != None:
+                    instructions.append(instruction)
+        return instructions
 
     def get_notations(self, hash_types = ['Op', 'imm_operand']):
         function_notes = []
         checked_addresses = {}
 
         if len(hash_types)>0:
-            checked_addresses = self.__get_function_notations(hash_types)
+            (checked_addresses, function_notes) = self.__get_function_notations(hash_types)
 
         for i in range(0, get_segm_qty(), 1):
             seg = getnseg(i)
@@ -950,18 +813,16 @@ class Disasm:
 
     def __get_function_notations(self, hash_types):
         checked_addresses = {}
-        function_notes=[] #TODO: This is not used?
-        for i in range(0, get_func_qty(), 1):
-            func = getn_func(i)
-
-            instructions = []
-            for instruction in self.get_function_instructions(func.startEA):
-                instructions.append(instruction)
+        function_notes = []
+        for function_start in self.get_function_starts():
+            graph = self.get_function_graph(function_start)
+            if graph == None:
+                continue
 
-            function_hash = self.get_instructions_hash(instructions, hash_types)
+            function_hash = self.get_function_hash(function_start, hash_types)
 
             sequence = 0
-            for instruction in instructions:
+            for instruction in graph.get_walk_instructions():
                 checked_addresses[instruction['Address']] = 1
                 rva = instruction['RVA']
                 if instruction['Name']:
@@ -974,17 +835,29 @@ class Disasm:
                     function_notes.append((rva, function_hash, sequence, 'Repeatable Comment', instruction['Repeatable Comment']))
                 sequence += 1
 
-        return checked_addresses
+        return (checked_addresses, function_notes)
 
-    def save_notations(self, filename = 'Notations.db', hash_types = []):        
-        try:
-            conn = sqlite3.connect(filename)
-        except:
-            return
+    NotationsBatchSize = 10000
 
-        c = conn.cursor()
+    def __get_value_hash(self, value):
+        if not isinstance(value, bytes):
+            value = value.encode('utf-8')
+        return hashlib.sha1(value).hexdigest()
 
-        create_table_sql = """CREATE TABLE
+    def __get_notations_source(self, c):
+        if c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'NotationValues'").fetchone() == None:
+            return 'Notations'
+        return '(SELECT Notations.RVA AS RVA, Notations.Hash AS Hash, Notations.Sequence AS Sequence, Notations.Type AS Type, NotationValues.Value AS Value FROM Notations JOIN NotationValues ON NotationValues.id = Notations.ValueId)'
+
+    def __create_notation_tables(self, c):
+        c.execute("""CREATE TABLE
+                            IF NOT EXISTS NotationValues (
+                                id integer PRIMARY KEY, 
+                                ValueHash text NOT NULL UNIQUE, 
+                                Value text
+                            );""")
+
+        c.execute("""CREATE TABLE
                             IF NOT EXISTS Notations (
                                 id integer PRIMARY KEY, 
                                 RVA integer, 
@@ -993,155 +866,208 @@ class Disasm:
                                 Hash text, 
                                 Sequence integer, 
                                 Type text, 
-                                Value text, 
-                                unique (RVA, HashType, HashParam, Hash, Sequence, Type, Value)
-                            );"""
-
-        c.execute(create_table_sql)
-
-        for (address, function_hash, sequence, notation_type, value) in self.get_notations(hash_types = hash_types):
-            if idatool.util.Name.is_reserved(value):
-                continue
+                                ValueId integer, 
+                                unique (RVA, HashType, HashParam, Hash, Sequence, Type, ValueId)
+                            );""")
+
+    def __migrate_notations(self, conn, c):
+        # DDL has to run inside an explicit transaction so a failed migration leaves the old table intact
+        conn.create_function('notation_value_hash', 1, self.__get_value_hash)
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            c.execute('BEGIN')
+            c.execute('ALTER TABLE Notations RENAME TO OldNotations')
+            self.__create_notation_tables(c)
+            c.execute('INSERT OR IGNORE INTO NotationValues (ValueHash, Value) SELECT notation_value_hash(Value), Value FROM (SELECT DISTINCT Value FROM OldNotations WHERE Value IS NOT NULL)')
+            c.execute("""INSERT OR IGNORE INTO Notations (id, RVA, HashType, HashParam, Hash, Sequence, Type, ValueId)
+                            SELECT OldNotations.id, RVA, HashType, HashParam, Hash, Sequence, Type, NotationValues.id
+                            FROM OldNotations LEFT JOIN NotationValues ON NotationValues.Value = OldNotations.Value""")
+            c.execute('DROP TABLE OldNotations')
+            c.execute('COMMIT')
+        except:
+            c.execute('ROLLBACK')
+            raise
+        finally:
+            conn.isolation_level = isolation_level
 
-            try:
-                c.execute('INSERT INTO Notations (RVA, HashType, HashParam, Hash, Sequence, Type, Value) VALUES (?, ?, ?, ?, ?, ?, ?)', 
-                    (str(address), 'FunctionHash', '', function_hash, sequence, notation_type, value))
-            except:
-                print('address:' + str(address))
-                print('function_hash:' + function_hash)
-                print('sequence:' + str(sequence))
-                print('type:' + notation_type)
-                print('value:' + value)
+        self.logger.info('Migrated old notation schema')
 
-        conn.commit()
-        conn.close()
-        
-    def load_notations(self, filename = 'Notations.db', hash_types = []):        
+    def save_notations(self, filename = 'Notations.db', hash_types = []):        
         try:
             conn = sqlite3.connect(filename)
         except:
-            return
+            return None
 
         c = conn.cursor()
+        c.execute('PRAGMA journal_mode = WAL')
+        c.execute('PRAGMA synchronous = NORMAL')
+        c.execute('PRAGMA cache_size = -65536')
 
-        notations = {}
-        for (rva, hash_type, hash_param, hash, seq, notation_type, value) in c.execute('SELECT RVA, HashType, HashParam, Hash, Sequence, Type, Value FROM Notations'):
-            if rva == None or rva == '':
+        if c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'Notations'").fetchone() != None and self.__get_notations_source(c) == 'Notations':
+            self.__migrate_notations(conn, c)
+
+        self.__create_notation_tables(c)
+        c.execute('CREATE INDEX IF NOT EXISTS NotationsHashIndex ON Notations (Hash, Sequence)')
+
+        report = {'Total': 0, 'Inserted': 0, 'Duplicates': 0, 'Conflicts': []}
+        values = []
+        notations = []
+
+        def flush():
+            c.executemany('INSERT OR IGNORE INTO NotationValues (ValueHash, Value) VALUES (?, ?)', values)
+            before_changes = conn.total_changes
+            c.executemany('INSERT OR IGNORE INTO Notations (RVA, HashType, HashParam, Hash, Sequence, Type, ValueId) SELECT ?, ?, ?, ?, ?, ?, id FROM NotationValues WHERE ValueHash = ?', notations)
+            report['Inserted'] += conn.total_changes-before_changes
+            del values[:]
+            del notations[:]
+
+        for (address, function_hash, sequence, notation_type, value) in self.get_notations(hash_types = hash_types):
+            if idatool.util.Name.is_reserved(value):
                 continue
 
-            current_address = self.ImageBase+rva
+            value_hash = self.__get_value_hash(value)
+            values.append((value_hash, value))
+            notations.append((address, 'FunctionHash', '', function_hash, sequence, notation_type, value_hash))
+            report['Total'] += 1
 
-            if len(hash_types) > 0:
-                notations[current_address] = [notation_type, value]
-            else:
-                if notation_type == 'Comment':
-                    idatool.util.Cmt.set(current_address, value)
-                elif notation_type == 'Repeatable Comment':
-                    idatool.util.Cmt.set(current_address, value, 1)
-                elif notation_type in ('Name', 'FuncName'):
-                    if not idatool.util.Name.is_reserved(value):
-                        idatool.util.Name.set_name(current_address, value)            
+            if len(notations) >= self.NotationsBatchSize:
+                flush()
 
-        if len(hash_types) > 0:
-            for i in range(0, get_func_qty(), 1):
-                func = getn_func(i)
+        flush()
+        report['Duplicates'] = report['Total']-report['Inserted']
 
-                instructions = []
-                for instruction in self.get_function_instructions(func.startEA):
-                    instructions.append(instruction)
+        report['Conflicts'] = c.execute("""SELECT RVA, Hash, Sequence, Type, COUNT(*)
+                                            FROM Notations
+                                            GROUP BY RVA, HashType, HashParam, Hash, Sequence, Type
+                                            HAVING COUNT(*) > 1""").fetchall()
 
-                function_hash = self.get_instructions_hash(instructions, hash_types)
+        conn.commit()
+        conn.close()
 
-                if function_hash in notations:
-                    [notation_type, value] = notations[function_hash]
-                    address = func.startEA
-                
-                    if notation_type == 'Comment':
-                        idatool.util.Cmt.set(address, value)
-                    elif notation_type == 'Repeatable Comment':
-                        idatool.util.Cmt.set(address, value, 1)
-                    elif notation_type in ('Name', 'FuncName'):
-                        if not idatool.util.Name.is_reserved(value):
-                            idatool.util.Name.set_name(address, value)
+        self.logger.info('Saved %d notations to %s (%d new, %d duplicates, %d conflicts)', report['Total'], filename, report['Inserted'], report['Duplicates'], len(report['Conflicts']))
+        return report
         
-    def generate_hash_to_name(self, entries, hash_type_filter):
-        hash_2_name = {}
-        for entry in entries:
-            if not 'Name' in entry or not 'Hash' in entry:
+    def __apply_notation(self, address, notation_type, value):
+        if notation_type == 'Comment':
+            idatool.util.Cmt.set(address, value)
+        elif notation_type == 'Repeatable Comment':
+            idatool.util.Cmt.set(address, value, 1)
+        elif notation_type in ('Name', 'FuncName'):
+            if not idatool.util.Name.is_reserved(value):
+                idatool.util.Name.set_name(address, value)
+
+    def get_unique_function_hashes(self, hash_types = idatool.hashing.DefaultHashTypes):
+        hash_to_address = {}
+        duplicate_hashes = set()
+        for function_start in self.get_function_starts():
+            function_hash = self.get_function_hash(function_start, hash_types)
+            if function_hash == None or function_hash in duplicate_hashes:
                 continue
 
-            hash_type = entry['Hash']['Type']
-            if hash_type != hash_type_filter:
+            if function_hash in hash_to_address:
+                del hash_to_address[function_hash]
+                duplicate_hashes.add(function_hash)
                 continue
 
-            hash = entry['Hash']['Value']
-            if not hash in hash_2_name:
-                hash_2_name[hash] = []
-            hash_2_name[hash].append(entry)
-            
-        for (k, v) in hash_2_name.items():
-            if len(v)>1:
-                del hash_2_name[k]
-            else:
-                hash_2_name[k] = v[0]
+            hash_to_address[function_hash] = function_start
+        return hash_to_address
 
-        return hash_2_name
+    def load_notations(self, filename = 'Notations.db', hash_types = []):        
+        try:
+            conn = sqlite3.connect(filename)
+        except:
+            return
 
-    def load_function_name_by_hashes(self, filename):
-        fd = open(filename, 'r')
-        data = json.loads(fd.read())
-        fd.close()
+        c = conn.cursor()
+        notations_source = self.__get_notations_source(c)
 
-        hash_type_filter = ['Op', 'imm_operand']
-        hash_2_name = self.generate_hash_to_name(data['Function Hashes'], hash_type_filter)
-        current_hash_2_name = self.generate_hash_to_name(self.get_function_hashes(), hash_type_filter)
+        if len(hash_types) > 0:
+            sql = "SELECT RVA, Type, Value FROM %s WHERE Hash IS NULL OR Hash = ''" % notations_source
+        else:
+            sql = 'SELECT RVA, Type, Value FROM %s' % notations_source
 
-        function_matches = {}
-        for (k, v) in current_hash_2_name.items():
-            if k in hash_2_name:
-                current_entry = current_hash_2_name[k]
-                import_entry = hash_2_name[k]
+        for (rva, notation_type, value) in c.execute(sql).fetchall():
+            if rva == None or rva == '':
+                continue
+            self.__apply_notation(self.ImageBase+int(rva), notation_type, value)
 
-                current_ea = current_entry['Address']                
-                current_name = current_entry['Name']
-                import_ea = import_entry['Address']
-                import_name = import_entry['Name']
+        if len(hash_types) > 0:
+            c.execute('DROP TABLE IF EXISTS temp.CurrentFunctions')
+            c.execute('CREATE TEMP TABLE CurrentFunctions (Hash text PRIMARY KEY, Address integer)')
+            c.executemany('INSERT INTO temp.CurrentFunctions (Hash, Address) VALUES (?, ?)', self.get_unique_function_hashes(hash_types).items())
+
+            c.execute('DROP TABLE IF EXISTS temp.AmbiguousHashes')
+            c.execute('CREATE TEMP TABLE AmbiguousHashes (Hash text PRIMARY KEY)')
+            c.execute("""INSERT OR IGNORE INTO temp.AmbiguousHashes (Hash)
+                    SELECT notations.Hash
+                    FROM %s AS notations
+                    JOIN temp.CurrentFunctions AS functions ON functions.Hash = notations.Hash
+                    GROUP BY notations.Hash, notations.Sequence, notations.Type
+                    HAVING COUNT(DISTINCT notations.RVA) > 1""" % notations_source)
+
+            sql = """SELECT functions.Address, notations.Sequence, notations.Type, notations.Value
+                    FROM temp.CurrentFunctions AS functions
+                    JOIN %s AS notations ON notations.Hash = functions.Hash
+                    WHERE functions.Hash NOT IN (SELECT Hash FROM temp.AmbiguousHashes)
+                    ORDER BY functions.Address, notations.Sequence""" % notations_source
+
+            current_function_address = None
+            instructions = []
+            for (function_address, sequence, notation_type, value) in c.execute(sql).fetchall():
+                if function_address != current_function_address:
+                    current_function_address = function_address
+                    graph = self.get_function_graph(function_address)
+                    if graph == None:
+                        instructions = []
+                    else:
+                        instructions = graph.get_walk_instructions()
 
-                if import_name.startswith("sub_"):
-                    import_name = "_"+import_name
+                if sequence == None or sequence >= len(instructions):
+                    continue
+                self.__apply_notation(instructions[sequence]['Address'], notation_type, value)
+
+        conn.commit()
+        conn.close()
 
-                self.logger.debug('%x: %s -> %s', current_ea, current_name, import_name)
-                function_matches[import_ea] = current_ea
-                set_name(int(current_ea), str(import_name))
+    def load_function_name_by_hashes(self, filename, hash_types = idatool.hashing.DefaultHashTypes, store_filename = ''):
+        if filename.endswith('.db'):
+            store = idatool.hashstore.FunctionHashStore(filename)
+        else:
+            store = idatool.hashstore.FunctionHashStore(store_filename or ':memory:')
+            store.import_json(filename)
+
+        for (hash, count) in store.get_ambiguous_hashes(hash_types):
+            self.logger.debug('Ambiguous hash %s (%d functions)', hash, count)
 
-        names_and_comments = data['Names and Comments']
-        for address_str in names_and_comments.keys():
-            address = int(address_str, 10)
-            function_address = names_and_comments[address_str]['Function']
+        def get_current_hashes():
+            for function_start in self.get_function_starts():
+                yield (function_start, self.get_function_name(function_start), self.get_function_hash(function_start, hash_types))
 
-            if function_address in function_matches:
-                current_function_address = function_matches[function_address]
-                current_address = current_function_address+address-function_address
+        function_matches = []
+        for (current_ea, current_name, import_ea, import_name) in store.match(get_current_hashes(), hash_types):
+            if import_name.startswith("sub_"):
+                import_name = "_"+import_name
 
-                self.logger.debug('> %x (function: %x)', current_address, current_function_address)
-                for data_type in names_and_comments[address_str].keys():
-                    if data_type == 'Function':
-                        continue
+            self.logger.debug('%x: %s -> %s', current_ea, current_name, import_name)
+            function_matches.append((import_ea, current_ea))
+            set_name(int(current_ea), str(import_name))
 
-                    value = names_and_comments[address_str][data_type]
+        for (current_address, current_function_address, address, function_address, data_type, value) in store.get_relocated_names_and_comments(function_matches):
+            if idatool.util.Name.is_reserved(value):
+                continue
 
-                    if self.is_reserved(value):
-                        continue
+            self.logger.debug('\t%x: %s %s (orig address = %x/function = %x (diff = %x))', current_address, data_type, value, address, function_address, address-function_address)
+            if data_type == 'Name':
+                set_name(current_address, str(value))
 
-                    self.logger.debug('\t%x: %s %s (orig address = %x/function = %x (diff = %x))', current_address, data_type, value, address, function_address, address-function_address)
-                    if data_type == 'Name':
-                        set_name(current_address, str(value))
+            elif data_type == 'Comment':
+                set_cmt(current_address, str(value), 0)
 
-                    elif data_type == 'Comment':
-                        set_cmt(current_address, str(value), 0)
+            elif data_type == 'Repeatable Comment':
+                set_cmt(current_address, str(value), 1)
 
-                    elif data_type == 'Repeatable Comment':
-                        set_cmt(current_address, str(value), 1)        
+        store.close()
 
     """ Imports """
     def get_imports(self):
@@ -1208,49 +1134,82 @@ class Disasm:
         for i, c in enumerate(str):
             idc.PatchByte(addr+i, ord(c))
 
-    def find_utility_functions(self, threshold = 10):
-        utility_functions = {}
-        for function_info in self.get_functions():
-            ea = function_info['Address']
-            cref_to = idatool.util.Refs.get_cref_to(ea)
+    def iterate_function_tree(self, ea = None, threshold = 10, percentile = None, max_depth = 0, max_nodes = 0, timeout = 0, revisits = True):
+        degree_table = self.get_degree_table()
+        threshold = degree_table.get_threshold(threshold, percentile)
+        call_graph = self.get_call_graph()
 
-            if len(cref_to) >= threshold:
-                utility_functions[ea] = True
-                
-        return utility_functions
-
-    def get_function_tree(self, ea = None, threshold = 10, filter = None):
-        call_ref_maps = {}
-        function_list = []
-        function_instructions = {}
+        names = {}
+        expanded = {}
+        references = {}
+        node_count = 0
+        start_time = time.time()
 
-        utility_functions = self.find_utility_functions(threshold)        
+        def timed_out():
+            if timeout > 0 and time.time()-start_time > timeout:
+                self.logger.debug('Function tree stopped after %d seconds', timeout)
+                return True
+            return False
 
-        def GetCallRefs(call_ea, ea, level = 0):
-            func_name = idatool.util.Function.get_name(ea)
-            function_list.append((level, func_name, ea, call_ea))
-            
-            if ea in utility_functions:
+        func_addr = idatool.util.Function.get_address(ea)
+        stack = [(func_addr, func_addr, 0, None)]
+        while len(stack)>0:
+            if max_nodes > 0 and node_count >= max_nodes:
+                self.logger.debug('Function tree stopped at %d nodes', node_count)
                 return
 
-            if ea in call_ref_maps:
+            if timed_out():
                 return
 
-            call_ref_maps[ea] = True
-            (call_refs, indirect_reg_call_refs, instructions) = self.get_function_call_references(ea, filter)
-            function_instructions[func_name] = instructions
-            for (caller, operands) in indirect_reg_call_refs:
-                if len(operands)>0:
-                    operand_str = self.get_operand_string(operands[0])
-                else:
-                    operand_str = ''
-                function_list.append((level+1, str(operand_str), 0, caller))
-                
-            for (call_address, call_ref) in call_refs:
-                GetCallRefs(call_address, call_ref, level+1)
-                
-        func_addr = idatool.util.Function.get_address(ea)
-        GetCallRefs(func_addr, func_addr)
+            (call_ea, ea, level, parent) = stack.pop()
+            if (parent, ea) in references or (not revisits and ea in expanded):
+                continue
+            references[(parent, ea)] = True
+
+            if not ea in names:
+                names[ea] = idatool.util.Function.get_name(ea)
+
+            node_count += 1
+            yield (level, names[ea], ea, call_ea)
+
+            if ea in expanded or degree_table.is_utility(ea, threshold):
+                continue
+
+            if max_depth > 0 and level >= max_depth:
+                continue
+
+            expanded[ea] = True
+            callees = list(call_graph.get_callees(ea))
+            for (caller, call_ref, flags) in callees:
+                if timed_out():
+                    return
+
+                if flags == idatool.callgraph.Indirect:
+                    if max_nodes > 0 and node_count >= max_nodes:
+                        return
+                    node_count += 1
+                    yield (level+1, call_graph.get_operand_string(caller), 0, caller)
+
+            for (call_address, call_ref, flags) in reversed(callees):
+                if flags == idatool.callgraph.Direct:
+                    stack.append((call_address, call_ref, level+1, ea))
+
+    def get_function_tree(self, ea = None, threshold = 10, filter = None, percentile = None, max_depth = 0, max_nodes = 0, timeout = 0, revisits = True, fields = None):
+        function_list = []
+        function_instructions = {}
+        degree_table = self.get_degree_table()
+        utility_threshold = degree_table.get_threshold(threshold, percentile)
+        for row in self.iterate_function_tree(ea, threshold, percentile = percentile, max_depth = max_depth, max_nodes = max_nodes, timeout = timeout, revisits = revisits):
+            function_list.append(row)
+
+            (level, func_name, address, call_ea) = row
+            if filter == None or address == 0 or func_name in function_instructions:
+                continue
+
+            if degree_table.is_utility(address, utility_threshold) or (max_depth > 0 and level >= max_depth):
+                continue
+
+            function_instructions[func_name] = self.get_function_instructions(address, filter = filter, fields = fields)
         
         return (function_list, function_instructions)
         
@@ -1271,18 +1230,46 @@ class Disasm:
         rfd.close()
         fd.close()
 
+    def export_snapshot(self, filename):
+        writer = idatool.snapshot.Writer(filename, {
+                    'ImageName': self.ImageName, 
+                    'ImageBase': self.ImageBase, 
+                    'FileName': self.get_filename(), 
+                    'FileHash': self.get_file_hash()
+                })
+
+        for i in range(0, get_segm_qty(), 1):
+            seg = getnseg(i)
+            writer.add_segment(seg.startEA, seg.endEA, get_segm_name(seg.startEA), GetManyBytes(seg.startEA, seg.endEA-seg.startEA))
+
+        for i in range(0, get_func_qty(), 1):
+            func = getn_func(i)
+            graph = self.get_function_graph(func.startEA)
+            if graph == None:
+                continue
+            writer.add_function(func.startEA, func.endEA, get_func_name(func.startEA), self.get_stack_arguments(func.startEA), graph)
+
+        for (ea, name) in Names():
+            writer.add_name(ea, name)
+
+        writer.close()
+
     def wait_analysis(self):
         autoWait()
         
-    def get_stack_calls(self):
+    def get_stack_calls(self, max_paths = 1000, max_depth = 64):
         instructions = []
         for instruction in self.get_indirect_calls():
             ea = instruction['Address']
             block_parser = idatool.block.Block(ea)
             print('* Analyzing %s call at %x (%s)' % (block_parser.get_function_name(), ea, instruction['Disasm']))
 
+            path_count = block_parser.count_block_paths(max_count = max_paths+1)
+            if path_count > max_paths:
+                self.logger.debug('\tMore than %d block paths, enumerating the first %d only', max_paths, max_paths)
+
             stack_access_addresses = {}
-            for blocks in block_parser.get_block_paths():
+            for blocks in block_parser.get_block_paths(max_paths = max_paths, max_depth = max_depth):
                 parser_list = []
                 for block in blocks:
                     for (address, bytes) in block_parser.get_instruction_bytes(block):
@@ -1347,6 +1334,12 @@ class Disasm:
         make_function(addr, addr+len)
 
     def exit(self):
+        self.commit_idb_changes()
+        self.FunctionHooks.unhook()
+        if self.FunctionListHooks != None:
+            self.FunctionListHooks.unhook()
+        self.XrefHooks.unhook()
+        self.close_cache()
         if self.ExitIDC:
             idc.exit(0)
 
@@ -0,0 +1,133 @@
+import idatool.operandtypes
+
+o_reg = idatool.operandtypes.Types['Register']
+o_mem = idatool.operandtypes.Types['Memory']
+o_displ = idatool.operandtypes.Types['Displacement']
+o_imm = idatool.operandtypes.Types['Immediate']
+
+class InstructionFilter:
+    def __init__(self, filter):
+        self.Filter = filter
+
+        self.Ops = None
+        if 'Op' in filter:
+            self.Ops = frozenset(filter['Op'])
+
+        self.Target = filter.get('Target')
+        if self.Target == None:
+            self.match_target = None
+        elif self.Target == 'Displacement':
+            self.match_target = self.__match_displacement
+        elif self.Target == 'Immediate':
+            self.match_target = self.__match_immediate
+        elif self.Target == 'Pointer':
+            self.match_target = self.__match_pointer
+        elif self.Target == 'Indirect':
+            self.match_target = self.__match_indirect
+        elif self.Target == 'Section':
+            self.match_target = self.__match_section
+        else:
+            self.match_target = lambda instruction: False
+
+    def needs_operand_types(self):
+        return self.Target != None
+
+    def match_op(self, op):
+        return self.Ops == None or op in self.Ops
+
+    def match_operand_types(self, operand_types):
+        if self.Target in ('Displacement', 'Pointer'):
+            return o_displ in operand_types
+
+        elif self.Target == 'Immediate':
+            return o_imm in operand_types
+
+        elif self.Target == 'Indirect':
+            return len(operand_types)>0 and operand_types[0] in (o_reg, o_mem, o_displ)
+
+        elif self.Target == 'Section':
+            return len(operand_types)>0 and operand_types[0] == o_mem
+
+        return True
+
+    def match(self, instruction):
+        if self.Ops != None and not instruction['Op'] in self.Ops:
+            return False
+
+        if self.match_target != None and not self.match_target(instruction):
+            return False
+
+        return True
+
+    __call__ = match
+
+    def __match_displacement(self, instruction):
+        for operand in instruction['Operands']:
+            if operand['Type'] == 'Displacement':
+                return True
+        return False
+
+    def __match_immediate(self, instruction):
+        for operand in instruction['Operands']:
+            if operand['Type'] == 'Immediate':
+                return True
+        return False
+
+    def __match_pointer(self, instruction):
+        for operand in instruction['Operands']:
+            if operand['Type'] == 'Displacement' and operand['Base'] != 'esp' and operand['Base'] != 'ebp':
+                return True
+        return False
+
+    def __match_indirect(self, instruction):
+        if len(instruction['Operands']) == 0:
+            return False
+
+        operand = instruction['Operands'][0]
+        if operand['Type'] in ('Register', 'Displacement'):
+            return True
+        elif operand['Type'] == 'Memory':
+            return operand['Segment'] != '_idata'
+        return False
+
+    def __match_section(self, instruction):
+        return len(instruction['Operands'])>0 and instruction['Operands'][0]['Type'] == 'Memory'
+
+class InstructionFilterSet:
+    def __init__(self, filters):
+        self.Filters = [compile_filter(filter) for filter in filters]
+
+        self.Ops = frozenset()
+        for filter in self.Filters:
+            if filter.Ops == None:
+                self.Ops = None
+                break
+            self.Ops = self.Ops | filter.Ops
+
+    def needs_operand_types(self):
+        for filter in self.Filters:
+            if filter.needs_operand_types():
+                return True
+        return False
+
+    def match_op(self, op):
+        return self.Ops == None or op in self.Ops
+
+    def match_operand_types(self, operand_types):
+        for filter in self.Filters:
+            if filter.match_operand_types(operand_types):
+                return True
+        return False
+
+    def match(self, instruction):
+        for filter in self.Filters:
+            if filter.match(instruction):
+                return True
+        return False
+
+    __call__ = match
+
+def compile_filter(filter):
+    if filter == None or isinstance(filter, (InstructionFilter, InstructionFilterSet)):
+        return filter
+    return InstructionFilter(filter)
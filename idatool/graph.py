@@ -0,0 +1,415 @@
+from collections import OrderedDict, defaultdict
+
+class FunctionGraph:
+    def __init__(self, start, instructions, block_starts, block_ends):
+        self.Start = start
+        self.Instructions = instructions
+        self.BlockStarts = set(block_starts)
+        self.BlockEnds = set(block_ends)
+        self.Blocks = []
+        self.Edges = []
+        self.BlockIndex = {}
+        self.WalkInstructions = None
+        self.__build_blocks()
+
+    def __build_blocks(self):
+        current_block_instructions = []
+        for instruction in self.Instructions:
+            if instruction['Address'] in self.BlockStarts and len(current_block_instructions)>0:
+                self.__add_block(current_block_instructions)
+                current_block_instructions = []
+
+            current_block_instructions.append(instruction)
+            if instruction['Address'] in self.BlockEnds:
+                self.__add_block(current_block_instructions)
+                current_block_instructions = []
+
+        if len(current_block_instructions)>0:
+            self.__add_block(current_block_instructions)
+
+    def __add_block(self, instructions):
+        block_start = instructions[0]['Address']
+        block_end = instructions[-1]['Address']
+
+        index = len(self.Blocks)
+        self.Blocks.append((block_start, block_end, instructions))
+        for instruction in instructions:
+            self.BlockIndex[instruction['Address']] = index
+
+        for (cref_type, cref) in instructions[-1]['CREFFrom']:
+            if cref_type != 'Call':
+                self.Edges.append((block_start, block_end, cref))
+
+    # Instructions, Blocks and the lists handed out below are shared with the graph cache and the
+    # indexes built from it; treat them as read-only and copy an instruction before changing it.
+    def get_instructions(self, filter_function = None):
+        if filter_function == None:
+            return list(self.Instructions)
+        return [instruction for instruction in self.Instructions if filter_function(instruction)]
+
+    def get_walk_instructions(self):
+        if self.WalkInstructions == None:
+            self.WalkInstructions = self.__walk()
+        return self.WalkInstructions
+
+    def __walk(self):
+        instruction_map = dict((instruction['Address'], instruction) for instruction in self.Instructions)
+        instructions = []
+        block_starts = {}
+        block_start_list = [self.Start]
+        for block_start in block_start_list:
+            current = block_start
+            while 1:
+                instruction = instruction_map.get(current)
+                if instruction == None:
+                    break
+
+                instructions.append(instruction)
+                if instruction['Op'].startswith('ret'):
+                    break
+
+                found_jmp = False
+                for (cref_type, cref) in instruction['CREFFrom']:
+                    if cref_type == 'Jmp':
+                        found_jmp = True
+
+                if found_jmp:
+                    for (cref_type, cref) in instruction['CREFFrom']:
+                        if cref_type != 'Call' and not cref in block_starts:
+                            block_starts[cref] = 1
+                            block_start_list.append(cref)
+                    break
+
+                current += instruction['Size']
+        return instructions
+
+    def get_blocks(self, filter_function = None):
+        if filter_function == None:
+            return list(self.Blocks)
+
+        blocks = []
+        for (block_start, block_end, instructions) in self.Blocks:
+            instructions = [instruction for instruction in instructions if filter_function(instruction)]
+            if len(instructions)>0:
+                blocks.append((block_start, block_end, instructions))
+        return blocks
+
+    def get_block(self, ea):
+        if ea in self.BlockIndex:
+            return self.Blocks[self.BlockIndex[ea]]
+
+        for block in self.Blocks:
+            if block[0] <= ea and ea <= block[1]:
+                return block
+        return None
+
+    def get_map(self):
+        src_map = {}
+        dst_map = {}
+        for (src, src_end, dst) in self.Edges:
+            if not src in src_map:
+                src_map[src] = []
+            src_map[src].append(dst)
+
+            if not dst in dst_map:
+                dst_map[dst] = []
+            dst_map[dst].append(src)
+        return (src_map, dst_map)
+
+    def get_references(self):
+        block_ranges = []
+        crefs_map = defaultdict(list)
+        back_crefs_map = defaultdict(list)
+        for (block_start, block_end, instructions) in self.Blocks:
+            block_ranges.append([block_start, block_end+instructions[-1]['Size']])
+            for (cref_type, cref) in instructions[-1]['CREFFrom']:
+                if cref_type == 'Jmp':
+                    crefs_map[block_start].append(cref)
+                    back_crefs_map[cref].append(block_start)
+        return (block_ranges, crefs_map, back_crefs_map)
+
+    def get_call_references(self):
+        indirect_reg_call_refs = []
+        call_refs = []
+        for instruction in self.Instructions:
+            if instruction['IsIndirectRegCall']:
+                indirect_reg_call_refs.append((instruction['Address'], instruction['Operands']))
+
+            for (cref_type, cref) in instruction['CREFFrom']:
+                if cref_type == 'Call':
+                    call_refs.append((instruction['Address'], cref))
+        return (call_refs, indirect_reg_call_refs)
+
+    def find_loops(self, irreducible = False):
+        (src_map, dst_map) = self.get_map()
+        return find_loops(self.Start, src_map, irreducible = irreducible)
+
+    def to_dict(self):
+        return {
+            'Start': self.Start,
+            'Instructions': self.Instructions,
+            'BlockStarts': sorted(self.BlockStarts),
+            'BlockEnds': sorted(self.BlockEnds)
+        }
+
+    @staticmethod
+    def from_dict(data):
+        for instruction in data['Instructions']:
+            instruction['CREFFrom'] = [tuple(cref) for cref in instruction['CREFFrom']]
+        return FunctionGraph(data['Start'], data['Instructions'], data['BlockStarts'], data['BlockEnds'])
+
+class FunctionGraphCache:
+    def __init__(self, max_instructions = 500000):
+        self.MaxInstructions = max_instructions
+        self.TotalInstructions = 0
+        self.Graphs = OrderedDict()
+
+    def get(self, start):
+        if not start in self.Graphs:
+            return None
+
+        graph = self.Graphs.pop(start)
+        self.Graphs[start] = graph
+        return graph
+
+    def put(self, graph):
+        self.invalidate(graph.Start)
+
+        self.Graphs[graph.Start] = graph
+        self.TotalInstructions += len(graph.Instructions)
+
+        while self.TotalInstructions > self.MaxInstructions and len(self.Graphs)>1:
+            (start, evicted_graph) = self.Graphs.popitem(last = False)
+            self.TotalInstructions -= len(evicted_graph.Instructions)
+
+    def invalidate(self, start = None):
+        if start == None:
+            self.Graphs.clear()
+            self.TotalInstructions = 0
+        elif start in self.Graphs:
+            graph = self.Graphs.pop(start)
+            self.TotalInstructions -= len(graph.Instructions)
+
+    def __len__(self):
+        return len(self.Graphs)
+
+def get_reverse_postorder(root, src_map):
+    order = []
+    visited = {root:1}
+    stack = [(root, iter(src_map.get(root, [])))]
+    while len(stack)>0:
+        (node, children) = stack[-1]
+        advanced = False
+        for child in children:
+            if not child in visited:
+                visited[child] = 1
+                stack.append((child, iter(src_map.get(child, []))))
+                advanced = True
+                break
+
+        if not advanced:
+            stack.pop()
+            order.append(node)
+
+    order.reverse()
+    return order
+
+def get_dominators(root, src_map):
+    order = get_reverse_postorder(root, src_map)
+    order_index = dict((node, i) for (i, node) in enumerate(order))
+
+    dst_map = {}
+    for src in order:
+        for dst in src_map.get(src, []):
+            if dst in order_index:
+                dst_map.setdefault(dst, []).append(src)
+
+    idom = {root: root}
+    changed = True
+    while changed:
+        changed = False
+        for node in order[1:]:
+            new_idom = None
+            for pred in dst_map.get(node, []):
+                if not pred in idom:
+                    continue
+
+                if new_idom == None:
+                    new_idom = pred
+                    continue
+
+                finger1 = pred
+                finger2 = new_idom
+                while finger1 != finger2:
+                    while order_index[finger1] > order_index[finger2]:
+                        finger1 = idom[finger1]
+                    while order_index[finger2] > order_index[finger1]:
+                        finger2 = idom[finger2]
+                new_idom = finger1
+
+            if new_idom != None and idom.get(node) != new_idom:
+                idom[node] = new_idom
+                changed = True
+
+    return idom
+
+def get_dominator_intervals(root, idom):
+    children = {}
+    for (node, parent) in idom.items():
+        if node != parent:
+            children.setdefault(parent, []).append(node)
+
+    intervals = {}
+    counter = 0
+    stack = [(root, False)]
+    while len(stack)>0:
+        (node, finished) = stack.pop()
+        if finished:
+            intervals[node] = (intervals[node], counter)
+            counter += 1
+            continue
+
+        intervals[node] = counter
+        counter += 1
+        stack.append((node, True))
+        for child in children.get(node, []):
+            stack.append((child, False))
+
+    return intervals
+
+def dominates(intervals, dominator, node):
+    if not dominator in intervals or not node in intervals:
+        return False
+    return intervals[dominator][0] <= intervals[node][0] and intervals[node][1] <= intervals[dominator][1]
+
+def get_strongly_connected_components(src_map):
+    nodes = set(src_map.keys())
+    for dst_list in src_map.values():
+        nodes.update(dst_list)
+
+    index = {}
+    low_link = {}
+    on_stack = {}
+    node_stack = []
+    components = []
+    counter = 0
+
+    for root in sorted(nodes):
+        if root in index:
+            continue
+
+        index[root] = low_link[root] = counter
+        counter += 1
+        node_stack.append(root)
+        on_stack[root] = True
+        work_stack = [(root, iter(src_map.get(root, [])))]
+
+        while len(work_stack)>0:
+            (node, children) = work_stack[-1]
+            advanced = False
+            for child in children:
+                if not child in index:
+                    index[child] = low_link[child] = counter
+                    counter += 1
+                    node_stack.append(child)
+                    on_stack[child] = True
+                    work_stack.append((child, iter(src_map.get(child, []))))
+                    advanced = True
+                    break
+                elif on_stack.get(child):
+                    low_link[node] = min(low_link[node], index[child])
+
+            if advanced:
+                continue
+
+            work_stack.pop()
+            if len(work_stack)>0:
+                parent = work_stack[-1][0]
+                low_link[parent] = min(low_link[parent], low_link[node])
+
+            if low_link[node] == index[node]:
+                component = []
+                while True:
+                    member = node_stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+def find_loops(root, src_map, irreducible = False):
+    idom = get_dominators(root, src_map)
+    intervals = get_dominator_intervals(root, idom)
+
+    dst_map = {}
+    for (src, dst_list) in src_map.items():
+        for dst in dst_list:
+            dst_map.setdefault(dst, []).append(src)
+
+    loop_map = {}
+    for src in idom.keys():
+        for header in src_map.get(src, []):
+            if not dominates(intervals, header, src):
+                continue
+
+            if not header in loop_map:
+                loop_map[header] = {'Header': header, 'Blocks': set([header]), 'BackEdges': [], 'Irreducible': False}
+            loop = loop_map[header]
+            loop['BackEdges'].append((src, header))
+
+            work_list = [src]
+            while len(work_list)>0:
+                node = work_list.pop()
+                if node in loop['Blocks']:
+                    continue
+                loop['Blocks'].add(node)
+                work_list.extend(dst_map.get(node, []))
+
+    loops = list(loop_map.values())
+
+    if irreducible:
+        for component in get_strongly_connected_components(src_map):
+            component = set(component)
+            if len(component) == 1:
+                continue
+
+            covered = False
+            for loop in loops:
+                if component <= loop['Blocks']:
+                    covered = True
+                    break
+
+            if covered:
+                continue
+
+            entries = []
+            for node in component:
+                for pred in dst_map.get(node, []):
+                    if not pred in component:
+                        entries.append(node)
+                        break
+            entries.sort()
+
+            header = entries[0] if len(entries)>0 else min(component)
+            back_edges = []
+            for node in component:
+                for dst in src_map.get(node, []):
+                    if dst in entries:
+                        back_edges.append((node, dst))
+
+            loops.append({'Header': header, 'Blocks': component, 'BackEdges': back_edges, 'Irreducible': True, 'Entries': entries})
+
+    for loop in loops:
+        depth = 1
+        for other_loop in loops:
+            if loop['Header'] in other_loop['Blocks'] and len(loop['Blocks']) < len(other_loop['Blocks']):
+                depth += 1
+        loop['Depth'] = depth
+
+    for loop in loops:
+        loop['Blocks'] = sorted(loop['Blocks'])
+
+    loops.sort(key = lambda loop: (loop['Depth'], loop['Header']))
+    return loops
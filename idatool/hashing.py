@@ -0,0 +1,66 @@
+import hashlib
+
+import idatool.operandtypes
+
+DefaultHashTypes = ['Op', 'imm_operand']
+HashTypesList = [
+    ['Op'],
+    ['Op', 'imm_operand'],
+    ['Op', 'operand_type']
+]
+
+def get_hash_key(hash_types):
+    return ','.join(hash_types)
+
+class InstructionHasher:
+    def __init__(self, hash_types_list = HashTypesList, algorithm = 'sha1'):
+        self.Flavours = []
+        self.Keys = []
+        for hash_types in hash_types_list:
+            key = get_hash_key(hash_types)
+            if key in self.Keys:
+                continue
+
+            self.Keys.append(key)
+            self.Flavours.append((
+                key,
+                'Op' in hash_types,
+                'imm_operand' in hash_types,
+                'operand_type' in hash_types,
+                hashlib.new(algorithm)
+            ))
+
+    def update(self, instruction):
+        op = instruction['Op']
+        if not isinstance(op, bytes):
+            op = op.encode('utf-8')
+
+        imm_str = None
+        operand_type_str = None
+        for (key, use_op, use_imm, use_operand_type, m) in self.Flavours:
+            if use_op:
+                m.update(op)
+
+            if use_operand_type:
+                if operand_type_str == None:
+                    operand_type_str = ''.join(['%x' % operand['TypeValue'] for operand in instruction['Operands']]).encode('ascii')
+                m.update(operand_type_str)
+
+            if use_imm and len(instruction['DREFFrom']) == 0:
+                if imm_str == None:
+                    imm_str = ''
+                    for operand in instruction['Operands']:
+                        if operand['TypeValue'] == idatool.operandtypes.o_imm:
+                            imm_str += '%x' % operand['Value']
+                    imm_str = imm_str.encode('ascii')
+                m.update(imm_str)
+
+    def update_all(self, instructions):
+        for instruction in instructions:
+            self.update(instruction)
+
+    def hexdigests(self):
+        hashes = {}
+        for (key, use_op, use_imm, use_operand_type, m) in self.Flavours:
+            hashes[key] = m.hexdigest()
+        return hashes
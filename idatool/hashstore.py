@@ -0,0 +1,224 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import json
+import sqlite3
+
+import idatool.hashing
+
+class JSONStream:
+    ChunkSize = 1024*1024
+    Whitespace = ' \t\r\n'
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.Buffer = ''
+        self.Position = 0
+        self.EOF = False
+        self.Decoder = json.JSONDecoder()
+
+    def __fill(self):
+        if self.EOF:
+            return False
+
+        data = self.fd.read(self.ChunkSize)
+        if not data:
+            self.EOF = True
+            return False
+
+        self.Buffer = self.Buffer[self.Position:]+data
+        self.Position = 0
+        return True
+
+    def __skip_whitespace(self):
+        while True:
+            while self.Position < len(self.Buffer) and self.Buffer[self.Position] in self.Whitespace:
+                self.Position += 1
+
+            if self.Position < len(self.Buffer):
+                return True
+
+            if not self.__fill():
+                return False
+
+    def peek_char(self):
+        if not self.__skip_whitespace():
+            raise ValueError('Unexpected end of JSON data')
+        return self.Buffer[self.Position]
+
+    def read_char(self, expected = None):
+        char = self.peek_char()
+        if expected != None and char != expected:
+            raise ValueError('Expected %s at JSON offset %d, found %s' % (expected, self.Position, char))
+        self.Position += 1
+        return char
+
+    def read_separator(self, end):
+        char = self.read_char()
+        if char == end:
+            return False
+
+        if char != ',':
+            raise ValueError('Expected , or %s at JSON offset %d, found %s' % (end, self.Position-1, char))
+        return True
+
+    def decode_value(self):
+        self.peek_char()
+        while True:
+            try:
+                (value, end) = self.Decoder.raw_decode(self.Buffer, self.Position)
+            except ValueError:
+                if not self.__fill():
+                    raise
+                continue
+
+            if end == len(self.Buffer) and self.__fill():
+                continue
+
+            self.Position = end
+            return value
+
+    def read_object_keys(self):
+        self.read_char('{')
+        if self.peek_char() == '}':
+            self.read_char()
+            return
+
+        while True:
+            key = self.decode_value()
+            self.read_char(':')
+            yield key
+
+            if not self.read_separator('}'):
+                return
+
+    def iterate_array(self):
+        self.read_char('[')
+        if self.peek_char() == ']':
+            self.read_char()
+            return
+
+        while True:
+            yield self.decode_value()
+            if not self.read_separator(']'):
+                return
+
+    def iterate_object_items(self):
+        for key in self.read_object_keys():
+            yield (key, self.decode_value())
+
+class FunctionHashStore:
+    BatchSize = 10000
+
+    def __init__(self, filename = ':memory:'):
+        self.Conn = sqlite3.connect(filename)
+        self.Conn.execute("""CREATE TABLE
+                            IF NOT EXISTS FunctionHashes (
+                                Address integer,
+                                Name text,
+                                HashType text,
+                                Hash text
+                            );""")
+        self.Conn.execute('DELETE FROM FunctionHashes WHERE rowid NOT IN (SELECT MIN(rowid) FROM FunctionHashes GROUP BY HashType, Hash, Address)')
+        self.Conn.execute('DROP INDEX IF EXISTS FunctionHashesIndex')
+        self.Conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS FunctionHashesKeyIndex ON FunctionHashes (HashType, Hash, Address)')
+
+        self.Conn.execute("""CREATE TABLE
+                            IF NOT EXISTS NamesAndComments (
+                                Address integer,
+                                Function integer,
+                                Type text,
+                                Value text
+                            );""")
+        self.Conn.execute('DELETE FROM NamesAndComments WHERE rowid NOT IN (SELECT MAX(rowid) FROM NamesAndComments GROUP BY Address, Type)')
+        self.Conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS NamesAndCommentsAddressIndex ON NamesAndComments (Address, Type)')
+        self.Conn.execute('CREATE INDEX IF NOT EXISTS NamesAndCommentsIndex ON NamesAndComments (Function)')
+        self.Conn.commit()
+
+    def __insert_many(self, sql, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.BatchSize:
+                self.Conn.executemany(sql, batch)
+                batch = []
+
+        if len(batch)>0:
+            self.Conn.executemany(sql, batch)
+
+    def add_function_hashes(self, entries):
+        def get_rows():
+            for entry in entries:
+                if not 'Name' in entry or not 'Hash' in entry:
+                    continue
+                yield (entry['Address'], entry['Name'], idatool.hashing.get_hash_key(entry['Hash']['Type']), entry['Hash']['Value'])
+
+        self.__insert_many('INSERT OR IGNORE INTO FunctionHashes (Address, Name, HashType, Hash) VALUES (?, ?, ?, ?)', get_rows())
+        self.Conn.commit()
+
+    def add_names_and_comments(self, names_and_comments):
+        if isinstance(names_and_comments, dict):
+            names_and_comments = names_and_comments.items()
+
+        def get_rows():
+            for (address_str, values) in names_and_comments:
+                for (data_type, value) in values.items():
+                    if data_type == 'Function':
+                        continue
+                    yield (int(address_str, 10), values['Function'], data_type, value)
+
+        self.__insert_many('INSERT OR REPLACE INTO NamesAndComments (Address, Function, Type, Value) VALUES (?, ?, ?, ?)', get_rows())
+        self.Conn.commit()
+
+    def import_json(self, filename):
+        fd = open(filename, 'r')
+        stream = JSONStream(fd)
+        for key in stream.read_object_keys():
+            if key == 'Function Hashes':
+                self.add_function_hashes(stream.iterate_array())
+            elif key == 'Names and Comments':
+                self.add_names_and_comments(stream.iterate_object_items())
+            else:
+                stream.decode_value()
+        fd.close()
+
+    def get_ambiguous_hashes(self, hash_types = idatool.hashing.DefaultHashTypes):
+        return self.Conn.execute('SELECT Hash, COUNT(*) FROM FunctionHashes WHERE HashType = ? GROUP BY Hash HAVING COUNT(*) > 1',
+                    (idatool.hashing.get_hash_key(hash_types), )).fetchall()
+
+    def match(self, current_hashes, hash_types = idatool.hashing.DefaultHashTypes):
+        self.Conn.execute('DROP TABLE IF EXISTS temp.CurrentHashes')
+        self.Conn.execute('CREATE TEMP TABLE CurrentHashes (Address integer, Name text, Hash text)')
+        self.__insert_many('INSERT INTO temp.CurrentHashes (Address, Name, Hash) VALUES (?, ?, ?)', current_hashes)
+        self.Conn.execute('CREATE INDEX temp.CurrentHashesIndex ON CurrentHashes (Hash)')
+
+        sql = """SELECT current.Address, current.Name, imported.Address, imported.Name
+                FROM
+                    (SELECT Hash, MIN(Address) AS Address, MIN(Name) AS Name
+                        FROM temp.CurrentHashes
+                        GROUP BY Hash HAVING COUNT(*) = 1) AS current
+                JOIN
+                    (SELECT Hash, MIN(Address) AS Address, MIN(Name) AS Name
+                        FROM FunctionHashes WHERE HashType = ?
+                        GROUP BY Hash HAVING COUNT(*) = 1) AS imported
+                ON current.Hash = imported.Hash"""
+
+        for row in self.Conn.execute(sql, (idatool.hashing.get_hash_key(hash_types), )):
+            yield row
+
+    def get_relocated_names_and_comments(self, function_matches):
+        self.Conn.execute('DROP TABLE IF EXISTS temp.FunctionMatches')
+        self.Conn.execute('CREATE TEMP TABLE FunctionMatches (ImportAddress integer PRIMARY KEY, CurrentAddress integer)')
+        self.__insert_many('INSERT OR REPLACE INTO temp.FunctionMatches (ImportAddress, CurrentAddress) VALUES (?, ?)', function_matches)
+
+        sql = """SELECT matches.CurrentAddress + notes.Address - notes.Function, matches.CurrentAddress, notes.Address, notes.Function, notes.Type, notes.Value
+                FROM temp.FunctionMatches AS matches
+                JOIN NamesAndComments AS notes ON notes.Function = matches.ImportAddress"""
+
+        for row in self.Conn.execute(sql):
+            yield row
+
+    def close(self):
+        self.Conn.commit()
+        self.Conn.close()
@@ -2,16 +2,20 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-import json
 import sqlite3
 import base64
 
-import idatool.disassembly
+import idatool.filters
+import idatool.hashing
 
 class Hunter:
     Debug = 0
-    def __init__(self, log_filename = ''):
-        self.Disasm = idatool.disassembly.Disasm()
+    def __init__(self, log_filename = '', disasm = None):
+        if disasm == None:
+            import idatool.disassembly
+            disasm = idatool.disassembly.Disasm()
+
+        self.Disasm = disasm
         self.open_log(log_filename)        
         self.Matches = {}
 
@@ -32,24 +36,25 @@ class Hunter:
             self.fd.close()
         self.Disasm.exit()
 
-    def find_loops(self):
-        for loop in self.Disasm.find_loops():
+    def find_loops(self, irreducible = False):
+        for loop in self.Disasm.find_loops(irreducible = irreducible):
             for loop in loop['Loops']:
-                print('\t' + self.Disasm.dump_paths(loop))
+                print('\t%.8x (depth: %d): %s' % (loop['Header'], loop['Depth'], self.Disasm.dump_paths(loop['Blocks'])))
                 block_instructions = []
-                for block_start in loop:
+                for block_start in loop['Blocks']:
                     for instruction in self.Disasm.get_block_instructions(block_start):
                         print('\t\t' + self.Disasm.get_instructionText(instruction))
                         block_instructions.append(instruction)
                 self.add_instructions(block_instructions)
         
-    def add_instructions(self, block_instructions, max_call_instruction_cnt = 0):
+    def add_instructions(self, block_instructions, max_call_instruction_cnt = 0, yara_match_str = ''):
         call_instruction_cnt = 0
-        block_bytes = ''
+        block_instructions = [dict(block_instruction) for block_instruction in block_instructions]
         for block_instruction in block_instructions:
             bytes = self.Disasm.get_instruction_bytes(block_instruction['Address'])
-            block_instruction['Bytes'] = base64.b64encode(bytes)
-            block_bytes += bytes
+            if bytes == None:
+                bytes = b''
+            block_instruction['Bytes'] = base64.b64encode(bytes).decode('ascii')
             if block_instruction['Op'] == 'call':
                 call_instruction_cnt += 1
             
@@ -69,56 +74,86 @@ class Hunter:
     def find_encoding_instructions(self):
         min = 0xffff
         black_list = [0x40000000, 0x4000, 0xffffffff, 0xFFFFFFF6, 0x0FFFFFFFE, 0xcccccccc, 0x400000, 0x80000000, 0x7FFFFFFF, 0x7EFEFEFF]
+        filter = idatool.filters.compile_filter({'Op': ['xor', 'add', 'mov', 'sub', 'imul', 'mul'], 'Target': 'Immediate'})
+
+        candidates = {}
+        for entry in self.Disasm.get_immediate_index().find_interesting(min, black_list):
+            candidates.setdefault(entry['Function'], set()).add(entry['Address'])
 
         self.Matches = {}
-        for instruction in self.Disasm.get_all_instructions(filter = {'Op': ['xor', 'add', 'mov', 'sub', 'imul', 'mul'], 'Target': 'Immediate'}):
-            drefs = idatool.util.Refs.get_dref_from(instruction['Address'])
-            if len(drefs) == 0:
-                found_interesting_immediate_value = False
-                for operand in instruction['Operands']:
-                    if operand['Type'] == 'Immediate' and operand['Value']>min and not operand['Value'] in black_list:
-                        found_interesting_immediate_value = True
-                        break
-
-                if found_interesting_immediate_value:
-                    self.add_instructions(self.Disasm.get_block_instructions(instruction['Address']))
+        for function_start in sorted(candidates.keys()):
+            graph = self.Disasm.get_function_graph(function_start)
+            if graph == None:
+                continue
+
+            added_blocks = {}
+            for instruction in graph.get_instructions(filter):
+                if not instruction['Address'] in candidates[function_start] or len(instruction['DREFFrom']) != 0:
+                    continue
+
+                block = graph.get_block(instruction['Address'])
+                if block == None or block[0] in added_blocks:
+                    continue
+
+                added_blocks[block[0]] = 1
+                self.add_instructions(block[2])
 
     def save(self, db_filename = ''):
         if not db_filename:
-            db_filename = self.Disasm.Options.db_filename
+            db_filename = os.environ.get('IDATOOL_HUNTING_DB', 'Hunting.db')
         
         try:
             conn = sqlite3.connect(db_filename)
         except:
-            return
-
-        conn.text_factory = str
+            return None
 
         c = conn.cursor()
+        c.execute('PRAGMA journal_mode = WAL')
+        c.execute('PRAGMA synchronous = NORMAL')
 
-        create_table_sql = """CREATE TABLE
-                            IF NOT EXISTS BlockInformation (
+        c.execute("""CREATE TABLE
+                            IF NOT EXISTS Files (
                                 id integer PRIMARY KEY, 
                                 FileName text, 
                                 FileHash text, 
-                                FunctionName text, 
-                                BlockStart Integer, 
-                                BlockEnd Integer, 
+                                unique (FileName, FileHash)
+                            );""")
+
+        c.execute("""CREATE TABLE
+                            IF NOT EXISTS Blocks (
+                                id integer PRIMARY KEY, 
                                 BlockHashType text, 
                                 BlockHash text, 
+                                InstructionCount integer, 
+                                Bytes blob, 
+                                unique (BlockHashType, BlockHash)
+                            );""")
+
+        c.execute("""CREATE TABLE
+                            IF NOT EXISTS BlockMatches (
+                                FileId integer, 
+                                BlockId integer, 
+                                FunctionName text, 
+                                BlockStart integer, 
+                                BlockEnd integer, 
                                 YaraMatches text, 
-                                InstructionText text, 
-                                unique (FileName, FileHash, FunctionName, BlockStart, BlockEnd, BlockHashType, BlockHash, YaraMatches, InstructionText)
-                            );"""
-
-        c.execute(create_table_sql)
+                                unique (FileId, BlockStart, BlockId, YaraMatches)
+                            );""")
+        c.execute('CREATE INDEX IF NOT EXISTS BlockMatchesBlockIndex ON BlockMatches (BlockId)')
 
         file_name = self.Disasm.get_base_filename()
         file_hash = self.Disasm.get_file_hash()
+        block_hash_type = idatool.hashing.get_hash_key(idatool.hashing.DefaultHashTypes)
 
+        c.execute('INSERT OR IGNORE INTO Files (FileName, FileHash) VALUES (?, ?)', (file_name, file_hash))
+        file_id = c.execute('SELECT id FROM Files WHERE FileName = ? AND FileHash = ?', (file_name, file_hash)).fetchone()[0]
+
+        blocks = []
+        block_matches = []
         for (block_hash, block_hash_items) in self.Matches.items():
             self.write_log('Block Hash: %s' % (block_hash))
 
+            block_added = False
             for (yara_match_str, block_instructions_list) in block_hash_items.items():
                 self.write_log('\tYara Match: %s' % (yara_match_str))
                 for block_instructions in block_instructions_list:
@@ -135,15 +170,19 @@ class Hunter:
                         instruction_line = self.Disasm.get_instructionText(block_instruction, include_bytes = True)+'\n'
                         self.write_log('\t\t\t%s' % instruction_line)
 
-                    try:
-                        c.execute('INSERT INTO BlockInformation (FileName, FileHash, FunctionName, BlockStart, BlockEnd, BlockHashType, BlockHash, YaraMatches, InstructionText) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', 
-                                (
-                                    file_name, file_hash, function_name, block_start, 
-                                    block_end, '', block_hash, yara_match_str, json.dumps(block_instructions)
-                                )
-                            )
-                    except:
-                        pass
+                    if not block_added:
+                        block_bytes = b''.join([base64.b64decode(block_instruction['Bytes']) for block_instruction in block_instructions])
+                        blocks.append((block_hash_type, block_hash, len(block_instructions), sqlite3.Binary(block_bytes)))
+                        block_added = True
+
+                    block_matches.append((file_id, function_name, block_start, block_end, yara_match_str, block_hash_type, block_hash))
+
+        c.executemany('INSERT OR IGNORE INTO Blocks (BlockHashType, BlockHash, InstructionCount, Bytes) VALUES (?, ?, ?, ?)', blocks)
+
+        before_changes = conn.total_changes
+        c.executemany('INSERT OR IGNORE INTO BlockMatches (FileId, BlockId, FunctionName, BlockStart, BlockEnd, YaraMatches) SELECT ?, id, ?, ?, ?, ? FROM Blocks WHERE BlockHashType = ? AND BlockHash = ?', block_matches)
+        inserted = conn.total_changes-before_changes
 
         conn.commit()
         conn.close()
+        return inserted
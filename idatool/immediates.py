@@ -0,0 +1,150 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import array
+import bisect
+import gzip
+import json
+
+import idatool.table
+
+Version = 1
+ValueMask = 0xffffffffffffffff
+
+class ImmediateIndex:
+    def __init__(self, analysis = None):
+        self.Analysis = analysis
+        self.FunctionEntries = {}
+        self.PendingFunctions = set()
+        self.Built = False
+        self.Dirty = True
+        self.Values = idatool.table.create_address_array()
+        self.Addresses = idatool.table.create_address_array()
+        self.Positions = array.array('B')
+        self.Functions = idatool.table.create_address_array()
+
+    def get_function_entries(self, function_start):
+        graph = self.Analysis.get_function_graph(function_start)
+        if graph == None:
+            return []
+
+        entries = []
+        for instruction in graph.Instructions:
+            for operand in instruction['Operands']:
+                if operand['Type'] == 'Immediate':
+                    entries.append((operand['Value'] & ValueMask, instruction['Address'], operand['Position']))
+        return entries
+
+    def build(self):
+        self.FunctionEntries = {}
+        self.PendingFunctions = set()
+        for function_start in self.Analysis.get_function_starts():
+            self.FunctionEntries[function_start] = self.get_function_entries(function_start)
+        self.Built = True
+        self.Dirty = True
+
+    def invalidate(self, function_start = None):
+        if function_start == None:
+            self.FunctionEntries = {}
+            self.PendingFunctions = set()
+            self.Built = False
+        else:
+            self.FunctionEntries.pop(function_start, None)
+            self.PendingFunctions.add(function_start)
+        self.Dirty = True
+
+    def __refresh(self):
+        if not self.Built and self.Analysis != None:
+            self.build()
+
+        if self.Analysis != None:
+            for function_start in self.PendingFunctions:
+                self.FunctionEntries[function_start] = self.get_function_entries(function_start)
+        self.PendingFunctions = set()
+
+        if not self.Dirty:
+            return
+
+        entries = []
+        for (function_start, function_entries) in self.FunctionEntries.items():
+            for (value, address, position) in function_entries:
+                entries.append((value, address, position, function_start))
+        entries.sort()
+
+        self.Values = idatool.table.create_address_array([entry[0] for entry in entries])
+        self.Addresses = idatool.table.create_address_array([entry[1] for entry in entries])
+        self.Positions = array.array('B', [entry[2] for entry in entries])
+        self.Functions = idatool.table.create_address_array([entry[3] for entry in entries])
+        self.Dirty = False
+
+    def __get_entry(self, index):
+        return {
+            'Value': self.Values[index],
+            'Address': self.Addresses[index],
+            'Position': self.Positions[index],
+            'Function': self.Functions[index]
+        }
+
+    def __get_entries(self, start, end, black_list = None):
+        entries = []
+        for index in range(start, end, 1):
+            if black_list != None and self.Values[index] in black_list:
+                continue
+            entries.append(self.__get_entry(index))
+        return entries
+
+    def find(self, value):
+        self.__refresh()
+        value &= ValueMask
+        return self.__get_entries(bisect.bisect_left(self.Values, value), bisect.bisect_right(self.Values, value))
+
+    def find_range(self, low, high, black_list = None):
+        self.__refresh()
+        if black_list != None:
+            black_list = set(value & ValueMask for value in black_list)
+        return self.__get_entries(bisect.bisect_left(self.Values, low), bisect.bisect_right(self.Values, high), black_list)
+
+    def find_values(self, values):
+        entries = []
+        for value in sorted(set(value & ValueMask for value in values)):
+            entries += self.find(value)
+        return entries
+
+    def find_interesting(self, min = 0xffff, black_list = ()):
+        return self.find_range(min+1, ValueMask, black_list)
+
+    def __len__(self):
+        self.__refresh()
+        return len(self.Values)
+
+    def save(self, filename, header = {}):
+        self.__refresh()
+
+        header = dict(header)
+        header['Version'] = Version
+
+        fd = gzip.open(filename, 'wb')
+        fd.write((json.dumps(header)+'\n').encode('utf-8'))
+        for function_start in sorted(self.FunctionEntries.keys()):
+            record = {'Function': function_start, 'Entries': self.FunctionEntries[function_start]}
+            fd.write((json.dumps(record, separators = (',', ':'))+'\n').encode('utf-8'))
+        fd.close()
+
+    def load(self, filename):
+        fd = gzip.open(filename, 'rb')
+        header = json.loads(fd.readline().decode('utf-8'))
+        if header.get('Version') != Version:
+            fd.close()
+            return None
+
+        self.FunctionEntries = {}
+        self.PendingFunctions = set()
+        for line in fd:
+            record = json.loads(line.decode('utf-8'))
+            self.FunctionEntries[record['Function']] = [tuple(entry) for entry in record['Entries']]
+        fd.close()
+
+        self.Built = True
+        self.Dirty = True
+        return header
@@ -0,0 +1,191 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import array
+
+import idatool.table
+
+Wildcard = '*'
+
+class MnemonicIndex:
+    def __init__(self, analysis = None, min_n = 2, max_n = 5):
+        self.Analysis = analysis
+        self.MinN = min_n
+        self.MaxN = max_n
+        self.Mnemonics = idatool.table.Pool()
+        self.Grams = idatool.table.Pool()
+        self.Postings = {}
+        self.Blocks = {}
+        self.FunctionBlocks = {}
+        self.FunctionGrams = {}
+        self.PendingFunctions = set()
+        self.Built = False
+
+    def get_gram(self, mnemonic_ids):
+        return self.Grams.add(tuple(mnemonic_ids))
+
+    def add_function(self, function_start):
+        graph = self.Analysis.get_function_graph(function_start)
+        if graph == None:
+            return
+
+        function_grams = set()
+        block_starts = []
+        for (block_start, block_end, instructions) in graph.Blocks:
+            mnemonic_ids = array.array('H', [self.Mnemonics.add(instruction['Op']) for instruction in instructions])
+            self.Blocks[block_start] = (function_start, mnemonic_ids)
+            block_starts.append(block_start)
+
+            for n in range(self.MinN, self.MaxN+1, 1):
+                for offset in range(0, len(mnemonic_ids)-n+1, 1):
+                    gram = self.get_gram(mnemonic_ids[offset:offset+n])
+                    self.Postings.setdefault(gram, []).append((block_start, offset))
+                    function_grams.add(gram)
+
+        self.FunctionBlocks[function_start] = block_starts
+        self.FunctionGrams[function_start] = function_grams
+
+    def remove_function(self, function_start):
+        block_starts = set(self.FunctionBlocks.pop(function_start, []))
+        for gram in self.FunctionGrams.pop(function_start, set()):
+            self.Postings[gram] = [posting for posting in self.Postings[gram] if not posting[0] in block_starts]
+
+        for block_start in block_starts:
+            del self.Blocks[block_start]
+
+    def build(self):
+        self.Postings = {}
+        self.Blocks = {}
+        self.FunctionBlocks = {}
+        self.FunctionGrams = {}
+        self.PendingFunctions = set()
+        for function_start in self.Analysis.get_function_starts():
+            self.add_function(function_start)
+        self.Built = True
+
+    def invalidate(self, function_start = None):
+        if function_start == None:
+            self.Built = False
+            self.PendingFunctions = set()
+        else:
+            self.PendingFunctions.add(function_start)
+
+    def __refresh(self):
+        if not self.Built:
+            self.build()
+            return
+
+        for function_start in self.PendingFunctions:
+            self.remove_function(function_start)
+            self.add_function(function_start)
+        self.PendingFunctions = set()
+
+    def __parse_sequence(self, sequence):
+        if not isinstance(sequence, (list, tuple)):
+            sequence = [mnemonic.strip() for mnemonic in sequence.split('/')]
+
+        mnemonic_ids = []
+        for mnemonic in sequence:
+            if mnemonic == Wildcard:
+                mnemonic_ids.append(None)
+            else:
+                mnemonic_id = self.Mnemonics.find(mnemonic)
+                if mnemonic_id < 0:
+                    return None
+                mnemonic_ids.append(mnemonic_id)
+        return mnemonic_ids
+
+    def __get_candidates(self, mnemonic_ids):
+        best = None
+        for start in range(0, len(mnemonic_ids), 1):
+            for n in range(self.MinN, self.MaxN+1, 1):
+                window = mnemonic_ids[start:start+n]
+                if len(window) < n or None in window:
+                    break
+
+                gram = self.Grams.find(tuple(window))
+                if gram < 0:
+                    return []
+
+                postings = self.Postings.get(gram, [])
+                if best == None or len(postings) < len(best[1]):
+                    best = (start, postings)
+
+        if best == None:
+            return None
+
+        (start, postings) = best
+        return [(block_start, offset-start) for (block_start, offset) in postings if offset >= start]
+
+    def __match_block(self, block_mnemonic_ids, offset, mnemonic_ids):
+        if offset+len(mnemonic_ids) > len(block_mnemonic_ids):
+            return False
+
+        for i in range(0, len(mnemonic_ids), 1):
+            if mnemonic_ids[i] != None and block_mnemonic_ids[offset+i] != mnemonic_ids[i]:
+                return False
+        return True
+
+    def find_sequence(self, sequence):
+        self.__refresh()
+
+        mnemonic_ids = self.__parse_sequence(sequence)
+        if mnemonic_ids == None or len(mnemonic_ids) == 0:
+            return []
+
+        candidates = self.__get_candidates(mnemonic_ids)
+        if candidates == None:
+            candidates = []
+            for (block_start, (function_start, block_mnemonic_ids)) in self.Blocks.items():
+                for offset in range(0, len(block_mnemonic_ids)-len(mnemonic_ids)+1, 1):
+                    candidates.append((block_start, offset))
+
+        matches = []
+        for (block_start, offset) in sorted(set(candidates)):
+            (function_start, block_mnemonic_ids) = self.Blocks[block_start]
+            if self.__match_block(block_mnemonic_ids, offset, mnemonic_ids):
+                matches.append({'Function': function_start, 'Block': block_start, 'Offset': offset, 'Length': len(mnemonic_ids)})
+        return matches
+
+    def get_sequence_grams(self, sequence):
+        self.__refresh()
+        mnemonic_ids = [self.Mnemonics.find(mnemonic) for mnemonic in sequence]
+
+        grams = set()
+        for n in range(self.MinN, self.MaxN+1, 1):
+            for offset in range(0, len(mnemonic_ids)-n+1, 1):
+                window = tuple(mnemonic_ids[offset:offset+n])
+                if -1 in window:
+                    continue
+
+                gram = self.Grams.find(window)
+                if gram >= 0:
+                    grams.add(gram)
+        return grams
+
+    def rank_functions(self, grams, count = 10, exclude = None):
+        self.__refresh()
+
+        overlaps = {}
+        for gram in grams:
+            functions = set(self.Blocks[block_start][0] for (block_start, offset) in self.Postings.get(gram, []))
+            for function_start in functions:
+                overlaps[function_start] = overlaps.get(function_start, 0)+1
+
+        scores = []
+        for (function_start, overlap) in overlaps.items():
+            if function_start == exclude:
+                continue
+            union = len(grams)+len(self.FunctionGrams[function_start])-overlap
+            scores.append((float(overlap)/union, function_start))
+        scores.sort(key = lambda score: (-score[0], score[1]))
+
+        return [{'Function': function_start, 'Score': score} for (score, function_start) in scores[0:count]]
+
+    def rank_similar_functions(self, function_start, count = 10):
+        self.__refresh()
+        return self.rank_functions(self.FunctionGrams.get(function_start, set()), count = count, exclude = function_start)
+
+    def rank_sequence(self, sequence, count = 10):
+        return self.rank_functions(self.get_sequence_grams(sequence), count = count)
@@ -2,10 +2,10 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-from idaapi import *
-from idautils import *
-from idc import *
-import idc
+try:
+    from idaapi import *
+except ImportError:
+    (o_void, o_reg, o_mem, o_phrase, o_displ, o_imm, o_far, o_near) = range(0, 8, 1)
 
 """ Data Type """
 
@@ -55,3 +55,5 @@ DTypeStr = ["Byte", "Word", "DWORD", "Float", "Double",
             "TByte", "PackReal", "QWORD", "BYTE16", "CODE", 
             "Void", "FWORD", "BitFild", "String", "Unicode", 
             "3Byte", "LDBL", "BYTE32", "BYTE64"]
+
+Types = dict((value, key) for (key, value) in Values.items())
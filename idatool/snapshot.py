@@ -0,0 +1,215 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import base64
+import bisect
+import gzip
+import json
+
+import idatool.analysis
+import idatool.filters
+import idatool.graph
+import idatool.table
+
+Version = 1
+
+class Writer:
+    def __init__(self, filename, header):
+        self.fd = gzip.open(filename, 'wb')
+        header = dict(header)
+        header['Kind'] = 'Header'
+        header['Version'] = Version
+        self.write_record(header)
+
+    def write_record(self, record):
+        line = json.dumps(record, separators = (',', ':'))+'\n'
+        if not isinstance(line, bytes):
+            line = line.encode('utf-8')
+        self.fd.write(line)
+
+    def add_segment(self, start, end, name, bytes):
+        if bytes != None:
+            bytes = base64.b64encode(bytes).decode('ascii')
+        self.write_record({'Kind': 'Segment', 'Start': start, 'End': end, 'Name': name, 'Bytes': bytes})
+
+    def add_function(self, start, end, name, args, graph):
+        self.write_record({'Kind': 'Function', 'Start': start, 'End': end, 'Name': name, 'Args': args, 'Graph': graph.to_dict()})
+
+    def add_name(self, ea, name):
+        self.write_record({'Kind': 'Name', 'Address': ea, 'Name': name})
+
+    def close(self):
+        self.fd.close()
+
+class Snapshot(idatool.analysis.Analysis):
+    def __init__(self, filename):
+        self.Filename = filename
+        self.Header = {}
+        self.Segments = []
+        self.Functions = {}
+        self.Names = {}
+        self.Graphs = {}
+        self.InstructionIndex = None
+
+        fd = gzip.open(filename, 'rb')
+        for line in fd:
+            record = json.loads(line.decode('utf-8'))
+            kind = record.pop('Kind')
+            if kind == 'Header':
+                if record['Version'] > Version:
+                    raise RuntimeError('Unsupported snapshot version: %d' % record['Version'])
+                self.Header = record
+            elif kind == 'Segment':
+                if record['Bytes'] != None:
+                    record['Bytes'] = base64.b64decode(record['Bytes'])
+                self.Segments.append(record)
+            elif kind == 'Function':
+                self.Functions[record['Start']] = record
+            elif kind == 'Name':
+                self.Names[record['Address']] = record['Name']
+        fd.close()
+
+        self.Segments.sort(key = lambda segment: segment['Start'])
+        self.SegmentStarts = [segment['Start'] for segment in self.Segments]
+        self.FunctionStarts = sorted(self.Functions.keys())
+
+        self.ImageName = self.Header.get('ImageName', '')
+        self.ImageBase = self.Header.get('ImageBase', 0)
+
+    """Utility"""
+    def get_current_address(self):
+        return None
+
+    def get_filename(self):
+        return self.Header.get('FileName', '')
+
+    def get_base_filename(self):
+        return os.path.basename(self.get_filename())
+
+    def get_file_hash(self):
+        return self.Header.get('FileHash', '')
+
+    def get_segment(self, addr):
+        index = bisect.bisect_right(self.SegmentStarts, addr)-1
+        if index >= 0 and addr <= self.Segments[index]['End']:
+            return self.Segments[index]
+        return None
+
+    def get_segment_name(self, addr):
+        segment = self.get_segment(addr)
+        if segment == None:
+            return ''
+        return segment['Name']
+
+    def is_in_segment(self, addr):
+        return self.get_segment(addr) != None
+
+    def dump_bytes(self, ea, length):
+        segment = self.get_segment(ea)
+        if segment == None or segment['Bytes'] == None:
+            return None
+        offset = ea-segment['Start']
+        return segment['Bytes'][offset:offset+length]
+
+    def get_name(self, ea):
+        return self.Names.get(ea, '')
+
+    """ Instruction level function """
+    def get_instruction(self, ea, filter = None, fields = None, lazy = False):
+        if self.InstructionIndex == None:
+            self.InstructionIndex = {}
+            for function_start in self.FunctionStarts:
+                for instruction in self.get_function_graph(function_start).Instructions:
+                    self.InstructionIndex[instruction['Address']] = instruction
+
+        instruction = self.InstructionIndex.get(ea)
+        if instruction == None or not self.match_instruction_filter(filter, instruction):
+            return None
+
+        fields = idatool.table.get_instruction_fields(fields)
+        if lazy:
+            return self.get_lazy_instruction(instruction, fields)
+        if fields == None:
+            return dict(instruction)
+        return idatool.table.project_instruction(instruction, fields)
+
+    def get_instruction_bytes(self, ea):
+        instruction = self.get_instruction(ea)
+        if instruction == None:
+            return None
+        return self.dump_bytes(ea, instruction['Size'])
+
+    def get_instructions(self, filter = None, fields = None, lazy = False):
+        filter = idatool.filters.compile_filter(filter)
+        fields = idatool.table.get_instruction_fields(fields)
+        instructions = []
+        for function_start in self.FunctionStarts:
+            if lazy:
+                instructions += self.get_function_instructions(function_start, filter = filter, fields = fields, lazy = True)
+            else:
+                instructions += self.get_function_instructions(function_start, filter = filter)
+        instructions.sort(key = lambda instruction: instruction['Address'])
+
+        if lazy:
+            return instructions
+
+        if fields != None:
+            return [idatool.table.project_instruction(instruction, fields) for instruction in instructions]
+
+        table = idatool.table.InstructionTable(self.ImageBase)
+        table.extend(instructions)
+        return table
+
+    """ Function level function """
+    def get_function_start(self, ea):
+        if ea == None:
+            return None
+
+        index = bisect.bisect_right(self.FunctionStarts, ea)-1
+        if index < 0:
+            return None
+
+        start = self.FunctionStarts[index]
+        if ea >= self.Functions[start]['End']:
+            return None
+        return start
+
+    def get_function_starts(self):
+        return list(self.FunctionStarts)
+
+    def get_function_name(self, ea):
+        start = self.get_function_start(ea)
+        if start == None:
+            return ''
+        return self.Functions[start]['Name']
+
+    def get_functions(self):
+        functions = []
+        for start in self.FunctionStarts:
+            function = self.Functions[start]
+            functions.append(
+                {
+                    'Type': "Function",
+                    'Address': start,
+                    'RVA': start-self.ImageBase,
+                    'Name': function['Name'],
+                    'Args': [tuple(arg) for arg in function['Args']]
+                }
+            )
+        return functions
+
+    def get_function_graph(self, ea = None):
+        start = self.get_function_start(ea)
+        if start == None:
+            return None
+
+        if not start in self.Graphs:
+            self.Graphs[start] = idatool.graph.FunctionGraph.from_dict(self.Functions[start]['Graph'])
+        return self.Graphs[start]
+
+    def exit(self):
+        pass
+
+def load(filename):
+    return Snapshot(filename)
@@ -0,0 +1,407 @@
+import array
+
+def get_address_typecode():
+    for typecode in ('Q', 'L'):
+        try:
+            if array.array(typecode).itemsize >= 8:
+                return typecode
+        except ValueError:
+            pass
+    return None
+
+AddressTypeCode = get_address_typecode()
+
+def create_address_array(values = ()):
+    if AddressTypeCode == None:
+        return list(values)
+    return array.array(AddressTypeCode, values)
+
+OperandTypeOverflowBit = 31
+
+def get_operand_type_bit(operand_type):
+    return 1 << min(operand_type, OperandTypeOverflowBit)
+
+class Pool:
+    def __init__(self, values = ()):
+        self.Values = []
+        self.Index = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        if value in self.Index:
+            return self.Index[value]
+
+        index = len(self.Values)
+        self.Index[value] = index
+        self.Values.append(value)
+        return index
+
+    def get(self, index):
+        return self.Values[index]
+
+    def find(self, value):
+        return self.Index.get(value, -1)
+
+    def __len__(self):
+        return len(self.Values)
+
+class InstructionRow(object):
+    __slots__ = ('Table', 'Index')
+
+    Keys = (
+        'Type', 'RVA', 'Address', 'Size', 'Disasm', 'Op', 'DREFFrom', 'CREFFrom',
+        'IsCall', 'IsIndirectRegCall', 'Operands', 'Name', 'Comment', 'Repeatable Comment'
+    )
+
+    def __init__(self, table, index):
+        self.Table = table
+        self.Index = index
+
+    def __getitem__(self, key):
+        return self.Table.get_field(self.Index, key)
+
+    def __setitem__(self, key, value):
+        self.Table.set_field(self.Index, key, value)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, InstructionRow, LazyInstruction)):
+            return self.to_dict() == dict(other.items())
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def get(self, key, default = None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        keys = list(self.Keys)
+        if self.Index in self.Table.Extra:
+            for key in self.Table.Extra[self.Index].keys():
+                if not key in self.Keys:
+                    keys.append(key)
+        return keys
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+InstructionFields = InstructionRow.Keys
+
+def get_instruction_fields(fields):
+    if fields == None:
+        return None
+
+    if not isinstance(fields, (list, tuple)):
+        fields = fields.split(',')
+
+    fields = tuple(field.strip() for field in fields)
+    for field in fields:
+        if not field in InstructionFields:
+            raise KeyError('%s is not an instruction field' % field)
+    return fields
+
+def project_instruction(instruction, fields):
+    if instruction == None or fields == None:
+        return instruction
+    return dict((field, instruction[field]) for field in fields)
+
+def create_instruction_list(image_base = 0, fields = None, lazy = False):
+    if fields == None and not lazy:
+        return InstructionTable(image_base)
+    return []
+
+class LazyInstruction(object):
+    __slots__ = ('Loader', 'Fields', 'Values')
+
+    def __init__(self, loader, values, fields = None):
+        self.Loader = loader
+        self.Values = values
+        if fields == None:
+            self.Fields = InstructionFields
+        else:
+            self.Fields = fields
+
+    def __getitem__(self, key):
+        if not key in self.Values:
+            self.Loader(self, key)
+        return self.Values[key]
+
+    def __setitem__(self, key, value):
+        self.Values[key] = value
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, LazyInstruction, InstructionRow)):
+            return self.to_dict() == dict(other.items())
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def is_loaded(self, key):
+        return key in self.Values
+
+    def get(self, key, default = None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        keys = list(self.Fields)
+        for key in self.Values.keys():
+            if not key in InstructionFields:
+                keys.append(key)
+        return keys
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+class InstructionTable:
+    IsIndirectRegCallFlag = 0x1
+
+    def __init__(self, image_base = 0):
+        self.ImageBase = image_base
+
+        self.Addresses = create_address_array()
+        self.Sizes = array.array('H')
+        self.MnemonicIds = array.array('H')
+        self.IsCallIds = array.array('B')
+        self.OperandTypeMasks = array.array('L')
+        self.Flags = array.array('B')
+        self.DisasmIds = array.array('L')
+
+        self.OperandStarts = array.array('L', [0])
+        self.OperandIds = array.array('L')
+
+        self.DREFStarts = array.array('L', [0])
+        self.DREFAddresses = create_address_array()
+
+        self.CREFStarts = array.array('L', [0])
+        self.CREFAddresses = create_address_array()
+        self.CREFKindIds = array.array('B')
+
+        self.Mnemonics = Pool()
+        self.Operands = Pool()
+        self.OperandDicts = []
+        self.Strings = Pool()
+        self.IsCallValues = Pool()
+        self.CREFKinds = Pool(('Next', 'Call', 'Jmp'))
+
+        self.Names = {}
+        self.Comments = {}
+        self.RepeatableComments = {}
+        self.Extra = {}
+
+        self.Getters = {
+            'Type': lambda index: 'Instruction',
+            'RVA': lambda index: self.Addresses[index]-self.ImageBase,
+            'Address': lambda index: self.Addresses[index],
+            'Size': lambda index: self.Sizes[index],
+            'Disasm': lambda index: self.Strings.get(self.DisasmIds[index]),
+            'Op': self.get_mnemonic,
+            'DREFFrom': self.get_dref_from,
+            'CREFFrom': self.get_cref_from,
+            'IsCall': lambda index: self.IsCallValues.get(self.IsCallIds[index]),
+            'IsIndirectRegCall': lambda index: (self.Flags[index] & self.IsIndirectRegCallFlag) != 0,
+            'Operands': self.get_operands,
+            'Name': lambda index: self.Names.get(index, ''),
+            'Comment': lambda index: self.Comments.get(index, ''),
+            'Repeatable Comment': lambda index: self.RepeatableComments.get(index, '')
+        }
+
+    def __len__(self):
+        return len(self.Addresses)
+
+    def __iter__(self):
+        for index in range(0, len(self.Addresses), 1):
+            yield InstructionRow(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [InstructionRow(self, i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if index < 0 or index >= len(self):
+            raise IndexError('instruction index out of range')
+
+        return InstructionRow(self, index)
+
+    def append(self, instruction):
+        index = len(self.Addresses)
+
+        self.Addresses.append(instruction['Address'])
+        self.Sizes.append(instruction['Size'])
+        self.MnemonicIds.append(self.Mnemonics.add(instruction['Op']))
+        self.DisasmIds.append(self.Strings.add(instruction['Disasm']))
+
+        self.IsCallIds.append(self.IsCallValues.add(instruction['IsCall']))
+
+        flags = 0
+        if instruction['IsIndirectRegCall']:
+            flags |= self.IsIndirectRegCallFlag
+        self.Flags.append(flags)
+
+        operand_type_mask = 0
+        for operand in instruction['Operands']:
+            operand_type_mask |= get_operand_type_bit(operand['TypeValue'])
+            self.OperandIds.append(self.Operands.add(tuple(sorted(operand.items()))))
+        self.OperandTypeMasks.append(operand_type_mask)
+        self.OperandStarts.append(len(self.OperandIds))
+
+        for dref in instruction['DREFFrom']:
+            self.DREFAddresses.append(dref)
+        self.DREFStarts.append(len(self.DREFAddresses))
+
+        for (cref_type, cref) in instruction['CREFFrom']:
+            self.CREFKindIds.append(self.CREFKinds.add(cref_type))
+            self.CREFAddresses.append(cref)
+        self.CREFStarts.append(len(self.CREFAddresses))
+
+        if instruction['Name']:
+            self.Names[index] = instruction['Name']
+        if instruction['Comment']:
+            self.Comments[index] = instruction['Comment']
+        if instruction['Repeatable Comment']:
+            self.RepeatableComments[index] = instruction['Repeatable Comment']
+
+        for key in instruction.keys():
+            if not key in InstructionRow.Keys:
+                self.set_field(index, key, instruction[key])
+
+        return InstructionRow(self, index)
+
+    def extend(self, instructions):
+        for instruction in instructions:
+            self.append(instruction)
+
+    def get_field(self, index, key):
+        if index in self.Extra and key in self.Extra[index]:
+            return self.Extra[index][key]
+
+        if key in self.Getters:
+            return self.Getters[key](index)
+
+        raise KeyError(key)
+
+    def set_field(self, index, key, value):
+        if not index in self.Extra:
+            self.Extra[index] = {}
+        self.Extra[index][key] = value
+
+    def get_mnemonic(self, index):
+        return self.Mnemonics.get(self.MnemonicIds[index])
+
+    # Operand dicts are pooled and shared by every row with the same operand; replace a row's
+    # 'Operands' instead of changing them in place.
+    def get_operand(self, operand_id):
+        while len(self.OperandDicts) <= operand_id:
+            self.OperandDicts.append(dict(self.Operands.get(len(self.OperandDicts))))
+        return self.OperandDicts[operand_id]
+
+    def get_operands(self, index):
+        operands = []
+        for i in range(self.OperandStarts[index], self.OperandStarts[index+1], 1):
+            operands.append(self.get_operand(self.OperandIds[i]))
+        return operands
+
+    def get_dref_from(self, index):
+        return list(self.DREFAddresses[self.DREFStarts[index]:self.DREFStarts[index+1]])
+
+    def get_cref_from(self, index):
+        crefs = []
+        for i in range(self.CREFStarts[index], self.CREFStarts[index+1], 1):
+            crefs.append((self.CREFKinds.get(self.CREFKindIds[i]), self.CREFAddresses[i]))
+        return crefs
+
+    def has_operand_type(self, index, operand_type):
+        if (self.OperandTypeMasks[index] & get_operand_type_bit(operand_type)) == 0:
+            return False
+
+        if operand_type < OperandTypeOverflowBit:
+            return True
+
+        for operand in self.get_operands(index):
+            if operand['TypeValue'] == operand_type:
+                return True
+        return False
+
+    def find_rows(self, ops = None, operand_types = None):
+        mnemonic_ids = None
+        if ops != None:
+            mnemonic_ids = set()
+            for op in ops:
+                mnemonic_id = self.Mnemonics.find(op)
+                if mnemonic_id >= 0:
+                    mnemonic_ids.add(mnemonic_id)
+
+        operand_type_mask = 0
+        if operand_types != None:
+            for operand_type in operand_types:
+                operand_type_mask |= get_operand_type_bit(operand_type)
+
+        for index in range(0, len(self.Addresses), 1):
+            if mnemonic_ids != None and not self.MnemonicIds[index] in mnemonic_ids:
+                continue
+
+            if operand_type_mask:
+                matched_mask = self.OperandTypeMasks[index] & operand_type_mask
+                if matched_mask == 0:
+                    continue
+
+                if matched_mask == get_operand_type_bit(OperandTypeOverflowBit):
+                    found = False
+                    for operand_type in operand_types:
+                        if self.has_operand_type(index, operand_type):
+                            found = True
+                            break
+                    if not found:
+                        continue
+
+            yield InstructionRow(self, index)
+
+    def to_list(self):
+        return [row.to_dict() for row in self]
@@ -2,11 +2,16 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
+import array
+import bisect
+
 from idaapi import *
 from idautils import *
 from idc import *
 import idc
 
+import idatool.table
+
 class Area:
     @staticmethod
     def get_selection():
@@ -70,15 +75,237 @@ class Name:
             return True
         return False
 
-class Seg:
+class SegmentHooks(IDB_Hooks):
+    def segm_added(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+    def segm_deleted(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+    def segm_start_changed(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+    def segm_end_changed(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+    def segm_moved(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+    def segm_name_changed(self, *args):
+        SegmentIndex.invalidate()
+        return 0
+
+class SegmentIndex:
+    Starts = None
+    Ends = []
+    Names = []
+    Count = -1
+    Hooks = None
+
     @staticmethod
-    def get_name(addr):
+    def invalidate():
+        SegmentIndex.Starts = None
+
+    @staticmethod
+    def build():
+        segments = []
         for i in range(0, get_segm_qty(), 1):
             seg = getnseg(i)
-            seg_name = get_segm_name(seg.startEA)
-            if seg.startEA <= addr and addr <= seg.endEA:
-                return seg_name
-        return ''        
+            segments.append((seg.startEA, seg.endEA, get_segm_name(seg.startEA)))
+        segments.sort()
+
+        SegmentIndex.Starts = [start for (start, end, name) in segments]
+        SegmentIndex.Ends = [end for (start, end, name) in segments]
+        SegmentIndex.Names = [name for (start, end, name) in segments]
+        SegmentIndex.Count = len(segments)
+
+        if SegmentIndex.Hooks == None:
+            try:
+                SegmentIndex.Hooks = SegmentHooks()
+                SegmentIndex.Hooks.hook()
+            except:
+                SegmentIndex.Hooks = False
+
+    @staticmethod
+    def find(addr):
+        if SegmentIndex.Starts == None or SegmentIndex.Count != get_segm_qty():
+            SegmentIndex.build()
+
+        index = bisect.bisect_right(SegmentIndex.Starts, addr)-1
+        if index >= 0 and addr <= SegmentIndex.Ends[index]:
+            return index
+        return -1
+
+class Generation:
+    NodeName = '$ idatool.generation'
+
+    @staticmethod
+    def get_node():
+        return netnode(Generation.NodeName, 0, True)
+
+    @staticmethod
+    def get():
+        try:
+            return Generation.get_node().altval(0)
+        except:
+            return 0
+
+    @staticmethod
+    def bump():
+        try:
+            node = Generation.get_node()
+            value = node.altval(0)+1
+            node.altset(0, value)
+            return value
+        except:
+            return None
+
+def get_hook_address(args):
+    if len(args) == 0:
+        return None
+
+    target = args[0]
+    if hasattr(target, 'startEA'):
+        return int(target.startEA)
+    elif hasattr(target, 'start_ea'):
+        return int(target.start_ea)
+    elif hasattr(target, 'ea'):
+        return int(target.ea)
+    return int(target)
+
+class FunctionHooks(IDB_Hooks):
+    def __init__(self, callback, added_callback = None, deleted_callback = None, idle_callback = None):
+        IDB_Hooks.__init__(self)
+        self.Callback = callback
+        self.AddedCallback = added_callback
+        self.DeletedCallback = deleted_callback
+        self.IdleCallback = idle_callback
+
+    def __notify(self, args, callback = None):
+        if callback == None:
+            callback = self.Callback
+
+        try:
+            ea = get_hook_address(args)
+            if ea != None:
+                callback(ea)
+        except:
+            pass
+        return 0
+
+    def func_added(self, *args):
+        return self.__notify(args, self.AddedCallback)
+
+    def auto_empty_finally(self, *args):
+        if self.IdleCallback != None:
+            try:
+                self.IdleCallback()
+            except:
+                pass
+        return 0
+
+    def func_updated(self, *args):
+        return self.__notify(args)
+
+    def deleting_func(self, *args):
+        return self.__notify(args, self.DeletedCallback)
+
+    def set_func_start(self, *args):
+        return self.__notify(args)
+
+    def set_func_end(self, *args):
+        return self.__notify(args)
+
+    def func_tail_appended(self, *args):
+        return self.__notify(args)
+
+    def func_tail_removed(self, *args):
+        return self.__notify(args)
+
+    def make_code(self, *args):
+        return self.__notify(args)
+
+    def make_data(self, *args):
+        return self.__notify(args)
+
+    def renamed(self, *args):
+        return self.__notify(args)
+
+    def cmt_changed(self, *args):
+        return self.__notify(args)
+
+    def byte_patched(self, *args):
+        return self.__notify(args)
+
+class XrefHooks(IDP_Hooks):
+    def __init__(self, callback):
+        IDP_Hooks.__init__(self)
+        self.Callback = callback
+
+    def __notify(self, frm, to, delta):
+        try:
+            self.Callback(int(frm), int(to), delta)
+        except:
+            pass
+        return 0
+
+    def add_cref(self, frm, to, type):
+        if CrefKinds.get(type & XREF_MASK) == 'Call':
+            return self.__notify(frm, to, 1)
+        return self.__notify(frm, to, 0)
+
+    def del_cref(self, frm, to, expand):
+        if Refs.get_cref_type(frm, to) == 'Call':
+            return self.__notify(frm, to, -1)
+        return self.__notify(frm, to, 0)
+
+class FunctionListHooks(IDP_Hooks):
+    def __init__(self, added_callback, deleted_callback, idle_callback = None):
+        IDP_Hooks.__init__(self)
+        self.AddedCallback = added_callback
+        self.DeletedCallback = deleted_callback
+        self.IdleCallback = idle_callback
+
+    def __notify(self, callback, args):
+        try:
+            ea = get_hook_address(args)
+            if ea != None:
+                callback(ea)
+        except:
+            pass
+
+    def add_func(self, *args):
+        self.__notify(self.AddedCallback, args)
+        return 0
+
+    def del_func(self, *args):
+        self.__notify(self.DeletedCallback, args)
+        return 1
+
+    def auto_empty_finally(self, *args):
+        if self.IdleCallback != None:
+            try:
+                self.IdleCallback()
+            except:
+                pass
+        return 0
+
+class Seg:
+    @staticmethod
+    def get_name(addr):
+        index = SegmentIndex.find(addr)
+        if index < 0:
+            return ''
+        return SegmentIndex.Names[index]
+
+    @staticmethod
+    def is_in_segment(addr):
+        return SegmentIndex.find(addr) >= 0
 
 class Cmt:
     @staticmethod
@@ -97,6 +324,32 @@ class Cmt:
 
         return get_cmt(current_address, flag)
 
+CrefKinds = {fl_F: 'Next', fl_CN: 'Call', fl_CF: 'Call', fl_JN: 'Jmp', fl_JF: 'Jmp'}
+
+class XrefTable:
+    Kinds = ('Next', 'Call', 'Jmp', 'Data')
+    KindIds = {'Next': 0, 'Call': 1, 'Jmp': 2, 'Data': 3}
+
+    def __init__(self):
+        self.Froms = idatool.table.create_address_array()
+        self.Tos = idatool.table.create_address_array()
+        self.KindIds = array.array('B')
+
+    def append(self, frm, to, kind):
+        self.Froms.append(frm)
+        self.Tos.append(to)
+        self.KindIds.append(XrefTable.KindIds[kind])
+
+    def __len__(self):
+        return len(self.Froms)
+
+    def __getitem__(self, index):
+        return (self.Froms[index], self.Tos[index], XrefTable.Kinds[self.KindIds[index]])
+
+    def __iter__(self):
+        for index in range(0, len(self.Froms), 1):
+            yield self[index]
+
 class Refs:
     @staticmethod
     def get_item_size(ea):
@@ -107,25 +360,86 @@ class Refs:
         return ea+get_item_size(ea)
 
     @staticmethod
-    def get_cref_from(ea):
-        refs = []
-        ref = get_first_cref_from(ea)
-        while ref != BADADDR:           
-            if ea+get_item_size(ea) == ref:
-                refs.append(('Next', ref))
+    def get_xrefs_from(ea):
+        crefs = []
+        drefs = []
+        xb = xrefblk_t()
+        ok = xb.first_from(ea, XREF_ALL)
+        while ok:
+            if xb.iscode:
+                if xb.type in CrefKinds:
+                    crefs.append((CrefKinds[xb.type], xb.to))
             else:
-                decode_insn(ea)
-                if cmd.get_canon_feature() & CF_CALL:
-                    refs.append(('Call', ref))
-                else:
-                    refs.append(('Jmp', ref))
+                drefs.append(xb.to)
+            ok = xb.next_from()
+        return (crefs, drefs)
 
-            ref = get_next_cref_from(ea, ref)
+    @staticmethod
+    def get_crefs_to(ea, flags = XREF_ALL):
+        refs = []
+        xb = xrefblk_t()
+        ok = xb.first_to(ea, flags)
+        while ok:
+            if xb.iscode and xb.type in CrefKinds:
+                refs.append((CrefKinds[xb.type], xb.frm))
+            ok = xb.next_to()
         return refs
+
+    @staticmethod
+    def get_cref_type(frm, to):
+        xb = xrefblk_t()
+        ok = xb.first_from(frm, XREF_FAR)
+        while ok:
+            if xb.iscode and xb.to == to:
+                return CrefKinds.get(xb.type)
+            ok = xb.next_from()
+        return None
+
+    @staticmethod
+    def get_callers(ea):
+        callers = []
+        for (cref_type, frm) in Refs.get_crefs_to(ea, XREF_FAR):
+            if cref_type != 'Call':
+                continue
+
+            func = get_func(frm)
+            if func:
+                callers.append((frm, func.startEA))
+        return callers
+
+    @staticmethod
+    def get_xref_table(addresses, data = False):
+        table = XrefTable()
+        xb = xrefblk_t()
+        for ea in addresses:
+            ok = xb.first_from(ea, XREF_ALL)
+            while ok:
+                if xb.iscode:
+                    if xb.type in CrefKinds:
+                        table.append(ea, xb.to, CrefKinds[xb.type])
+                elif data:
+                    table.append(ea, xb.to, 'Data')
+                ok = xb.next_from()
+        return table
+
+    @staticmethod
+    def get_range_xref_table(start, end, data = False):
+        return Refs.get_xref_table(Heads(start, end), data)
+
+    @staticmethod
+    def get_function_xref_table(ea, data = False):
+        func = get_func(ea)
+        if not func:
+            return XrefTable()
+        return Refs.get_xref_table(FuncItems(func.startEA), data)
+
+    @staticmethod
+    def get_cref_from(ea):
+        return Refs.get_xrefs_from(ea)[0]
         
     @staticmethod
     def get_jump_cref_from(ea):
-        jmp_crefs = 0
+        jmp_crefs = []
         for (cref_type, cref) in Refs.get_cref_from(ea):
             if cref_type == 'Jmp':
                 jmp_crefs.append(cref)
@@ -133,25 +447,12 @@ class Refs:
 
     @staticmethod
     def get_cref_to(ea):
-        refs = []
-        ref = get_first_cref_to(ea)
-        while ref != BADADDR:
-            if ref+get_item_size(ref) == ea:
-                refs.append(('Next', ref))
-            else:
-                decode_insn(ref)
-                if cmd.get_canon_feature() & CF_CALL:
-                    refs.append(('Call', ref))
-                else:
-                    refs.append(('Jmp', ref))
-            ref = get_next_cref_to(ea, ref)
-
-        return refs
+        return Refs.get_crefs_to(ea)
 
     @staticmethod
     def get_jump_cref_to(ea):
-        jmp_crefs = 0
-        for (cref_type, cref) in self.get_cref_to(ea):
+        jmp_crefs = []
+        for (cref_type, cref) in Refs.get_crefs_to(ea, XREF_FAR):
             if cref_type == 'Jmp':
                 jmp_crefs.append(cref)
         return jmp_crefs
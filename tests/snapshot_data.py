@@ -0,0 +1,99 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import shutil
+import tempfile
+import unittest
+
+import idatool.graph
+import idatool.operandtypes
+import idatool.snapshot
+
+ImageBase = 0x400000
+
+Main = 0x401000
+Helper = 0x401100
+Twin = 0x401200
+Data = 0x403000
+
+def make_operand(type, value, position, data_type = 'DWORD'):
+    operand = {}
+    operand['Type'] = idatool.operandtypes.Values[type]
+    operand['TypeValue'] = type
+    operand['DataType'] = data_type
+    operand['Value'] = value
+    operand['Position'] = position
+    return operand
+
+def register(name, position = 0):
+    return make_operand(idatool.operandtypes.o_reg, name, position)
+
+def immediate(value, position = 1):
+    return make_operand(idatool.operandtypes.o_imm, value, position)
+
+def near(address, position = 0):
+    return make_operand(idatool.operandtypes.o_near, address, position)
+
+def make_instruction(address, op, size, operands = [], crefs = [], drefs = [], name = '', comment = '', is_indirect_reg_call = False):
+    instruction = {}
+    instruction['Type'] = 'Instruction'
+    instruction['RVA'] = address-ImageBase
+    instruction['Address'] = address
+    instruction['Size'] = size
+    instruction['Disasm'] = op
+    instruction['Op'] = op
+    instruction['DREFFrom'] = list(drefs)
+    instruction['CREFFrom'] = list(crefs)
+    if not op.startswith('ret') and op != 'jmp':
+        instruction['CREFFrom'].insert(0, ('Next', address+size))
+    instruction['IsCall'] = op == 'call'
+    instruction['IsIndirectRegCall'] = is_indirect_reg_call
+    instruction['Operands'] = list(operands)
+    instruction['Name'] = name
+    instruction['Comment'] = comment
+    instruction['Repeatable Comment'] = ''
+    return instruction
+
+def get_main_graph():
+    instructions = [
+        make_instruction(0x401000, 'push', 1, [register('ebp')], name = 'main'),
+        make_instruction(0x401001, 'mov', 5, [register('eax'), immediate(0x12345678)]),
+        make_instruction(0x401006, 'xor', 5, [register('eax'), immediate(0xdeadbeef)], comment = 'loop'),
+        make_instruction(0x40100b, 'call', 5, [near(Helper)], crefs = [('Call', Helper)]),
+        make_instruction(0x401010, 'jnz', 2, [near(0x401006)], crefs = [('Jmp', 0x401006)]),
+        make_instruction(0x401012, 'call', 2, [register('eax')], is_indirect_reg_call = True),
+        make_instruction(0x401014, 'retn', 1)
+    ]
+    return idatool.graph.FunctionGraph(Main, instructions, [0x401000, 0x401006, 0x401012], [0x401010, 0x401014])
+
+def get_leaf_graph(start, name):
+    instructions = [
+        make_instruction(start, 'mov', 5, [register('eax'), immediate(Data)], name = name),
+        make_instruction(start+5, 'add', 3, [register('eax'), immediate(1)]),
+        make_instruction(start+8, 'retn', 1)
+    ]
+    return idatool.graph.FunctionGraph(start, instructions, [start], [start+8])
+
+def write_snapshot(filename):
+    writer = idatool.snapshot.Writer(filename, {'ImageName': 'toy.exe', 'ImageBase': ImageBase, 'FileHash': 'deadbeef'})
+    writer.add_segment(0x401000, 0x401fff, '.text', b'\x90'*0x1000)
+    writer.add_segment(Data, 0x403fff, '.data', None)
+    writer.add_function(Main, 0x401015, 'main', [], get_main_graph())
+    writer.add_function(Helper, 0x401109, 'helper', [], get_leaf_graph(Helper, 'helper'))
+    writer.add_function(Twin, 0x401209, 'twin', [], get_leaf_graph(Twin, 'twin'))
+    writer.add_name(Data, 'g_data')
+    writer.close()
+
+def load_snapshot(dirname):
+    filename = os.path.join(dirname, 'toy.snapshot.gz')
+    write_snapshot(filename)
+    return idatool.snapshot.load(filename)
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.Dirname = tempfile.mkdtemp()
+        self.Snapshot = load_snapshot(self.Dirname)
+
+    def tearDown(self):
+        shutil.rmtree(self.Dirname)
@@ -0,0 +1,71 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import idatool.cache
+
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.Dirname = tempfile.mkdtemp()
+        self.Filename = os.path.join(self.Dirname, 'cache.db')
+        self.Counter = '1'
+
+    def tearDown(self):
+        shutil.rmtree(self.Dirname)
+
+    def open_cache(self):
+        return idatool.cache.AnalysisCache(self.Filename, 'deadbeef', self.Counter, lambda: self.Counter)
+
+    def get_rows(self, sql):
+        conn = sqlite3.connect(self.Filename)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_round_trip(self):
+        cache = self.open_cache()
+        cache.put('FunctionGraph', 0x401000, {'Start': 0x401000})
+        self.assertEqual(cache.get('FunctionGraph', 0x401000), {'Start': 0x401000})
+        cache.close()
+
+        cache = self.open_cache()
+        self.assertEqual(cache.get('FunctionGraph', 0x401000), {'Start': 0x401000})
+        self.assertEqual(cache.get('FunctionGraph', 0x401100), None)
+        self.assertEqual(cache.get_statistics()['Hits'], 1)
+        cache.close()
+
+    def test_counter_change_drops_entries(self):
+        cache = self.open_cache()
+        cache.put('FunctionGraph', 0x401000, {})
+        cache.close()
+
+        self.Counter = '2'
+        cache = self.open_cache()
+        self.assertEqual(cache.get('FunctionGraph', 0x401000), None)
+        cache.close()
+
+    def test_batched_invalidation(self):
+        cache = self.open_cache()
+        cache.put('FunctionGraph', 0x401000, {})
+        cache.put('WalkFunctionHash', 0x401000, 'aa', 'Op')
+        cache.put('FunctionGraph', 0x401100, {})
+        cache.flush()
+
+        cache.invalidate(0x401000)
+        self.Counter = '2'
+        self.assertEqual(cache.get('WalkFunctionHash', 0x401000, 'Op'), None)
+        self.assertEqual(self.get_rows('SELECT COUNT(*) FROM CacheEntries'), [(3, )])
+
+        cache.put('FunctionGraph', 0x401000, {'New': 1})
+        cache.flush()
+        self.assertEqual(self.get_rows('SELECT Key, Value FROM CacheEntries WHERE Kind = \'FunctionGraph\' ORDER BY Key'), [(0x401000, '{"New": 1}'), (0x401100, '{}')])
+        self.assertEqual(self.get_rows('SELECT IDBCounter FROM CacheInformation'), [('2', )])
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
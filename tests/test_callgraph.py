@@ -0,0 +1,68 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.callgraph
+import idatool.graph
+from tests import snapshot_data
+
+class CallGraphTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+        self.CallGraph = self.Snapshot.get_call_graph()
+
+    def test_edges(self):
+        self.assertEqual(len(self.CallGraph), 3)
+        self.assertEqual(list(self.CallGraph.get_callees(snapshot_data.Main)),
+                        [(0x40100b, snapshot_data.Helper, idatool.callgraph.Direct), (0x401012, 0, idatool.callgraph.Indirect)])
+        self.assertEqual(list(self.CallGraph.get_callers(snapshot_data.Helper)), [(0x40100b, snapshot_data.Main)])
+        self.assertEqual(list(self.CallGraph.get_callers(snapshot_data.Twin)), [])
+        self.assertEqual(self.CallGraph.get_operand_string(0x401012), 'eax')
+
+    def test_degrees(self):
+        self.assertEqual(self.CallGraph.get_out_degree(snapshot_data.Main), 2)
+        self.assertEqual(self.CallGraph.get_in_degree(snapshot_data.Helper), 1)
+        self.assertEqual(self.CallGraph.get_in_degree(0x31337), 0)
+
+    def __call_helper_from_twin(self):
+        instructions = [
+            snapshot_data.make_instruction(snapshot_data.Twin, 'call', 5, [snapshot_data.near(snapshot_data.Helper)], crefs = [('Call', snapshot_data.Helper)], name = 'twin'),
+            snapshot_data.make_instruction(snapshot_data.Twin+5, 'retn', 1)
+        ]
+        self.Snapshot.Graphs[snapshot_data.Twin] = idatool.graph.FunctionGraph(snapshot_data.Twin, instructions, [snapshot_data.Twin], [snapshot_data.Twin+5])
+        self.CallGraph.invalidate(snapshot_data.Twin)
+
+    def test_overlay(self):
+        self.assertEqual(self.CallGraph.get_in_degree(snapshot_data.Helper), 1)
+        in_starts = self.CallGraph.InStarts
+        self.__call_helper_from_twin()
+
+        self.assertEqual(self.CallGraph.get_callers(snapshot_data.Helper), [(0x40100b, snapshot_data.Main), (snapshot_data.Twin, snapshot_data.Twin)])
+        self.assertEqual(self.CallGraph.get_callees(snapshot_data.Twin), [(snapshot_data.Twin, snapshot_data.Helper, idatool.callgraph.Direct)])
+        self.assertEqual(self.CallGraph.get_in_degree(snapshot_data.Helper), 2)
+        self.assertEqual(self.CallGraph.get_out_degree(snapshot_data.Twin), 1)
+        self.assertTrue(self.CallGraph.InStarts is in_starts)
+
+        self.assertEqual(self.CallGraph.get_node(snapshot_data.Twin), 2)
+        self.assertFalse(self.CallGraph.InStarts is in_starts)
+        self.assertEqual(self.CallGraph.get_in_degree(snapshot_data.Helper), 2)
+
+    def test_overlay_limit(self):
+        self.CallGraph.OverlayLimit = 0
+        self.__call_helper_from_twin()
+        self.assertEqual(self.CallGraph.get_in_degree(snapshot_data.Helper), 2)
+        self.assertEqual(self.CallGraph.Overlay, {})
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.Dirname, 'callgraph.gz')
+        self.CallGraph.save(filename)
+
+        call_graph = idatool.callgraph.CallGraph()
+        self.assertNotEqual(call_graph.load(filename), None)
+        self.assertEqual(list(call_graph.get_callers(snapshot_data.Helper)), [(0x40100b, snapshot_data.Main)])
+        self.assertEqual(call_graph.get_operand_string(0x401012), 'eax')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+from tests import snapshot_data
+
+class DegreeTableTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+        self.DegreeTable = self.Snapshot.get_degree_table()
+
+    def test_in_degrees(self):
+        self.assertEqual(self.DegreeTable.get_in_degree(snapshot_data.Helper), 1)
+        self.assertEqual(self.DegreeTable.get_in_degree(snapshot_data.Main), 0)
+        self.assertEqual(self.DegreeTable.get_out_degree(snapshot_data.Main), 1)
+        self.assertEqual(self.DegreeTable.get_out_degree(snapshot_data.Helper), 0)
+
+    def test_utility_functions(self):
+        self.assertEqual(self.Snapshot.find_utility_functions(threshold = 1), {snapshot_data.Helper: True})
+        self.assertEqual(self.Snapshot.find_utility_functions(threshold = 2), {})
+        self.assertEqual(self.Snapshot.find_utility_functions(percentile = 90), {snapshot_data.Helper: True})
+
+    def test_update(self):
+        self.DegreeTable.build()
+        self.DegreeTable.update(snapshot_data.Main, snapshot_data.Twin, 1)
+        self.assertEqual(self.Snapshot.find_utility_functions(threshold = 1), {snapshot_data.Helper: True, snapshot_data.Twin: True})
+        self.assertEqual(self.DegreeTable.get_out_degree(snapshot_data.Main), 2)
+
+        self.DegreeTable.update(snapshot_data.Main, snapshot_data.Helper, -1)
+        self.assertEqual(self.DegreeTable.get_in_degree(snapshot_data.Helper), 0)
+        self.DegreeTable.update(snapshot_data.Main, snapshot_data.Data, 1)
+        self.assertEqual(self.DegreeTable.get_out_degree(snapshot_data.Main), 1)
+
+        self.DegreeTable.invalidate()
+        self.assertEqual(self.DegreeTable.get_in_degree(snapshot_data.Helper), 1)
+        self.assertEqual(self.DegreeTable.get_in_degree(snapshot_data.Twin), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.filters
+import idatool.operandtypes
+from tests import snapshot_data
+
+class FiltersTest(snapshot_data.SnapshotTestCase):
+    def get_addresses(self, filter):
+        return [instruction['Address'] for instruction in self.Snapshot.get_instructions(filter = filter)]
+
+    def test_op_filter(self):
+        self.assertEqual(self.get_addresses({'Op': ['call']}), [0x40100b, 0x401012])
+
+    def test_target_filters(self):
+        self.assertEqual(self.get_addresses(self.Snapshot.get_filter('IndirectCall')), [0x401012])
+        self.assertEqual(self.get_addresses({'Op': ['mov'], 'Target': 'Immediate'}), [0x401001, 0x401100, 0x401200])
+        self.assertEqual(self.get_addresses({'Target': 'Unknown'}), [])
+
+    def test_operand_types(self):
+        filter = idatool.filters.compile_filter(self.Snapshot.get_filter('IndirectCall'))
+        self.assertTrue(filter.match_operand_types([idatool.operandtypes.o_reg]))
+        self.assertFalse(filter.match_operand_types([idatool.operandtypes.o_near]))
+        self.assertFalse(filter.match_operand_types([]))
+
+    def test_filter_set(self):
+        filter_set = idatool.filters.InstructionFilterSet([{'Op': ['xor']}, self.Snapshot.get_filter('IndirectCall')])
+        self.assertEqual(filter_set.Ops, frozenset(['xor', 'call', 'jmp']))
+        self.assertTrue(filter_set.needs_operand_types())
+        self.assertEqual(self.get_addresses(filter_set), [0x401006, 0x401012])
+
+        self.assertEqual(idatool.filters.InstructionFilterSet([{'Op': ['xor']}, {}]).Ops, None)
+
+    def test_compile_filter(self):
+        filter = idatool.filters.compile_filter({'Op': ['call']})
+        self.assertTrue(idatool.filters.compile_filter(filter) is filter)
+        self.assertEqual(idatool.filters.compile_filter(None), None)
+        self.assertEqual(filter.Ops, frozenset(['call']))
+        self.assertTrue(filter(self.Snapshot.get_instruction(0x40100b)))
+        self.assertFalse(filter(self.Snapshot.get_instruction(0x401010)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.graph
+from tests import snapshot_data
+
+class GraphTest(snapshot_data.SnapshotTestCase):
+    def test_blocks(self):
+        blocks = self.Snapshot.get_function_blocks(snapshot_data.Main)
+        self.assertEqual([(block_start, block_end) for (block_start, block_end, instructions) in blocks],
+                        [(0x401000, 0x401001), (0x401006, 0x401010), (0x401012, 0x401014)])
+
+    def test_block_instructions(self):
+        self.assertEqual([instruction['Address'] for instruction in self.Snapshot.get_block_instructions(0x40100b)], [0x401006, 0x40100b, 0x401010])
+        self.assertEqual(self.Snapshot.get_block_instructions(snapshot_data.Data), [])
+        self.assertEqual(self.Snapshot.get_function_graph(0x401010), self.Snapshot.get_function_graph(snapshot_data.Main))
+
+    def test_graph_cache(self):
+        cache = idatool.graph.FunctionGraphCache(max_instructions = 6)
+        cache.put(snapshot_data.get_leaf_graph(snapshot_data.Helper, 'helper'))
+        cache.put(snapshot_data.get_leaf_graph(snapshot_data.Twin, 'twin'))
+        self.assertEqual(len(cache), 2)
+
+        self.assertNotEqual(cache.get(snapshot_data.Helper), None)
+        cache.put(snapshot_data.get_main_graph())
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(snapshot_data.Helper), None)
+        self.assertEqual(cache.TotalInstructions, 7)
+
+        cache.invalidate(snapshot_data.Main)
+        self.assertEqual((len(cache), cache.TotalInstructions), (0, 0))
+
+    def test_walk_instructions(self):
+        instructions = [
+            snapshot_data.make_instruction(0x1000, 'cmp', 2),
+            snapshot_data.make_instruction(0x1002, 'jz', 2, crefs = [('Jmp', 0x1006)]),
+            snapshot_data.make_instruction(0x1004, 'inc', 2),
+            snapshot_data.make_instruction(0x1006, 'retn', 1)
+        ]
+        graph = idatool.graph.FunctionGraph(0x1000, instructions, [0x1000, 0x1004, 0x1006], [0x1002, 0x1006])
+        self.assertEqual([instruction['Address'] for instruction in graph.get_walk_instructions()],
+                        [0x1000, 0x1002, 0x1004, 0x1006, 0x1006])
+
+class LoopTest(snapshot_data.SnapshotTestCase):
+    def test_find_loops(self):
+        loops = self.Snapshot.find_function_loops(snapshot_data.Main)
+        self.assertEqual(len(loops), 1)
+        self.assertEqual(loops[0]['Header'], 0x401006)
+        self.assertEqual(loops[0]['Blocks'], [0x401006])
+        self.assertEqual(loops[0]['BackEdges'], [(0x401006, 0x401006)])
+        self.assertEqual(self.Snapshot.find_function_loops(snapshot_data.Helper), [])
+
+        loops_list = self.Snapshot.find_loops()
+        self.assertEqual([(entry['Function']['Address'], len(entry['Loops'])) for entry in loops_list], [(snapshot_data.Main, 1)])
+
+    def test_find_nested_loops(self):
+        src_map = {1: [2], 2: [3], 3: [2, 4], 4: [1, 5]}
+        loops = idatool.graph.find_loops(1, src_map)
+        self.assertEqual([(loop['Header'], loop['Depth'], loop['Blocks']) for loop in loops],
+                        [(1, 1, [1, 2, 3, 4]), (2, 2, [2, 3])])
+
+    def test_find_irreducible_loops(self):
+        src_map = {1: [2, 3], 2: [3], 3: [2]}
+        self.assertEqual(idatool.graph.find_loops(1, src_map), [])
+
+        loops = idatool.graph.find_loops(1, src_map, irreducible = True)
+        self.assertEqual(len(loops), 1)
+        self.assertTrue(loops[0]['Irreducible'])
+        self.assertEqual(loops[0]['Entries'], [2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
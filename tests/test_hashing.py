@@ -0,0 +1,37 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import hashlib
+import unittest
+
+import idatool.hashing
+from tests import snapshot_data
+
+class HashingTest(snapshot_data.SnapshotTestCase):
+    def test_function_hash(self):
+        self.assertEqual(self.Snapshot.get_function_hash(snapshot_data.Helper, ['Op']), hashlib.sha1(b'movaddretn').hexdigest())
+        self.assertEqual(self.Snapshot.get_function_hash(snapshot_data.Helper), hashlib.sha1(b'mov403000add1retn').hexdigest())
+        self.assertEqual(self.Snapshot.get_function_hash(snapshot_data.Helper), self.Snapshot.get_function_hash(snapshot_data.Twin))
+        self.assertNotEqual(self.Snapshot.get_function_hash(snapshot_data.Main), self.Snapshot.get_function_hash(snapshot_data.Helper))
+
+    def test_hash_flavours(self):
+        hash_set = self.Snapshot.get_function_hash_set(snapshot_data.Helper)
+        self.assertEqual(sorted(hash_set.keys()), ['Op', 'Op,imm_operand', 'Op,operand_type'])
+        self.assertEqual(hash_set['Op,operand_type'], hashlib.sha1(b'mov15add15retn').hexdigest())
+
+    def test_single_pass(self):
+        instructions = self.Snapshot.get_function_instructions(snapshot_data.Main)
+        hashes = self.Snapshot.get_instructions_hashes(instructions, [['Op'], ['Op', 'imm_operand']])
+        self.assertEqual(hashes['Op'], self.Snapshot.get_instructions_hash(instructions, ['Op']))
+        self.assertEqual(hashes['Op,imm_operand'], self.Snapshot.get_instructions_hash(instructions, ['Op', 'imm_operand']))
+        self.assertEqual(hashes['Op'], hashlib.sha1(b'pushmovxorcalljnzcallretn').hexdigest())
+
+    def test_drefs_skip_immediates(self):
+        instruction = snapshot_data.make_instruction(0x1000, 'push', 5, [snapshot_data.immediate(0x1234, 0)], drefs = [0x1234])
+        hasher = idatool.hashing.InstructionHasher([['Op', 'imm_operand']])
+        hasher.update(instruction)
+        self.assertEqual(hasher.hexdigests()['Op,imm_operand'], hashlib.sha1(b'push').hexdigest())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import io
+import json
+import unittest
+
+import idatool.hashing
+import idatool.hashstore
+from tests import snapshot_data
+
+class HashStoreTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+        self.Store = idatool.hashstore.FunctionHashStore()
+
+        function_hashes = []
+        for (address, name, function_start) in ((0x10001000, 'imported_main', snapshot_data.Main), (0x10002000, 'imported_helper', snapshot_data.Helper)):
+            function_hashes.append({
+                'Address': address,
+                'Name': name,
+                'Hash': {'Type': idatool.hashing.DefaultHashTypes, 'Value': self.Snapshot.get_function_hash(function_start)}
+            })
+        self.Store.add_function_hashes(function_hashes)
+        self.Store.add_names_and_comments({
+            str(0x10001006): {'Function': 0x10001000, 'Comment': 'imported loop'},
+            str(0x10002000): {'Function': 0x10002000, 'Name': 'imported_helper'}
+        })
+
+    def tearDown(self):
+        self.Store.close()
+        snapshot_data.SnapshotTestCase.tearDown(self)
+
+    def get_current_hashes(self):
+        return [(function['Address'], function['Name'], function['Hash']['Value']) for function in self.Snapshot.get_function_hashes()]
+
+    def test_match(self):
+        matches = list(self.Store.match(self.get_current_hashes()))
+        self.assertEqual(matches, [(snapshot_data.Main, 'main', 0x10001000, 'imported_main')])
+
+    def test_relocated_names_and_comments(self):
+        notes = list(self.Store.get_relocated_names_and_comments([(0x10001000, snapshot_data.Main)]))
+        self.assertEqual(notes, [(0x401006, snapshot_data.Main, 0x10001006, 0x10001000, 'Comment', 'imported loop')])
+
+    def test_ambiguous_hashes(self):
+        self.Store.add_function_hashes([{'Address': 0x10003000, 'Name': 'other', 'Hash': {'Type': idatool.hashing.DefaultHashTypes, 'Value': self.Snapshot.get_function_hash(snapshot_data.Main)}}])
+        self.assertEqual(len(self.Store.get_ambiguous_hashes()), 1)
+        self.assertEqual(list(self.Store.match(self.get_current_hashes())), [])
+
+class HashStoreImportTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+
+        self.Filename = os.path.join(self.Dirname, 'hashes.json')
+        data = {
+            'Version': 1,
+            'Function Hashes': [
+                {'Address': 0x10001000, 'Name': 'imported_main', 'Hash': {'Type': idatool.hashing.DefaultHashTypes, 'Value': self.Snapshot.get_function_hash(snapshot_data.Main)}},
+                {'Address': 0x10002000, 'Name': 'imported_helper', 'Hash': {'Type': ['Op'], 'Value': self.Snapshot.get_function_hash(snapshot_data.Helper, ['Op'])}}
+            ],
+            'Names and Comments': {
+                str(0x10001006): {'Function': 0x10001000, 'Comment': u'imported \u00e9 loop'}
+            },
+            'Trailer': [1, 2.5, None, True, {'a': 'b'}]
+        }
+        fd = open(self.Filename, 'w')
+        json.dump(data, fd, indent = 1)
+        fd.close()
+
+        self.ChunkSize = idatool.hashstore.JSONStream.ChunkSize
+        idatool.hashstore.JSONStream.ChunkSize = 7
+
+    def tearDown(self):
+        idatool.hashstore.JSONStream.ChunkSize = self.ChunkSize
+        snapshot_data.SnapshotTestCase.tearDown(self)
+
+    def test_reimport(self):
+        store_filename = os.path.join(self.Dirname, 'hashes.db')
+        for i in range(0, 2, 1):
+            store = idatool.hashstore.FunctionHashStore(store_filename)
+            store.import_json(self.Filename)
+            store.close()
+
+        store = idatool.hashstore.FunctionHashStore(store_filename)
+        current_hashes = [(function['Address'], function['Name'], function['Hash']['Value']) for function in self.Snapshot.get_function_hashes()]
+        self.assertEqual(store.get_ambiguous_hashes(), [])
+        self.assertEqual(list(store.match(current_hashes)), [(snapshot_data.Main, 'main', 0x10001000, 'imported_main')])
+        self.assertEqual(list(store.get_relocated_names_and_comments([(0x10001000, snapshot_data.Main)])),
+                        [(0x401006, snapshot_data.Main, 0x10001006, 0x10001000, 'Comment', u'imported \u00e9 loop')])
+        store.close()
+
+class JSONStreamTest(unittest.TestCase):
+    def get_stream(self, data):
+        return idatool.hashstore.JSONStream(io.StringIO(data))
+
+    def parse(self, data):
+        stream = self.get_stream(data)
+        if data.startswith('{'):
+            return list(stream.iterate_object_items())
+        return list(stream.iterate_array())
+
+    def test_iterate(self):
+        self.assertEqual(list(self.get_stream(u'[1, "a", {"b": [2]}, null]').iterate_array()), [1, 'a', {'b': [2]}, None])
+        self.assertEqual(list(self.get_stream(u' { "a" : 1 , "b":[] } ').iterate_object_items()), [('a', 1), ('b', [])])
+        self.assertEqual(list(self.get_stream(u'[]').iterate_array()), [])
+        self.assertEqual(list(self.get_stream(u'{}').iterate_object_items()), [])
+
+    def test_malformed(self):
+        for data in (u'[1 2]', u'[1; 2]', u'{"a": 1 "b": 2}', u'{"a": 1; "b": 2}', u'[1, 2', u'{"a" 1}'):
+            self.assertRaises(ValueError, self.parse, data)
+
+if __name__ == '__main__':
+    unittest.main()
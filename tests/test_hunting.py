@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.hunting
+from tests import snapshot_data
+
+class HunterTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+        self.Hunter = idatool.hunting.Hunter(disasm = self.Snapshot)
+
+    def test_find_encoding_instructions(self):
+        self.Hunter.find_encoding_instructions()
+        blocks = []
+        for block_hash_items in self.Hunter.Matches.values():
+            for block_instructions in block_hash_items['']:
+                blocks.append(block_instructions[0]['Address'])
+        self.assertEqual(sorted(blocks), [snapshot_data.Main, snapshot_data.Helper, snapshot_data.Twin])
+        self.assertEqual(len(self.Hunter.Matches), 2)
+
+    def test_cached_instructions_unchanged(self):
+        instructions = self.Snapshot.get_function_instructions(snapshot_data.Helper)
+        instructions[0]['Comment'] = 'changed'
+        self.Snapshot.get_block_instructions(snapshot_data.Helper)[0]['Comment'] = 'changed'
+        self.Snapshot.get_function_blocks(snapshot_data.Helper)[0][2][0]['Comment'] = 'changed'
+
+        graph = self.Snapshot.get_function_graph(snapshot_data.Helper)
+        self.assertEqual(graph.Instructions[0]['Comment'], '')
+
+        self.Hunter.add_instructions(graph.get_block(snapshot_data.Helper)[2])
+        self.assertEqual(len(self.Hunter.Matches), 1)
+        self.assertFalse('Bytes' in graph.Instructions[0])
+        self.assertFalse('Bytes' in self.Snapshot.get_instruction(snapshot_data.Helper))
+
+if __name__ == '__main__':
+    unittest.main()
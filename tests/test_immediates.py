@@ -0,0 +1,49 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.immediates
+from tests import snapshot_data
+
+class ImmediateIndexTest(snapshot_data.SnapshotTestCase):
+    def setUp(self):
+        snapshot_data.SnapshotTestCase.setUp(self)
+        self.Index = self.Snapshot.get_immediate_index()
+
+    def test_find(self):
+        self.assertEqual(self.Index.find(0x12345678), [{'Value': 0x12345678, 'Address': 0x401001, 'Position': 1, 'Function': snapshot_data.Main}])
+        self.assertEqual([entry['Function'] for entry in self.Index.find(snapshot_data.Data)], [snapshot_data.Helper, snapshot_data.Twin])
+        self.assertEqual(self.Index.find(0x31337), [])
+
+    def test_find_range(self):
+        self.assertEqual([entry['Value'] for entry in self.Index.find_range(0, 0xff)], [1, 1])
+        self.assertEqual([entry['Address'] for entry in self.Index.find_values([0xdeadbeef, 0x12345678])], [0x401001, 0x401006])
+
+    def test_invalidate(self):
+        self.Index.invalidate(snapshot_data.Main)
+        self.assertEqual(len(self.Index.find(0xdeadbeef)), 1)
+        self.Index.invalidate()
+        self.assertEqual(len(self.Index), 6)
+
+    def test_find_interesting(self):
+        values = [entry['Value'] for entry in self.Index.find_interesting(black_list = [0xdeadbeef])]
+        self.assertEqual(values, [snapshot_data.Data, snapshot_data.Data, 0x12345678])
+
+    def test_segment_references(self):
+        references = self.Snapshot.find_immediate_segments_references()
+        self.assertEqual([(instruction['Address'], values) for (instruction, values) in references],
+                        [(0x401100, [snapshot_data.Data]), (0x401200, [snapshot_data.Data])])
+
+    def test_save_and_load(self):
+        filename = os.path.join(self.Dirname, 'immediates.gz')
+        self.Index.save(filename, {'FileHash': 'deadbeef'})
+
+        index = idatool.immediates.ImmediateIndex()
+        self.assertEqual(index.load(filename)['FileHash'], 'deadbeef')
+        self.assertEqual(len(index), len(self.Index))
+        self.assertEqual(index.find(0xdeadbeef), self.Index.find(0xdeadbeef))
+
+if __name__ == '__main__':
+    unittest.main()
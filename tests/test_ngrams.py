@@ -0,0 +1,38 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.ngrams
+from tests import snapshot_data
+
+class MnemonicIndexTest(snapshot_data.SnapshotTestCase):
+    def test_find_sequence(self):
+        matches = self.Snapshot.find_instruction_sequence('mov/add')
+        self.assertEqual([(match['Function'], match['Addresses']) for match in matches],
+                        [(snapshot_data.Helper, [0x401100, 0x401105]), (snapshot_data.Twin, [0x401200, 0x401205])])
+
+    def test_find_wildcard_sequence(self):
+        matches = self.Snapshot.find_instruction_sequence('xor/*/jnz')
+        self.assertEqual([match['Addresses'] for match in matches], [[0x401006, 0x40100b, 0x401010]])
+        self.assertEqual(self.Snapshot.find_instruction_sequence('xor/add'), [])
+        self.assertEqual(self.Snapshot.find_instruction_sequence('nop'), [])
+
+    def test_find_similar_functions(self):
+        similar = self.Snapshot.find_similar_functions(snapshot_data.Helper)
+        self.assertEqual(similar[0], {'Function': snapshot_data.Twin, 'Score': 1.0})
+        self.assertEqual(len(similar), 1)
+
+    def test_rank_sequence(self):
+        ranked = self.Snapshot.get_mnemonic_index().rank_sequence(['mov', 'add', 'retn'])
+        self.assertEqual([entry['Function'] for entry in ranked], [snapshot_data.Helper, snapshot_data.Twin])
+        self.assertEqual(ranked[0]['Score'], 1.0)
+
+    def test_invalidate(self):
+        index = self.Snapshot.get_mnemonic_index()
+        index.invalidate(snapshot_data.Helper)
+        self.assertEqual(len(self.Snapshot.find_instruction_sequence('mov/add')), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import gzip
+import json
+import unittest
+
+import idatool.snapshot
+from tests import snapshot_data
+
+class SnapshotTest(snapshot_data.SnapshotTestCase):
+    def test_header(self):
+        self.assertEqual(self.Snapshot.ImageName, 'toy.exe')
+        self.assertEqual(self.Snapshot.ImageBase, snapshot_data.ImageBase)
+        self.assertEqual(self.Snapshot.get_file_hash(), 'deadbeef')
+
+    def test_segments(self):
+        self.assertEqual(self.Snapshot.get_segment_name(0x401010), '.text')
+        self.assertEqual(self.Snapshot.get_segment_name(snapshot_data.Data+4), '.data')
+        self.assertEqual(self.Snapshot.get_segment_name(0x402000), '')
+        self.assertEqual(self.Snapshot.dump_bytes(0x401000, 2), b'\x90\x90')
+        self.assertEqual(self.Snapshot.dump_bytes(snapshot_data.Data, 4), None)
+
+    def test_functions(self):
+        self.assertEqual(self.Snapshot.get_function_starts(), [snapshot_data.Main, snapshot_data.Helper, snapshot_data.Twin])
+        self.assertEqual(self.Snapshot.get_function_start(0x401012), snapshot_data.Main)
+        self.assertEqual(self.Snapshot.get_function_start(0x401015), None)
+        self.assertEqual(self.Snapshot.get_function_name(0x401105), 'helper')
+        self.assertEqual(self.Snapshot.get_name(snapshot_data.Data), 'g_data')
+
+    def test_graph_round_trip(self):
+        graph = self.Snapshot.get_function_graph(0x401006)
+        self.assertEqual(graph.Start, snapshot_data.Main)
+        self.assertEqual(graph.Instructions, snapshot_data.get_main_graph().Instructions)
+        self.assertEqual(self.Snapshot.get_instruction(0x40100b)['CREFFrom'], [('Next', 0x401010), ('Call', snapshot_data.Helper)])
+
+    def test_newer_version(self):
+        filename = os.path.join(self.Dirname, 'future.snapshot.gz')
+        fd = gzip.open(filename, 'wb')
+        fd.write(json.dumps({'Kind': 'Header', 'Version': idatool.snapshot.Version+1}).encode('utf-8'))
+        fd.close()
+        self.assertRaises(RuntimeError, idatool.snapshot.load, filename)
+
+if __name__ == '__main__':
+    unittest.main()
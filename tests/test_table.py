@@ -0,0 +1,116 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import unittest
+
+import idatool.table
+from tests import snapshot_data
+
+class InstructionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.Instructions = snapshot_data.get_main_graph().Instructions
+        self.Table = idatool.table.InstructionTable(snapshot_data.ImageBase)
+        self.Table.extend(self.Instructions)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.Table), len(self.Instructions))
+        self.assertEqual(self.Table.to_list(), self.Instructions)
+        self.assertEqual(self.Table[-1]['Address'], 0x401014)
+        self.assertEqual([row['Address'] for row in self.Table[1:3]], [0x401001, 0x401006])
+
+    def test_field_values(self):
+        operand = {'Type': 'Unknown', 'TypeValue': 40, 'DataType': 'QWORD', 'Value': 'k1', 'Position': 0}
+        instruction = snapshot_data.make_instruction(0xfffff80000001000, 'call', 5, [operand])
+        instruction['IsCall'] = 2
+        row = self.Table.append(instruction)
+        self.assertEqual(row['Address'], 0xfffff80000001000)
+        self.assertEqual(row['IsCall'], 2)
+        self.assertEqual(self.Table[3]['IsCall'], True)
+        self.assertEqual([row['Address'] for row in self.Table.find_rows(operand_types = [40])], [0xfffff80000001000])
+        self.assertEqual(list(self.Table.find_rows(operand_types = [41])), [])
+
+    def test_set_field(self):
+        row = self.Table[0]
+        row['Comment'] = 'entry'
+        row['Op'] = 'nop'
+        row['Bytes'] = '55'
+        self.assertEqual((row['Comment'], row['Op'], row['Bytes']), ('entry', 'nop', '55'))
+        self.assertEqual(row.keys().count('Op'), 1)
+        self.assertEqual(self.Table[1]['Comment'], '')
+
+    def test_equality(self):
+        table = idatool.table.InstructionTable(snapshot_data.ImageBase)
+        table.extend(self.Instructions)
+        self.assertEqual(table[2], self.Table[2])
+        self.assertEqual(table[2], self.Instructions[2])
+        self.assertNotEqual(table[2], self.Table[3])
+
+        table[2]['Comment'] = 'changed'
+        self.assertNotEqual(table[2], self.Table[2])
+        self.assertRaises(TypeError, hash, table[2])
+
+    def test_operands_cached(self):
+        self.assertTrue(self.Table[1]['Operands'][0] is self.Table[1]['Operands'][0])
+        self.assertEqual(self.Table[1]['Operands'], self.Instructions[1]['Operands'])
+
+class LazyInstructionTest(unittest.TestCase):
+    def test_load_on_access(self):
+        loaded = []
+        def loader(instruction, key):
+            loaded.append(key)
+            instruction[key] = 'nop'
+
+        instruction = idatool.table.LazyInstruction(loader, {'Address': 0x401000}, ('Address', 'Op'))
+        self.assertFalse(instruction.is_loaded('Op'))
+        self.assertEqual(instruction['Op'], 'nop')
+        self.assertEqual(instruction.to_dict(), {'Address': 0x401000, 'Op': 'nop'})
+        self.assertEqual(loaded, ['Op'])
+
+    def test_unhashable(self):
+        instruction = idatool.table.LazyInstruction(None, {'Address': 0x401000}, ('Address', ))
+        self.assertEqual(instruction, {'Address': 0x401000})
+        self.assertRaises(TypeError, hash, instruction)
+
+class ProjectionTest(snapshot_data.SnapshotTestCase):
+    def test_projection(self):
+        instructions = self.Snapshot.get_instructions(filter = {'Op': ['retn']}, fields = 'Address,Op')
+        self.assertEqual(instructions, [
+            {'Address': 0x401014, 'Op': 'retn'},
+            {'Address': 0x401108, 'Op': 'retn'},
+            {'Address': 0x401208, 'Op': 'retn'}
+        ])
+        self.assertRaises(KeyError, self.Snapshot.get_instructions, fields = 'Bogus')
+
+    def test_table(self):
+        instructions = self.Snapshot.get_all_instructions()
+        self.assertTrue(isinstance(instructions, idatool.table.InstructionTable))
+        self.assertEqual(instructions[0]['Address'], snapshot_data.Main)
+
+    def test_lazy(self):
+        instructions = self.Snapshot.get_all_instructions(lazy = True)
+        self.assertTrue(isinstance(instructions, list))
+        self.assertEqual([instruction['Address'] for instruction in instructions],
+                        [instruction['Address'] for instruction in self.Snapshot.get_all_instructions()])
+
+    def test_fields(self):
+        instructions = self.Snapshot.get_all_instructions(fields = ('Address', 'RVA'))
+        self.assertEqual(instructions[0], {'Address': snapshot_data.Main, 'RVA': snapshot_data.Main-snapshot_data.ImageBase})
+
+    def test_function_lazy(self):
+        instructions = self.Snapshot.get_function_instructions(snapshot_data.Main, lazy = True)
+        self.assertTrue(isinstance(instructions[0], idatool.table.LazyInstruction))
+        self.assertFalse(instructions[0].is_loaded('Op'))
+        self.assertEqual(instructions, self.Snapshot.get_function_instructions(snapshot_data.Main))
+
+        instructions = self.Snapshot.get_function_instructions(snapshot_data.Main, filter = {'Op': ['call']}, fields = 'Address', lazy = True)
+        self.assertEqual(instructions, [{'Address': 0x40100b}, {'Address': 0x401012}])
+
+    def test_instructions_lazy(self):
+        instructions = self.Snapshot.get_instructions(fields = ('Address', 'Op'), lazy = True)
+        self.assertTrue(isinstance(instructions[0], idatool.table.LazyInstruction))
+        self.assertEqual(instructions, self.Snapshot.get_instructions(fields = ('Address', 'Op')))
+        self.assertEqual(self.Snapshot.get_instruction(0x401014, lazy = True)['Op'], 'retn')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import time
+
+import idatool.hunting
+import idatool.snapshot
+
+if __name__ == '__main__':
+    from optparse import OptionParser, Option
+
+    parser = OptionParser(usage = "usage: %prog [options] snapshot_filename ...")
+    parser.add_option("-d", "--db_filename", dest = "db_filename", type = "string", default = "Hunting.db", metavar = "DB_FILENAME", help = "Output database filename")
+    parser.add_option("-c", "--copies", dest = "copies", type = "int", default = 1, metavar = "COPIES", help = "Save each snapshot this many times under distinct file hashes to simulate a larger corpus")
+
+    (options, args) = parser.parse_args(sys.argv)
+
+    total_time = 0
+    total_rows = 0
+    total_matches = 0
+    for filename in args[1:]:
+        snapshot = idatool.snapshot.load(filename)
+        hunter = idatool.hunting.Hunter(log_filename = os.devnull, disasm = snapshot)
+        hunter.find_encoding_instructions()
+
+        file_hash = snapshot.get_file_hash()
+        for i in range(0, options.copies, 1):
+            snapshot.Header['FileHash'] = '%s-%d' % (file_hash, i)
+
+            start_time = time.time()
+            total_rows += hunter.save(options.db_filename)
+            total_time += time.time()-start_time
+
+            for block_hash_items in hunter.Matches.values():
+                for block_instructions_list in block_hash_items.values():
+                    total_matches += len(block_instructions_list)
+
+        hunter.close()
+
+    rate = total_matches/total_time if total_time > 0 else 0
+    print('* Saved %d matches (%d new rows) in %.2fs: %.0f matches/s, database size %d bytes' % (total_matches, total_rows, total_time, rate, os.path.getsize(options.db_filename)))
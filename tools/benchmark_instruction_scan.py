@@ -0,0 +1,33 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import time
+
+import idatool.disassembly
+
+if __name__ == '__main__':
+    import logging
+
+    logging.basicConfig(level = logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    disasm = idatool.disassembly.Disasm()
+
+    for type in ('IndirectCall', 'DisplacementCall', 'Pointer', 'CallToSection'):
+        filter = disasm.get_filter(type)
+
+        timings = {}
+        for pushdown in (False, True):
+            disasm.FilterPushdown = pushdown
+            start_time = time.time()
+            instructions = disasm.get_instructions(filter = filter)
+            timings[pushdown] = (time.time()-start_time, len(instructions))
+
+        (full_time, full_count) = timings[False]
+        (pushdown_time, pushdown_count) = timings[True]
+        speedup = full_time/pushdown_time if pushdown_time > 0 else 0
+        print('%-16s full: %8.2fs (%d)  pushdown: %8.2fs (%d)  speedup: %.1fx' % (type, full_time, full_count, pushdown_time, pushdown_count, speedup))
+
+    disasm.FilterPushdown = True
+    disasm.exit()
@@ -0,0 +1,78 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+import time
+
+from idaapi import *
+from idautils import *
+
+import idatool.decoder
+
+class CallCounter:
+    def __init__(self, names):
+        self.Counts = {}
+        self.Originals = {}
+        for name in names:
+            self.Originals[name] = getattr(idatool.decoder, name)
+            setattr(idatool.decoder, name, self.wrap(name, self.Originals[name]))
+
+    def wrap(self, name, function):
+        def wrapper(*args):
+            self.Counts[name] = self.Counts.get(name, 0)+1
+            return function(*args)
+        return wrapper
+
+    def reset(self):
+        self.Counts = {}
+
+    def restore(self):
+        for (name, function) in self.Originals.items():
+            setattr(idatool.decoder, name, function)
+
+def get_instruction_addresses(max_instructions):
+    addresses = []
+    for function_start in Functions():
+        for ea in FuncItems(function_start):
+            addresses.append(ea)
+            if len(addresses) >= max_instructions:
+                return addresses
+    return addresses
+
+def decode_operands(context, addresses):
+    operand_count = 0
+    for ea in addresses:
+        if decode_insn(ea) == 0:
+            continue
+
+        for operand in cmd.Operands:
+            if not operand or operand.type == o_void:
+                break
+            context.decode_operand(operand)
+            operand_count += 1
+    return operand_count
+
+if __name__ == '__main__':
+    from optparse import OptionParser, Option
+
+    parser = OptionParser(usage = "usage: %prog [options]")
+    parser.add_option("-n", "--instructions", dest = "instructions", type = "int", default = 100000, metavar = "INSTRUCTIONS", help = "Number of instructions to decode")
+    (options, args) = parser.parse_args(sys.argv)
+
+    addresses = get_instruction_addresses(options.instructions)
+    counter = CallCounter(['get_reg_name', 'get_inf_structure'])
+
+    for memoize in (False, True):
+        counter.reset()
+        context = idatool.decoder.DecoderContext()
+        context.Memoize = memoize
+
+        start_time = time.time()
+        operand_count = decode_operands(context, addresses)
+        elapsed = time.time()-start_time
+
+        scale = 1000000.0/max(1, operand_count)
+        calls = ', '.join('%s %.0f' % (name, count*scale) for (name, count) in sorted(counter.Counts.items()))
+        print('memoize=%-5s %d operands in %.3fs; IDA calls per million operands: %s' % (memoize, operand_count, elapsed, calls or 'none'))
+
+    counter.restore()
@@ -7,8 +7,6 @@ import idatool.breakpoints
 if __name__ == '__main__':
     breakpoints = idatool.breakpoints.Util()
     breakpoints.add_functions()
-    breakpoints.add("All", "DisplacementCall")
-    breakpoints.add("All", "Pointer")
-    breakpoints.add("All", "IndirectCall")
+    breakpoints.add("All", ["DisplacementCall", "Pointer", "IndirectCall"])
     breakpoints.save()
     breakpoints.exit()
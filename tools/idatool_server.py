@@ -25,6 +25,7 @@ from TraceLoader import *
 
 import idatool.util
 import idatool.disassembly
+import idatool.table
 
 class IDASyncError(Exception): pass
 
@@ -90,8 +91,16 @@ class IDARPCServer(object):
         self.DisasmTool = Disasm.Tool.Analyzer('x86', 64)
 
     @idaread
-    def get_function_instructions(self, ea = None):
-        return self.Disasm.get_function_instructions(ea)
+    def get_instruction(self, ea, fields = None):
+        return self.Disasm.get_instruction(ea, fields = fields)
+
+    @idaread
+    def get_instructions(self, filter = None, fields = idatool.table.InstructionFields):
+        return self.Disasm.get_instructions(filter, fields = fields)
+
+    @idaread
+    def get_function_instructions(self, ea = None, fields = None):
+        return self.Disasm.get_function_instructions(ea, fields = fields)
         
     @idaread
     def get_functions(self):
@@ -102,8 +111,8 @@ class IDARPCServer(object):
         return self.Disasm.get_function_hashes(hash_types = ['op'])
         
     @idaread
-    def get_function_tree(self, ea = None, threshold = 10):
-        return self.Disasm.get_function_tree(ea, threshold)
+    def get_function_tree(self, ea = None, threshold = 10, filter = None, fields = None):
+        return self.Disasm.get_function_tree(ea, threshold, filter = filter, fields = fields)
 
     @idaread
     def get_imports(self):
@@ -2,14 +2,95 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-import dircache
+import hashlib
+import json
+import multiprocessing
 import re
+import sqlite3
 import subprocess
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+class Manifest:
+    def __init__(self, filename):
+        self.Lock = threading.Lock()
+        self.Conn = sqlite3.connect(filename, check_same_thread = False)
+        self.Conn.execute("""CREATE TABLE
+                            IF NOT EXISTS Jobs (
+                                FileName text,
+                                Arguments text,
+                                Size integer,
+                                MTime real,
+                                Hash text,
+                                Status text,
+                                ReturnCode integer,
+                                Attempts integer,
+                                Elapsed real,
+                                OutputLocation text,
+                                UpdatedAt real,
+                                PRIMARY KEY (FileName, Arguments)
+                            );""")
+        self.Conn.commit()
+
+    @staticmethod
+    def get_file_hash(filename):
+        m = hashlib.md5()
+        fd = open(filename, 'rb')
+        while True:
+            data = fd.read(1024*1024)
+            if not data:
+                break
+            m.update(data)
+        fd.close()
+        return m.hexdigest()
+
+    def is_up_to_date(self, filename, arguments):
+        stat = os.stat(filename)
+
+        with self.Lock:
+            row = self.Conn.execute('SELECT Size, MTime, Hash, Status FROM Jobs WHERE FileName = ? AND Arguments = ?', (filename, arguments)).fetchone()
+
+        if row == None:
+            return False
+
+        (size, mtime, file_hash, status) = row
+        if status != 'Success' or size != stat.st_size:
+            return False
+
+        if mtime == stat.st_mtime:
+            return True
+
+        if file_hash != self.get_file_hash(filename):
+            return False
+
+        with self.Lock:
+            self.Conn.execute('UPDATE Jobs SET MTime = ? WHERE FileName = ? AND Arguments = ?', (stat.st_mtime, filename, arguments))
+            self.Conn.commit()
+        return True
+
+    def record(self, filename, arguments, result):
+        stat = os.stat(filename)
+        file_hash = self.get_file_hash(filename)
+
+        with self.Lock:
+            self.Conn.execute('INSERT OR REPLACE INTO Jobs (FileName, Arguments, Size, MTime, Hash, Status, ReturnCode, Attempts, Elapsed, OutputLocation, UpdatedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (filename, arguments, stat.st_size, stat.st_mtime, file_hash, result['Status'], result['ReturnCode'], result['Attempts'], result['Elapsed'], result.get('OutputLocation', ''), time.time()))
+            self.Conn.commit()
+
+    def close(self):
+        self.Conn.close()
 
 class Runner:
     IDAQ = r"C:\Program Files (x86)\IDA 6.95\idaq.exe"
-    def __init__(self, args, regex = ''):
-        self.ArgStr = ''                
+    PollInterval = 0.5
+
+    def __init__(self, args, regex = '', workers = 0, timeout = 0, retries = 0, log_filename = '', manifest_filename = '', force = False, output_dirname = ''):
+        self.ArgStr = ''
         for arg in args:
             if self.ArgStr:
                 self.ArgStr += ' '
@@ -17,33 +98,211 @@ class Runner:
 
         self.RegEx = re.compile(regex, re.IGNORECASE)
 
+        if workers <= 0:
+            workers = multiprocessing.cpu_count()
+        self.Workers = workers
+        self.Timeout = timeout
+        self.Retries = retries
+
+        self.Force = force
+        self.OutputDirname = output_dirname
+        self.Skipped = 0
+
+        if manifest_filename:
+            self.Manifest = Manifest(manifest_filename)
+        else:
+            self.Manifest = None
+
+        self.LogLock = threading.Lock()
+        if log_filename:
+            self.LogFD = open(log_filename, 'a')
+        else:
+            self.LogFD = None
+
     def set_ida_path(self, filename):
         self.IDAQ = filename
 
-    def run_script_on_directory(self, dirname = '.'):
-        for filename in dircache.listdir(dirname):
-            full_path = os.path.join(dirname, filename)
-            if os.path.isdir(full_path):
-                self.run_script_on_directory(full_path)
+    def walk(self, dirname = '.'):
+        dirnames = [dirname]
+        while len(dirnames)>0:
+            current_dirname = dirnames.pop()
+
+            for (filename, full_path, is_dir) in self.iterate_directory(current_dirname):
+                if is_dir:
+                    dirnames.append(full_path)
+                elif self.RegEx.search(filename):
+                    yield full_path
+
+    def iterate_directory(self, dirname):
+        if not hasattr(os, 'scandir'):
+            for filename in os.listdir(dirname):
+                full_path = os.path.join(dirname, filename)
+                yield (filename, full_path, os.path.isdir(full_path))
+            return
+
+        entries = os.scandir(dirname)
+        try:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                yield (entry.name, entry.path, is_dir)
+        finally:
+            if hasattr(entries, 'close'):
+                entries.close()
+
+    def get_output_location(self, filename):
+        if not self.OutputDirname:
+            return ''
+        return os.path.join(self.OutputDirname, os.path.basename(filename)+'.log')
+
+    def get_command(self, filename):
+        cmds = []
+        cmds.append(self.IDAQ)
+        cmds.append('-A')
+        cmds.append(r'-S%s' % (self.ArgStr))
+
+        output_location = self.get_output_location(filename)
+        if output_location:
+            cmds.append(r'-L%s' % output_location)
+
+        cmds.append(filename)
+        return cmds
+
+    def run_script(self, filename):
+        cmds = self.get_command(filename)
+        print('> Running ' + str(cmds))
+        p = subprocess.Popen(cmds)
+
+        start_time = time.time()
+        while p.poll() == None:
+            if self.Timeout > 0 and time.time()-start_time > self.Timeout:
+                p.kill()
+                p.wait()
+                return (None, True)
+            time.sleep(self.PollInterval)
+
+        return (p.returncode, False)
+
+    def run_job(self, filename):
+        result = {'Filename': filename, 'Attempts': 0, 'OutputLocation': self.get_output_location(filename)}
+        start_time = time.time()
+
+        while result['Attempts'] <= self.Retries:
+            result['Attempts'] += 1
+            try:
+                (returncode, timed_out) = self.run_script(filename)
+            except Exception as ex:
+                (returncode, timed_out) = (None, False)
+                result['Error'] = str(ex)
+
+            result['ReturnCode'] = returncode
+            if timed_out:
+                result['Status'] = 'Timeout'
+            elif returncode == 0:
+                result['Status'] = 'Success'
+                break
             else:
-                if self.RegEx.search(filename):
-                    cmds = []
-                    cmds.append(self.IDAQ)
-                    cmds.append(r'-S%s' % (self.ArgStr))
-                    cmds.append(full_path)
-                    print('> Running ' + str(cmds))
-                    p = subprocess.Popen(cmds)
-                    p.wait()
+                result['Status'] = 'Failed'
+
+        result['Elapsed'] = time.time()-start_time
+
+        if self.Manifest != None:
+            try:
+                self.Manifest.record(filename, self.ArgStr, result)
+            except Exception as ex:
+                result['ManifestError'] = str(ex)
+
+        self.write_result(result)
+        return result
+
+    def write_result(self, result):
+        if self.LogFD == None:
+            return
+
+        with self.LogLock:
+            self.LogFD.write(json.dumps(result)+'\n')
+            self.LogFD.flush()
+
+    def run_script_on_directory(self, dirname = '.'):
+        jobs = queue.Queue(maxsize = self.Workers*2)
+        results = []
+        results_lock = threading.Lock()
+
+        def worker():
+            while True:
+                filename = jobs.get()
+                if filename == None:
+                    break
+
+                try:
+                    result = self.run_job(filename)
+                except Exception as ex:
+                    result = {'Filename': filename, 'Status': 'Error', 'ReturnCode': None, 'Attempts': 0, 'Elapsed': 0, 'Error': str(ex)}
+
+                with results_lock:
+                    results.append(result)
+
+        threads = []
+        for i in range(0, self.Workers, 1):
+            thread = threading.Thread(target = worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for filename in self.walk(dirname):
+            if not self.Force and self.Manifest != None:
+                try:
+                    up_to_date = self.Manifest.is_up_to_date(filename, self.ArgStr)
+                except Exception:
+                    up_to_date = False
+
+                if up_to_date:
+                    self.Skipped += 1
+                    continue
+            jobs.put(filename)
+
+        for thread in threads:
+            jobs.put(None)
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def close(self):
+        if self.Manifest != None:
+            self.Manifest.close()
+            self.Manifest = None
+
+        if self.LogFD != None:
+            self.LogFD.close()
+            self.LogFD = None
 
 if __name__ == '__main__':
     import sys
     from optparse import OptionParser, Option
 
-    parser = OptionParser(usage = "usage: %prog [options] args")	
+    parser = OptionParser(usage = "usage: %prog [options] args")
     parser.add_option("-R", "--root_folder", dest = "root_folder", type = "string", default = ".", metavar = "LOG_FILENAME", help = "Log filename")
     parser.add_option("-r", "--regex", dest = "regex", type = "string", default = "\.idb$", metavar = "REGEX", help = "Log filename")
-	
+    parser.add_option("-w", "--workers", dest = "workers", type = "int", default = 0, metavar = "WORKERS", help = "Number of IDA processes to run at once (default: CPU count)")
+    parser.add_option("-t", "--timeout", dest = "timeout", type = "int", default = 0, metavar = "SECONDS", help = "Kill an IDA process after this many seconds (0: no timeout)")
+    parser.add_option("-T", "--retries", dest = "retries", type = "int", default = 0, metavar = "RETRIES", help = "Number of retries for a failed or timed out job")
+    parser.add_option("-l", "--log_filename", dest = "log_filename", type = "string", default = "", metavar = "LOG_FILENAME", help = "JSON lines result log filename")
+    parser.add_option("-m", "--manifest", dest = "manifest_filename", type = "string", default = "", metavar = "MANIFEST_FILENAME", help = "Manifest database used to skip unchanged inputs")
+    parser.add_option("-o", "--output_dirname", dest = "output_dirname", type = "string", default = "", metavar = "OUTPUT_DIRNAME", help = "Folder for per-file IDA logs")
+    parser.add_option("-f", "--force", dest = "force", action = "store_true", default = False, help = "Run every input even if the manifest says it is up to date")
+
     (options, args) = parser.parse_args(sys.argv)
-    
-    runner = Runner(args[1:], regex = options.regex)
-    runner.run_script_on_directory(options.root_folder)
+
+    runner = Runner(args[1:], regex = options.regex, workers = options.workers, timeout = options.timeout, retries = options.retries, log_filename = options.log_filename,
+                    manifest_filename = options.manifest_filename, force = options.force, output_dirname = options.output_dirname)
+    results = runner.run_script_on_directory(options.root_folder)
+    runner.close()
+
+    status_counts = {}
+    for result in results:
+        status_counts[result['Status']] = status_counts.get(result['Status'], 0)+1
+    print('* Executed %d jobs (%s), skipped %d unchanged inputs' % (len(results), ', '.join('%s %d' % item for item in sorted(status_counts.items())), runner.Skipped))